@@ -66,6 +66,41 @@ CommandBuffer commandQueue[CMD_QUEUE_SIZE];
 int queueHead = 0;  // where to read from
 int queueTail = 0;  // where to write to
 int queueCount = 0; // number of commands in queue
+bool queueRejecting = false; // latched after QFULL/BERR until host resyncs with QSTAT, keeps EXEC order
+bool streamSession = false;  // credit-based streaming started by QSTAT, ends when the queue drains or on QFLUSH
+
+// Binary EXEC frame: A5 5A | type | seq | n | n*int16 (LE, angle*ANGLE_SCALE) | CRC16-CCITT (LE, over type..payload)
+#define FRAME_SYNC1 0xA5
+#define FRAME_SYNC2 0x5A
+#define FRAME_TYPE_EXEC 0x01
+#define ANGLE_SCALE 50.0f
+bool binaryMode = false;     // enabled by BINON during host connect
+uint8_t expectedSeq = 0;     // sequence number of the next binary EXEC frame
+
+// Trajectory upload: TRAJ,<count> reserves the buffer, binary TRAJ frames fill it in order, TPLAY plays it locally.
+// TRAJ frame: A5 5A | 0x02 | k | n | start (uint16 LE) | k*n*int16 | CRC16-CCITT (LE, over type..payload)
+#define FRAME_TYPE_TRAJ 0x02
+#if defined(ESP32)
+#define TRAJ_CAPACITY 1000    // about 2 bytes * numServos per point
+#else
+#define TRAJ_CAPACITY 0       // AVR SRAM cannot hold a trajectory: TA reports capacity 0 and the host streams EXEC instead
+#endif
+#define TRAJ_CHUNK_BYTES 192  // keeps a whole frame inside the serial RX buffer
+const int trajChunkPoints = (TRAJ_CHUNK_BYTES / (2 * numServos)) > 0 ? (TRAJ_CHUNK_BYTES / (2 * numServos)) : 1;
+int16_t trajPoints[TRAJ_CAPACITY > 0 ? TRAJ_CAPACITY : 1][numServos];
+int trajCount = 0;           // points reserved by TRAJ
+int trajReceived = 0;        // points received so far, chunks must arrive in order
+int trajIndex = 0;           // next point to play
+bool trajPlaying = false;
+bool trajPaused = false;     // TPAUSE: finish the current point and hold
+
+// Baud negotiation: boot at DEFAULT_BAUD, BAUD,<rate> switches after the reply, BAUDOK keeps the new rate.
+// An unconfirmed switch reverts after BAUD_CONFIRM_MS so a failed negotiation never strands the host.
+// Runtime rate changes need the ESP32 core; other boards answer BD,0 and stay at DEFAULT_BAUD.
+#define DEFAULT_BAUD 115200
+#define BAUD_CONFIRM_MS 1000
+const long supportedBauds[] = {230400, 460800, 921600};
+unsigned long baudPendingSince = 0;  // non-zero while a switched rate waits for BAUDOK
 
 // speed factors for each motor
 float jointSpeedFactors[numServos];
@@ -138,6 +173,158 @@ bool dequeueCommand(float angles[]) {
     return true;
 }
 
+// Drop every queued EXEC and hold the joints where they are, returns the number dropped.
+// Also ends the streaming session; the host stops writing waypoints before it sends QFLUSH.
+int flushQueue() {
+    int dropped = queueCount;
+    queueHead = 0;
+    queueTail = 0;
+    queueCount = 0;
+    for (int i = 0; i < CMD_QUEUE_SIZE; i++) {
+        commandQueue[i].valid = false;
+    }
+
+    for (int i = 0; i < numServos; i++) {
+        targetAngles[i] = isRecording ? tmpAngles[i] : currentAngles[i];
+        jointStates[i].isMoving = false;
+    }
+    globalMotion.isNewMotion = false;
+    isExecute = false;
+    queueRejecting = false;
+    streamSession = false;
+    trajPlaying = false;
+    trajPaused = false;
+    return dropped;
+}
+
+// Enqueue one EXEC waypoint and acknowledge it, returns false when rejected
+bool acceptExec(float angles[]) {
+    if (!queueRejecting && enqueueCommand(angles)) {
+        // Successfully added to queue, send immediate confirmation
+        Serial.println("CP0");
+
+        // If not currently executing, start execution with the first queued command
+        if (!isExecute) {
+            startNextMotion();
+        }
+        return true;
+    }
+
+    // Queue is full. While streaming, reject every following EXEC until QSTAT so pipelined waypoints
+    // stay in order; a one-at-a-time sender just retries
+    queueRejecting = streamSession;
+    Serial.println("QFULL");
+    return false;
+}
+
+// Load the next target, the playing trajectory goes before queued EXEC. Returns false when there is none.
+bool startNextMotion() {
+    if (trajPlaying && trajPaused) {
+        return false;
+    }
+    if (trajPlaying && trajIndex < trajCount) {
+        for (int i = 0; i < numServos; i++) {
+            targetAngles[i] = trajPoints[trajIndex][i] / ANGLE_SCALE;
+        }
+        Serial.println("TI," + String(trajIndex));
+        trajIndex++;
+    } else {
+        if (trajPlaying) {
+            trajPlaying = false;
+            Serial.println("TD," + String(trajCount));
+        }
+        if (!dequeueCommand(targetAngles)) {
+            return false;
+        }
+    }
+    globalMotion.globalDuration = calculateGlobalMotionDuration(targetAngles, currentAngles);
+    globalMotion.isNewMotion = true;
+    isExecute = true;
+    return true;
+}
+
+// CRC16-CCITT (poly 0x1021, init 0xFFFF)
+uint16_t crc16(const uint8_t* data, int length) {
+    uint16_t crc = 0xFFFF;
+    for (int i = 0; i < length; i++) {
+        crc ^= (uint16_t)data[i] << 8;
+        for (int bit = 0; bit < 8; bit++) {
+            crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : (crc << 1);
+        }
+    }
+    return crc;
+}
+
+// Read one binary frame, TRAJ frames go to handleTrajectoryFrame, corrupted or out-of-sequence EXEC frames are answered with BERR
+void handleBinaryFrame() {
+    const int payloadLength = 2 * numServos;
+    uint8_t frame[5 + 2 * numServos + 2];
+
+    if (Serial.readBytes(frame, 5) != 5 || frame[1] != FRAME_SYNC2 || frame[4] != numServos ||
+        (frame[2] != FRAME_TYPE_EXEC && frame[2] != FRAME_TYPE_TRAJ)) {
+        queueRejecting = streamSession;
+        Serial.println("BERR");
+        return;
+    }
+    if (frame[2] == FRAME_TYPE_TRAJ) {
+        handleTrajectoryFrame(frame[3]);
+        return;
+    }
+    if (Serial.readBytes(frame + 5, payloadLength + 2) != payloadLength + 2) {
+        queueRejecting = streamSession;
+        Serial.println("BERR");
+        return;
+    }
+
+    uint16_t crc = frame[5 + payloadLength] | ((uint16_t)frame[6 + payloadLength] << 8);
+    if (crc16(frame + 2, 3 + payloadLength) != crc || frame[3] != expectedSeq) {
+        queueRejecting = streamSession;
+        Serial.println("BERR");
+        return;
+    }
+
+    for (int i = 0; i < numServos; i++) {
+        int16_t raw = (int16_t)(frame[5 + 2 * i] | ((uint16_t)frame[6 + 2 * i] << 8));
+        tmpAngles[i] = raw / ANGLE_SCALE;
+    }
+    if (acceptExec(tmpAngles)) {
+        expectedSeq++;
+    }
+}
+
+// Read the rest of a TRAJ frame with k points, answers TK,<received> or TE,<received> so the host resends from there
+void handleTrajectoryFrame(uint8_t count) {
+    uint8_t frame[3 + 2 + 2 * numServos * trajChunkPoints + 2];
+    if (count == 0 || count > trajChunkPoints) {
+        Serial.println("TE," + String(trajReceived));
+        return;
+    }
+    const int payloadLength = 2 + 2 * numServos * count;
+    frame[0] = FRAME_TYPE_TRAJ;
+    frame[1] = count;
+    frame[2] = numServos;
+    if (Serial.readBytes(frame + 3, payloadLength + 2) != payloadLength + 2) {
+        Serial.println("TE," + String(trajReceived));
+        return;
+    }
+
+    uint16_t crc = frame[3 + payloadLength] | ((uint16_t)frame[4 + payloadLength] << 8);
+    int start = frame[3] | ((uint16_t)frame[4] << 8);
+    if (crc16(frame, 3 + payloadLength) != crc || trajPlaying || start != trajReceived || start + count > trajCount) {
+        Serial.println("TE," + String(trajReceived));
+        return;
+    }
+
+    for (int p = 0; p < count; p++) {
+        for (int i = 0; i < numServos; i++) {
+            int offset = 5 + 2 * (p * numServos + i);
+            trajPoints[start + p][i] = (int16_t)(frame[offset] | ((uint16_t)frame[offset + 1] << 8));
+        }
+    }
+    trajReceived += count;
+    Serial.println("TK," + String(trajReceived));
+}
+
 float mapFloat(float x, float in_min, float in_max, float out_min, float out_max) {
   return (x - in_min) * (out_max - out_min) / (in_max - in_min) + out_min;
 }
@@ -359,7 +546,7 @@ int getCurrentPulseWidth(int joint) {
 void setup() {
   delay(2000);
   
-  Serial.begin(115200);
+  Serial.begin(DEFAULT_BAUD);
   
   // Setup PWM Controller object
   pwm.begin();
@@ -412,9 +599,27 @@ void setup() {
   }
 }
  
+bool isSupportedBaud(long rate) {
+  for (unsigned int i = 0; i < sizeof(supportedBauds) / sizeof(supportedBauds[0]); i++) {
+    if (supportedBauds[i] == rate) {
+      return true;
+    }
+  }
+  return false;
+}
+
 void loop() {
   String command;
-  if (Serial.available()) {
+#if defined(ESP32)
+  if (baudPendingSince != 0 && millis() - baudPendingSince > BAUD_CONFIRM_MS) {
+    // host never confirmed the new rate, go back to the boot rate
+    Serial.updateBaudRate(DEFAULT_BAUD);
+    baudPendingSince = 0;
+  }
+#endif
+  if (binaryMode && Serial.available() && Serial.peek() == FRAME_SYNC1) {
+    handleBinaryFrame();
+  } else if (Serial.available()) {
     command = Serial.readStringUntil('\n');
     
     if (command == "VERC") {
@@ -572,24 +777,71 @@ void loop() {
       }
       
       if (parseSuccess) {
-        // Try to add command to queue
-        if (enqueueCommand(tmpAngles)) {
-          // Successfully added to queue, send immediate confirmation
-          Serial.println("CP0");
-          
-          // If not currently executing, start execution with the first queued command
-          if (!isExecute && queueCount > 0) {
-            if (dequeueCommand(targetAngles)) {
-              globalMotion.globalDuration = calculateGlobalMotionDuration(targetAngles, currentAngles);
-              globalMotion.isNewMotion = true;
-              isExecute = true;
-            }
-          }
-        } else {
-          // Queue is full, send error
-          Serial.println("QFULL");
+        acceptExec(tmpAngles);
+      }
+    } else if (command == "QSTAT") {
+      // report queue occupancy as credits for pipelined EXEC streaming
+      streamSession = true;
+      queueRejecting = false;
+      Serial.println("QS," + String(queueCount) + "," + String(CMD_QUEUE_SIZE) + "," + String(expectedSeq));
+    } else if (command == "BINON") {
+      binaryMode = true;
+      expectedSeq = 0;
+      Serial.println("BIN1");
+    } else if (command == "BINOFF") {
+      binaryMode = false;
+    } else if (command.startsWith("BAUD,")) {
+#if defined(ESP32)
+      long rate = command.substring(5).toInt();
+      if (isSupportedBaud(rate)) {
+        Serial.println("BD," + String(rate));
+        Serial.flush();  // finish the reply at the old rate before switching
+        Serial.updateBaudRate(rate);
+        baudPendingSince = millis() | 1;
+      } else {
+        Serial.println("BD,0");
+      }
+#else
+      // only the ESP32 core can change the rate at runtime, the host keeps DEFAULT_BAUD
+      Serial.println("BD,0");
+#endif
+    } else if (command == "BAUDOK") {
+      baudPendingSince = 0;
+      Serial.println("BD,OK");
+    } else if (command == "QFLUSH") {
+      // emergency stop: flush the EXEC queue and halt the current motion
+      int dropped = flushQueue();
+      Serial.println("QF," + String(dropped));
+    } else if (command.startsWith("TRAJ,")) {
+      // reserve the trajectory buffer: TA,<count>,<points per frame>,<capacity>, count 0 when rejected
+      int count = command.substring(5).toInt();
+      if (trajPlaying || count < 1 || count > TRAJ_CAPACITY) {
+        Serial.println("TA,0," + String(trajChunkPoints) + "," + String(TRAJ_CAPACITY));
+      } else {
+        trajCount = count;
+        trajReceived = 0;
+        Serial.println("TA," + String(count) + "," + String(trajChunkPoints) + "," + String(TRAJ_CAPACITY));
+      }
+    } else if (command == "TPLAY") {
+      // play the uploaded trajectory, TI,<index> as each point starts and TD,<count> when finished
+      if (trajPlaying || trajCount == 0 || trajReceived != trajCount) {
+        Serial.println("TS,0");
+      } else {
+        trajPlaying = true;
+        trajPaused = false;
+        trajIndex = 0;
+        Serial.println("TS," + String(trajCount));
+        if (!isExecute) {
+          startNextMotion();
         }
       }
+    } else if (command == "TPAUSE") {
+      trajPaused = true;
+    } else if (command == "TRESUME") {
+      trajPaused = false;
+      if (trajPlaying && !isExecute) {
+        startNextMotion();
+      }
     } else if (command == "RECONCEJ") {
       isRecordingOnceJoints = true;
     } else if (command == "RECONCET") {
@@ -701,16 +953,12 @@ void loop() {
 
   // Check if current motion is complete and handle queue
   if (allServosDone && isExecute) {
-    // Try to load next command from queue
-    if (dequeueCommand(targetAngles)) {
-      // Successfully loaded next command from queue
-      // Calculate new motion parameters
-      globalMotion.globalDuration = calculateGlobalMotionDuration(targetAngles, currentAngles);
-      globalMotion.isNewMotion = true;
-      // Continue executing (don't set isExecute to false)
-    } else {
-      // Queue is empty, stop executing
+    // Load the next trajectory point or queued command, stop executing when there is none
+    if (!startNextMotion()) {
       isExecute = false;
+      // queue drained, nothing of a streaming session is left in flight
+      streamSession = false;
+      queueRejecting = false;
     }
   }
 
@@ -0,0 +1,308 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from functools import partial
+from typing import Any, AsyncIterator
+
+import can
+import numpy as np
+
+from protocol.serial_protocol import SerialProtocol
+from protocol.feetech_protocol import FeetechProtocol
+from protocol.can_protocol import CanProtocol
+from protocol.connection_registry import ProtocolConnection, connection_method
+
+# 所有异步协议共享的事件循环，运行在独立的后台线程中
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """获取共享事件循环，首次调用时在后台线程中启动"""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="protocol-event-loop", daemon=True)
+            _loop_thread.start()
+        return _loop
+
+
+def submit(coro):
+    """从任意线程(如Tk主线程)把协程提交到共享事件循环，返回concurrent.futures.Future"""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+
+def shutdown_event_loop(timeout=1.0):
+    """停止共享事件循环"""
+    global _loop, _loop_thread
+    with _loop_lock:
+        loop, thread = _loop, _loop_thread
+        _loop, _loop_thread = None, None
+    if loop is None:
+        return
+    loop.call_soon_threadsafe(loop.stop)
+    if thread is not None and thread is not threading.current_thread():
+        thread.join(timeout=timeout)
+    if not loop.is_running():
+        loop.close()
+
+
+class _AsyncTransport(ProtocolConnection):
+    """异步协议公共部分
+
+    阻塞的同步协议调用放到单线程执行器中运行，保证同一总线上的请求不会交叉，
+    同时不阻塞事件循环。每个实例包装一条协议连接并拥有自己的执行器，
+    通过类调用时包装协议的默认连接。
+    """
+
+    protocol_class = None
+
+    def __init__(self, connection=None):
+        self.connection = connection if connection is not None else self.protocol_class.default()
+        self._executor = None
+        self._lock = None
+
+    @connection_method
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{type(self).__name__}-io")
+        return self._executor
+
+    @connection_method
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    @connection_method
+    async def _run_blocking(self, func, *args, **kwargs):
+        """在执行器中运行阻塞调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), partial(func, *args, **kwargs))
+
+    @connection_method
+    def is_connected(self) -> bool:
+        return self.connection.is_connected()
+
+    @connection_method
+    async def connect(self, *args, **kwargs) -> bool:
+        """建立连接"""
+        return await self._run_blocking(self.connection.connect, *args, **kwargs)
+
+    @connection_method
+    async def disconnect(self) -> bool:
+        """断开连接"""
+        return await self._run_blocking(self.connection.disconnect)
+
+
+class AsyncSerialProtocol(_AsyncTransport):
+    """串口协议的异步接口，共享SerialProtocol的连接和读取线程"""
+
+    protocol_class = SerialProtocol
+
+    @connection_method
+    async def send(self, data) -> bool:
+        """发送数据，不等待应答"""
+        return await self._run_blocking(self.connection.send, data, sleep_time=0)
+
+    @connection_method
+    async def receive(self, timeout=5, expected_signal=None):
+        """等待期望的信号
+
+        Returns:
+            (收到的行列表, 是否收到期望信号)
+        """
+        future = self.connection.expect(expected_signal)
+        return await self._wait_expect(future, timeout)
+
+    @connection_method
+    async def _wait_expect(self, future, timeout):
+        wrapped = asyncio.wrap_future(future)
+        # 不使用wait_for，避免超时时取消future与读取线程完成future产生竞争
+        await asyncio.wait((wrapped,), timeout=timeout)
+        if wrapped.done():
+            return wrapped.result()
+        lines = self.connection.cancel_expect(future)
+        if not wrapped.done():
+            wrapped.cancel()
+        return lines, False
+
+    @connection_method
+    async def execute_command(self, command: Enum, *args, expected_signal=None, timeout=None) -> Any:
+        """发送命令并等待应答
+
+        Args:
+            command: SerialCommands中的命令
+            expected_signal: 期望的应答，默认返回收到的第一行
+            timeout: 超时时间，默认使用SerialProtocol.timeout
+
+        Returns:
+            期望的应答行，超时返回空字符串
+        """
+        protocol = self.connection
+        if not protocol.is_connected():
+            raise ConnectionError("Serial port not connected")
+        if command not in protocol._COMMAND_MAP:
+            raise ValueError(f"Command {command.value} not supported")
+
+        cmd_str = f"{protocol._COMMAND_MAP[command]}"
+        if args:
+            cmd_str += "," + ",".join(map(str, args))
+        cmd_str += "\n"
+
+        if expected_signal is None:
+            expected_signal = lambda line: True
+        async with self._get_lock():
+            future = protocol.expect(expected_signal)
+            if not await self._run_blocking(protocol.send, cmd_str, sleep_time=0):
+                protocol.cancel_expect(future)
+                raise RuntimeError("Serial communication error: send failed")
+            lines, success = await self._wait_expect(future, protocol.timeout if timeout is None else timeout)
+        return lines[-1] if success else ""
+
+    @connection_method
+    async def send_trajectory(self, waypoints, window=None, timeout=5, on_progress=None):
+        """流式发送轨迹点(EXEC)
+
+        Args:
+            waypoints: 关节角度列表(度)
+            on_progress: 每个点被确认后调用on_progress(index, waypoint)，在事件循环线程中执行
+
+        Returns:
+            (已确认的点数, 是否全部确认)
+        """
+        loop = asyncio.get_running_loop()
+        callback = None
+        if on_progress is not None:
+            callback = lambda index, waypoint: loop.call_soon_threadsafe(on_progress, index, waypoint)
+
+        stop_event = threading.Event()
+        async with self._get_lock():
+            try:
+                return await self._run_blocking(
+                    self.connection.stream_exec, waypoints, window=window, timeout=timeout,
+                    should_continue=lambda: not stop_event.is_set(), on_progress=callback)
+            finally:
+                # 协程被取消时让后台发送尽快停止
+                stop_event.set()
+
+    @connection_method
+    async def lines(self) -> AsyncIterator[str]:
+        """异步迭代串口收到的每一行"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        def on_line(line):
+            loop.call_soon_threadsafe(queue.put_nowait, line)
+
+        self.connection.subscribe(on_line)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.connection.unsubscribe(on_line)
+
+
+class AsyncFeetechProtocol(_AsyncTransport):
+    """Feetech舵机协议的异步接口，请求-应答在单线程执行器中串行执行"""
+
+    protocol_class = FeetechProtocol
+
+    @connection_method
+    async def execute_command(self, command: Enum, *args, **kwargs) -> Any:
+        """执行FeetechCommands命令"""
+        return await self._run_blocking(self.connection.execute_command, command, *args, **kwargs)
+
+    @connection_method
+    async def send_trajectory(self, servo_ids, trajectory, interval=0.02, speed=0, on_progress=None):
+        """按固定间隔发送多舵机轨迹，每个点一个SYNC_WRITE数据包
+
+        Args:
+            servo_ids: 舵机ID列表
+            trajectory: 每个点为与servo_ids对应的位置列表
+            interval: 点间隔(秒)
+
+        Returns:
+            (已发送的点数, 是否全部成功)
+        """
+        loop = asyncio.get_running_loop()
+        next_time = loop.time()
+        for index, positions in enumerate(trajectory):
+            if not await self._run_blocking(self.connection.set_positions_sync, servo_ids, positions, speed):
+                return index, False
+            if on_progress is not None:
+                on_progress(index, positions)
+            next_time += interval
+            await asyncio.sleep(max(0.0, next_time - loop.time()))
+        return len(trajectory), True
+
+    @connection_method
+    async def status(self, servo_ids, interval=0.1) -> AsyncIterator[np.ndarray]:
+        """异步迭代舵机状态，每次用一次get_status_many总线事务读取所有舵机
+
+        Returns:
+            每次产出FeetechProtocol.STATUS_DTYPE结构化数组，与servo_ids一一对应
+        """
+        servo_ids = list(servo_ids)
+        while True:
+            yield await self._run_blocking(self.connection.get_status_many, servo_ids)
+            await asyncio.sleep(interval)
+
+
+class AsyncCanProtocol(_AsyncTransport):
+    """CAN协议的异步接口"""
+
+    protocol_class = CanProtocol
+
+    @connection_method
+    async def send(self, data) -> bool:
+        """发送数据帧"""
+        return await self._run_blocking(self.connection.send, data)
+
+    @connection_method
+    async def execute_command(self, command: Enum, *args, **kwargs) -> Any:
+        """执行CANCommands命令"""
+        return await self._run_blocking(self.connection.execute_command, command, *args, **kwargs)
+
+    @connection_method
+    async def send_trajectory(self, trajectory, rate=None, on_progress=None):
+        """按固定频率流式发送关节轨迹(度)，每个关节一个周期发送的设定值帧
+
+        Args:
+            on_progress: 每个点生效后调用on_progress(index, point)，在事件循环线程中执行
+
+        Returns:
+            (已发送的点数, 是否全部发送)
+        """
+        loop = asyncio.get_running_loop()
+        callback = None
+        if on_progress is not None:
+            callback = lambda index, point: loop.call_soon_threadsafe(on_progress, index, point)
+
+        stop_event = threading.Event()
+        try:
+            return await self._run_blocking(
+                self.connection.stream_trajectory, trajectory, rate=rate,
+                should_continue=lambda: not stop_event.is_set(), on_progress=callback)
+        finally:
+            stop_event.set()
+
+    @connection_method
+    async def messages(self) -> AsyncIterator[can.Message]:
+        """异步迭代总线上收到的CAN帧，与CanProtocol共用同一个Notifier"""
+        self.connection.start_feedback()
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        def on_message(msg):
+            loop.call_soon_threadsafe(queue.put_nowait, msg)
+
+        self.connection.subscribe(on_message)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.connection.unsubscribe(on_message)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CAN轨迹流式发送示例
+使用python-can的virtual接口模拟关节控制器，无需硬件即可运行
+"""
+
+import threading
+import time
+
+import can
+
+from can_protocol import CanProtocol
+
+CHANNEL = "demo"
+JOINT_COUNT = 3
+
+
+def simulated_controller(stop_event):
+    """模拟关节控制器: 收到设定值后返回相同角度作为反馈"""
+    bus = can.interface.Bus(channel=CHANNEL, interface="virtual")
+    try:
+        while not stop_event.is_set():
+            msg = bus.recv(timeout=0.1)
+            if msg is None:
+                continue
+            joint = msg.arbitration_id - CanProtocol.SETPOINT_BASE_ID
+            if 0 <= joint < JOINT_COUNT:
+                bus.send(can.Message(
+                    arbitration_id=CanProtocol.FEEDBACK_BASE_ID + joint,
+                    data=msg.data,
+                    is_extended_id=False
+                ))
+    finally:
+        bus.shutdown()
+
+
+def main():
+    """主函数 - 流式发送一段轨迹并打印关节反馈"""
+    stop_event = threading.Event()
+    controller = threading.Thread(target=simulated_controller, args=(stop_event,), daemon=True)
+    controller.start()
+
+    if not CanProtocol.connect(CHANNEL, interface="virtual"):
+        print("连接失败！")
+        return
+
+    try:
+        CanProtocol.start_feedback()
+        trajectory = [[i * 0.5, -i * 0.5, i * 0.25] for i in range(200)]
+
+        start = time.perf_counter()
+        sent, success = CanProtocol.stream_trajectory(trajectory, rate=100)
+        elapsed = time.perf_counter() - start
+        print(f"发送 {sent}/{len(trajectory)} 个点，用时 {elapsed:.2f}s，成功: {success}")
+
+        time.sleep(0.05)
+        for joint, angle in sorted(CanProtocol.default().joint_feedback.items()):
+            print(f"  关节 {joint} 反馈: {angle:.2f}°")
+    finally:
+        CanProtocol.disconnect()
+        stop_event.set()
+        controller.join()
+
+
+if __name__ == "__main__":
+    main()
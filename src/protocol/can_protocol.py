@@ -1,6 +1,15 @@
 import can
+import struct
+import threading
+import time
 from enum import Enum
-from typing import Any
+from typing import Any, Callable, List, Tuple
+
+try:
+    from protocol.connection_registry import ConnectionRegistry, ProtocolConnection, connection_method
+except ImportError:
+    # 在protocol目录下直接运行示例脚本时
+    from connection_registry import ConnectionRegistry, ProtocolConnection, connection_method
 
 class CANCommands(Enum):
     """CAN协议支持的命令"""
@@ -10,8 +19,8 @@ class CANCommands(Enum):
     GET_TORQUE = "get_torque"
     SET_MODE = "set_mode"
 
-class CanProtocol:
-    """CAN通信协议实现"""
+class CanProtocol(ProtocolConnection):
+    """CAN通信协议实现，每个实例是一条总线连接(各自的Notifier线程)，通过类调用时使用默认连接"""
     
     _COMMAND_MAP = {
         CANCommands.HOME: "0x100",
@@ -20,69 +29,107 @@ class CanProtocol:
         CANCommands.SET_MODE: "0x212",
     }
     
-    _bus = None
-    channel = None
+    DEFAULT_ARBITRATION_ID = 0x123  # send()未指定ID时使用
+    
+    # 每个关节一个仲裁ID: 设定值 = SETPOINT_BASE_ID + 关节序号，反馈 = FEEDBACK_BASE_ID + 关节序号
+    SETPOINT_BASE_ID = 0x300
+    FEEDBACK_BASE_ID = 0x380
+    MAX_JOINTS = 0x80
+    # 设定值/反馈数据: 角度(float32 LE，单位度)
+    JOINT_FRAME = struct.Struct("<f")
+    STREAM_RATE = 100               # 轨迹流式发送默认频率(Hz)
+
+    interface = 'socketcan'
     bitrate = 500000
 
-    @classmethod
-    def connect(cls, channel: str, bitrate: int = 500000) -> bool:
+    def __init__(self):
+        self._bus = None
+        self._notifier = None
+        self._reader = None                 # Notifier运行时receive从这里读取
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self.joint_feedback = {}            # {关节序号: 最新反馈角度}
+        self.channel = None
+
+    @connection_method
+    def connect(self, channel: str, bitrate: int = 500000, interface: str = None) -> bool:
         """建立CAN总线连接"""
-        cls.channel = channel
-        cls.bitrate = bitrate
+        if self.is_connected():
+            # 已连接的实例重新连接时先关闭旧的总线
+            self.disconnect()
+        if not ConnectionRegistry.is_available(channel, self):
+            print(f"CAN connection failed: {channel} is already in use")
+            return False
+        self.channel = channel
+        self.bitrate = bitrate
+        if interface:
+            self.interface = interface
         try:
-            cls._bus = can.interface.Bus(
-                channel=cls.channel,
-                bustype='socketcan',
-                bitrate=cls.bitrate
+            self._bus = can.interface.Bus(
+                channel=self.channel,
+                interface=self.interface,
+                bitrate=self.bitrate
             )
+            self.joint_feedback = {}
+            if not ConnectionRegistry.register(channel, self):
+                print(f"CAN connection failed: {channel} is already in use")
+                self.disconnect()
+                return False
             return True
         except Exception as e:
             print(f"CAN connection failed: {e}")
             return False
 
-    @classmethod
-    def disconnect(cls) -> bool:
+    @connection_method
+    def disconnect(self) -> bool:
         """断开CAN总线连接"""
-        if cls._bus:
+        if self._bus:
             try:
-                cls._bus.shutdown()
-                cls._bus = None
+                self.stop_feedback()
+                self._bus.stop_all_periodic_tasks()
+                self._bus.shutdown()
+                self._bus = None
+                ConnectionRegistry.unregister(self)
                 return True
             except Exception as e:
                 print(f"CAN disconnection failed: {e}")
         return False
 
-    @classmethod
-    def is_connected(cls) -> bool:
+    @connection_method
+    def is_connected(self) -> bool:
         """检查CAN总线是否已连接"""
-        return cls._bus is not None
+        return self._bus is not None
 
-    @classmethod
-    def send(cls, data, sleep_time=0.005) -> bool:
+    @connection_method
+    def send(self, data, sleep_time=0.005, arbitration_id: int = None) -> bool:
         """向CAN总线发送数据"""
-        if not cls.is_connected():
+        if not self.is_connected():
             raise ConnectionError("CAN bus not connected")
         
         try:
             msg = can.Message(
-                arbitration_id=0x123,  # 示例ID
+                arbitration_id=self.DEFAULT_ARBITRATION_ID if arbitration_id is None else arbitration_id,
                 data=data,
                 is_extended_id=False
             )
-            cls._bus.send(msg)
+            self._bus.send(msg)
             return True
         except Exception as e:
             print(f"CAN send failed: {e}")
             return False
 
-    @classmethod
-    def receive(cls, timeout=5, expected_signal=None):
+    @connection_method
+    def receive(self, timeout=5, expected_signal=None):
         """从CAN总线接收数据"""
-        if not cls.is_connected():
+        if not self.is_connected():
             raise ConnectionError("CAN bus not connected")
         
         try:
-            msg = cls._bus.recv(timeout=timeout)
+            # Notifier运行时由它独占总线接收，从缓冲读取器中取消息
+            if self._reader is not None:
+                msg = self._reader.get_message(timeout=timeout)
+            else:
+                msg = self._bus.recv(timeout=timeout)
             if msg is None:
                 print("No message received within timeout")
                 return None
@@ -94,17 +141,17 @@ class CanProtocol:
             print(f"CAN receive failed: {e}")
             return None
 
-    @classmethod
-    def execute_command(cls, command: Enum, *args, **kwargs) -> Any:
+    @connection_method
+    def execute_command(self, command: Enum, *args, **kwargs) -> Any:
         """执行CAN命令"""
-        if not cls.is_connected():
+        if not self.is_connected():
             raise ConnectionError("CAN bus not connected")
             
-        if command not in cls._COMMAND_MAP:
+        if command not in self._COMMAND_MAP:
             raise ValueError(f"Command {command.value} not supported")
             
         try:
-            can_id = int(cls._COMMAND_MAP[command], 16)
+            can_id = int(self._COMMAND_MAP[command], 16)
             data = []
             for arg in args:
                 if isinstance(arg, (list, tuple)):
@@ -117,10 +164,171 @@ class CanProtocol:
                 data=data,
                 is_extended_id=False
             )
-            cls._bus.send(msg)
+            self._bus.send(msg)
             
             if kwargs.get('wait_response', True):
-                return cls._bus.recv(timeout=1.0)
+                if self._reader is not None:
+                    return self._reader.get_message(timeout=1.0)
+                return self._bus.recv(timeout=1.0)
                 
         except Exception as e:
-            raise RuntimeError(f"CAN communication error: {e}")
\ No newline at end of file
+            raise RuntimeError(f"CAN communication error: {e}")
+
+    @connection_method
+    def start_feedback(self) -> bool:
+        """启动Notifier后台接收，反馈帧异步分发给订阅者，其余帧进入缓冲读取器"""
+        if not self.is_connected():
+            raise ConnectionError("CAN bus not connected")
+        with self._lock:
+            if self._notifier is not None:
+                return True
+            try:
+                self._reader = can.BufferedReader()
+                self._notifier = can.Notifier(self._bus, [self._dispatch])
+                return True
+            except Exception as e:
+                self._reader = None
+                print(f"CAN notifier failed: {e}")
+                return False
+
+    @connection_method
+    def stop_feedback(self):
+        """停止Notifier后台接收"""
+        with self._lock:
+            notifier, self._notifier = self._notifier, None
+            self._reader = None
+        if notifier is not None:
+            notifier.stop()
+
+    @connection_method
+    def subscribe(self, callback: Callable):
+        """订阅收到的CAN帧，callback(msg)在Notifier线程中调用"""
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    @connection_method
+    def unsubscribe(self, callback: Callable):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    @connection_method
+    def _dispatch(self, msg: can.Message):
+        """Notifier回调: 更新关节反馈并分发给订阅者"""
+        joint = msg.arbitration_id - self.FEEDBACK_BASE_ID
+        if 0 <= joint < self.MAX_JOINTS and len(msg.data) >= self.JOINT_FRAME.size:
+            self.joint_feedback[joint] = self.JOINT_FRAME.unpack_from(msg.data)[0]
+        else:
+            reader = self._reader
+            if reader is not None:
+                reader.on_message_received(msg)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(msg)
+            except Exception as e:
+                print(f"CAN subscriber error: {e}")
+
+    @classmethod
+    def _setpoint_messages(cls, angles) -> List[can.Message]:
+        """把一组关节角度拆分为每个关节一个设定值帧"""
+        return [
+            can.Message(
+                arbitration_id=cls.SETPOINT_BASE_ID + joint,
+                data=cls.JOINT_FRAME.pack(float(angle)),
+                is_extended_id=False
+            )
+            for joint, angle in enumerate(angles)
+        ]
+
+    @connection_method
+    def send_setpoints(self, angles) -> bool:
+        """发送一组关节设定值(度)"""
+        if not self.is_connected():
+            raise ConnectionError("CAN bus not connected")
+        try:
+            for msg in self._setpoint_messages(angles):
+                self._bus.send(msg)
+            return True
+        except Exception as e:
+            print(f"CAN send failed: {e}")
+            return False
+
+    @connection_method
+    def stream_trajectory(self, trajectory, rate: float = None, should_continue: Callable = None,
+                          on_progress: Callable = None) -> Tuple[int, bool]:
+        """按固定频率流式发送关节轨迹
+
+        每个关节的设定值帧由send_periodic周期发送，这里只按频率更新周期任务的数据，
+        因此发送时序由总线驱动保证，不受Python调度抖动影响。
+
+        Args:
+            trajectory: 轨迹点序列，每个点为关节角度列表(度)
+            rate: 设定值更新频率(Hz)，默认STREAM_RATE
+            should_continue: 返回False时停止发送
+            on_progress: 每个点生效后调用on_progress(index, point)
+
+        Returns:
+            (已发送的点数, 是否全部发送)
+        """
+        if not self.is_connected():
+            raise ConnectionError("CAN bus not connected")
+        if len(trajectory) == 0:
+            return 0, True
+        
+        period = 1.0 / (rate or self.STREAM_RATE)
+        tasks = []
+        sent = 0
+        try:
+            for msg in self._setpoint_messages(trajectory[0]):
+                tasks.append(self._bus.send_periodic(msg, period))
+            if on_progress is not None:
+                on_progress(0, trajectory[0])
+            sent = 1
+            
+            next_time = time.perf_counter() + period
+            for index in range(1, len(trajectory)):
+                if should_continue is not None and not should_continue():
+                    return sent, False
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -period:
+                    # should_continue中暂停过，从现在重新计时，不连续追发落下的点
+                    next_time = time.perf_counter()
+                for task, msg in zip(tasks, self._setpoint_messages(trajectory[index])):
+                    task.modify_data(msg)
+                sent += 1
+                if on_progress is not None:
+                    on_progress(index, trajectory[index])
+                next_time += period
+            # 最后一个设定值至少保持一个完整周期，周期任务的发送时刻与modify_data不同步，再多等一个周期
+            time.sleep(max(0.0, next_time - time.perf_counter()) + period)
+            return sent, True
+        except Exception as e:
+            print(f"CAN stream error: {e}")
+            return sent, False
+        finally:
+            for task in tasks:
+                task.stop()
+
+    @connection_method
+    def execute_trajectory(self, waypoints, timeout=5, should_continue: Callable = None,
+                           on_progress: Callable = None, is_paused: Callable = None) -> Tuple[int, bool]:
+        """执行整条轨迹，接口与SerialProtocol.execute_trajectory相同，用stream_trajectory按STREAM_RATE发送
+
+        CAN设定值帧没有应答，timeout不使用；is_paused返回True时周期任务保持当前设定值，恢复后继续。
+
+        Returns:
+            (已发送的点数, 是否全部发送)
+        """
+        def keep_going():
+            while is_paused is not None and is_paused():
+                if should_continue is not None and not should_continue():
+                    return False
+                time.sleep(0.05)
+            return should_continue is None or should_continue()
+
+        return self.stream_trajectory(list(waypoints), should_continue=keep_going, on_progress=on_progress)
@@ -0,0 +1,150 @@
+import threading
+
+
+class connection_method:
+    """连接方法装饰器
+
+    在连接实例上调用时作用于该连接；在协议类上调用时作用于该协议的默认连接，
+    因此原来的SerialProtocol.send(...)这类用法保持不变。
+    """
+
+    def __init__(self, func):
+        self.__func__ = func
+        self.__doc__ = func.__doc__
+        self.__name__ = func.__name__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            instance = owner.default()
+        return self.__func__.__get__(instance, owner)
+
+
+class ProtocolConnection:
+    """协议连接基类
+
+    每个实例是一条独立的连接，拥有自己的串口/总线和I/O线程；
+    通过协议类直接调用的方法作用于default()返回的默认连接。
+    """
+
+    _default = None
+    _default_lock = threading.RLock()
+
+    @classmethod
+    def default(cls):
+        """协议类的默认连接，首次使用时创建"""
+        with cls._default_lock:
+            # 只使用本类自己的默认连接，子类不共用父类的连接
+            default = cls.__dict__.get('_default')
+            if default is None:
+                default = cls()
+                cls._default = default
+            return default
+
+
+class ConnectionRegistry:
+    """已建立连接的注册表，按串口名或CAN通道索引
+
+    协议实例连接成功后自动登记、断开后注销，同一个端口只能被一个连接占用。
+    界面通过它选择发送目标，同一台电脑可以同时驱动多台机械臂。
+    """
+
+    _connections = {}          # {端口或通道: 连接}
+    _listeners = []
+    _lock = threading.Lock()
+
+    @classmethod
+    def register(cls, key, connection) -> bool:
+        """登记连接，端口已被其他连接占用时返回False"""
+        with cls._lock:
+            current = cls._connections.get(key)
+            if current is not None and current is not connection and current.is_connected():
+                return False
+            # 同一连接改连其他端口时移除旧的登记
+            for old_key in [k for k, v in cls._connections.items() if v is connection]:
+                del cls._connections[old_key]
+            cls._connections[key] = connection
+        cls._notify()
+        return True
+
+    @classmethod
+    def unregister(cls, connection):
+        """注销连接"""
+        with cls._lock:
+            keys = [k for k, v in cls._connections.items() if v is connection]
+            for key in keys:
+                del cls._connections[key]
+        if keys:
+            cls._notify()
+
+    @classmethod
+    def is_available(cls, key, connection=None) -> bool:
+        """端口是否未被connection以外的连接占用"""
+        with cls._lock:
+            current = cls._connections.get(key)
+        return current is None or current is connection or not current.is_connected()
+
+    @classmethod
+    def get(cls, key):
+        """返回端口上的连接，没有时返回None"""
+        with cls._lock:
+            return cls._connections.get(key)
+
+    @classmethod
+    def keys(cls) -> list:
+        """已登记的端口和通道"""
+        with cls._lock:
+            return list(cls._connections)
+
+    @classmethod
+    def open(cls, protocol_class, key, *args, **kwargs):
+        """返回端口上已有的连接，没有时创建protocol_class的新连接
+
+        Returns:
+            连接实例，连接失败时返回None
+        """
+        connection = cls.get(key)
+        if connection is not None and connection.is_connected():
+            if not isinstance(connection, protocol_class):
+                raise ValueError(f"{key} is already connected with {type(connection).__name__}")
+            return connection
+        connection = protocol_class()
+        return connection if connection.connect(key, *args, **kwargs) else None
+
+    @classmethod
+    def close(cls, key) -> bool:
+        """断开并注销端口上的连接"""
+        connection = cls.get(key)
+        if connection is None:
+            return False
+        result = connection.disconnect()
+        cls.unregister(connection)
+        return result
+
+    @classmethod
+    def close_all(cls):
+        """断开所有连接"""
+        for key in cls.keys():
+            cls.close(key)
+
+    @classmethod
+    def add_listener(cls, callback):
+        """注册表变化时调用callback()，在建立或断开连接的线程中执行"""
+        with cls._lock:
+            if callback not in cls._listeners:
+                cls._listeners.append(callback)
+
+    @classmethod
+    def remove_listener(cls, callback):
+        with cls._lock:
+            if callback in cls._listeners:
+                cls._listeners.remove(callback)
+
+    @classmethod
+    def _notify(cls):
+        with cls._lock:
+            listeners = list(cls._listeners)
+        for callback in listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Connection listener error: {e}")
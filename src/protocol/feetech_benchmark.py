@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Feetech接收解析性能测试
+在pty回环上比较逐字节读取的旧实现与缓冲区解析的新实现每秒能解析的数据包数量(仅支持Linux/macOS)
+"""
+
+import os
+import threading
+import time
+import tty
+
+import serial
+
+from feetech_protocol import FeetechProtocol
+
+PACKET_COUNT = 5000
+
+
+def legacy_receive(ser, timeout=1.0):
+    """旧的逐字节接收实现，用于对比"""
+    start_time = time.time()
+    received_data = []
+
+    while time.time() - start_time < timeout:
+        if ser.in_waiting > 0:
+            byte = ser.read(1)
+            if byte:
+                received_data.append(ord(byte))
+                if len(received_data) >= 4:
+                    if received_data[0] == 0xFF and received_data[1] == 0xFF:
+                        expected_packet_length = received_data[3] + 4
+                        if len(received_data) >= expected_packet_length:
+                            packet = received_data[:expected_packet_length]
+                            if packet[-1] == FeetechProtocol._calculate_checksum(packet[:-1]):
+                                return packet, True
+                            received_data = []
+        time.sleep(0.001)
+
+    return received_data, False
+
+
+def feed_packets(fd, count):
+    """模拟舵机连续返回状态包"""
+    packet = bytes(FeetechProtocol._create_packet(1, 0, [0x00, 0x02, 0x03, 0x00, 0x05, 0x00, 120, 40]))
+    data = packet * count
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view[:4096])
+        view = view[written:]
+
+
+def run(name, receive_func, count=PACKET_COUNT):
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    ser = serial.Serial(os.ttyname(slave), baudrate=FeetechProtocol.FEETECH_BAUDRATE, timeout=1.0)
+    writer = threading.Thread(target=feed_packets, args=(master, count), daemon=True)
+    try:
+        received = 0
+        start = time.perf_counter()
+        writer.start()
+        while received < count:
+            _, success = receive_func(ser)
+            if not success:
+                break
+            received += 1
+        elapsed = time.perf_counter() - start
+        print(f"{name:8s}: {received}/{count} packets in {elapsed:.3f}s, {received / elapsed:.0f} packets/s")
+    finally:
+        ser.close()
+        os.close(master)
+        os.close(slave)
+
+
+def buffered_receive(ser):
+    connection = FeetechProtocol.default()
+    connection._serial = ser
+    return connection.receive(timeout=1.0)
+
+
+def main():
+    """主函数 - 依次测试两种实现"""
+    FeetechProtocol.default()._rx_buffer.clear()
+    run("legacy", legacy_receive, count=PACKET_COUNT // 10)
+    run("buffered", buffered_receive)
+
+
+if __name__ == "__main__":
+    main()
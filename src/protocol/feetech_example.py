@@ -25,11 +25,10 @@ def main():
     try:
         # 2. 扫描舵机
         print("\n=== 扫描舵机 ===")
-        servo_ids = []
-        for servo_id in range(1, 11):  # 扫描ID 1-10
-            if FeetechProtocol.ping(servo_id):
-                print(f"发现舵机 ID: {servo_id}")
-                servo_ids.append(servo_id)
+        topology = FeetechProtocol.scan(baudrates=[baudrate], id_range=range(1, 11))  # 扫描ID 1-10
+        servo_ids = topology.get(baudrate, [])
+        for servo_id in servo_ids:
+            print(f"发现舵机 ID: {servo_id}")
         
         if not servo_ids:
             print("未发现任何舵机！")
@@ -127,11 +126,12 @@ def test_multiple_servos():
         return
     
     try:
-        # 扫描所有舵机
+        # 扫描所有波特率上的舵机
+        topology = FeetechProtocol.scan()
         servo_ids = []
-        for servo_id in range(1, 255):
-            if FeetechProtocol.ping(servo_id):
-                servo_ids.append(servo_id)
+        for baudrate, ids in topology.items():
+            print(f"波特率 {baudrate}: {ids}")
+            servo_ids.extend(ids)
         
         print(f"发现 {len(servo_ids)} 个舵机: {servo_ids}")
         
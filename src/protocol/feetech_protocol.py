@@ -1,8 +1,16 @@
 import serial
+import struct
+import numpy as np
 from enum import Enum
-from typing import Any, List, Tuple
+from typing import Any, Callable, List, Tuple
 import time
 
+try:
+    from protocol.connection_registry import ConnectionRegistry, ProtocolConnection, connection_method
+except ImportError:
+    # 在protocol目录下直接运行示例脚本时
+    from connection_registry import ConnectionRegistry, ProtocolConnection, connection_method
+
 class FeetechCommands(Enum):
     """Feetech协议支持的命令"""
     # 基础控制命令
@@ -13,9 +21,11 @@ class FeetechCommands(Enum):
     ACTION         = "ACTION"        # 执行异步写入
     RESET          = "RESET"         # 重置舵机
     SYNC_WRITE     = "SYNC_WRITE"    # 同步写入多个舵机
+    SYNC_READ      = "SYNC_READ"     # 同步读取多个舵机
     
     # 位置控制命令
     SET_POSITION   = "SET_POSITION"  # 设置目标位置
+    SET_POSITIONS_SYNC = "SET_POSITIONS_SYNC"  # 同步设置多个舵机目标位置
     GET_POSITION   = "GET_POSITION"  # 获取当前位置
     SET_SPEED      = "SET_SPEED"     # 设置移动速度
     GET_SPEED      = "GET_SPEED"     # 获取当前速度
@@ -37,6 +47,7 @@ class FeetechCommands(Enum):
     GET_VOLTAGE    = "GET_VOLTAGE"   # 获取电压
     GET_TEMP       = "GET_TEMP"      # 获取温度
     GET_STATUS     = "GET_STATUS"    # 获取状态
+    GET_STATUS_MANY = "GET_STATUS_MANY"  # 一次获取多个舵机状态
     
     # 高级功能命令
     SET_ANGLE_LIMIT = "SET_ANGLE_LIMIT"  # 设置角度限制
@@ -49,8 +60,8 @@ class FeetechCommands(Enum):
     SET_MOTOR_MODE  = "SET_MOTOR_MODE"   # 设置电机模式
     SET_PWM_MODE    = "SET_PWM_MODE"     # 设置PWM模式
 
-class FeetechProtocol:
-    """Feetech通信协议实现"""
+class FeetechProtocol(ProtocolConnection):
+    """Feetech通信协议实现，每个实例是一条舵机总线连接，通过类调用时使用默认连接"""
     
     # 协议常量
     PACKET_HEADER = [0xFF, 0xFF]
@@ -60,7 +71,9 @@ class FeetechProtocol:
     INSTRUCTION_REG_WRITE = 0x04
     INSTRUCTION_ACTION = 0x05
     INSTRUCTION_RESET = 0x06
+    INSTRUCTION_SYNC_READ = 0x82
     INSTRUCTION_SYNC_WRITE = 0x83
+    BROADCAST_ID = 0xFE
     
     # 内存地址常量
     ADDR_ID = 5
@@ -68,20 +81,47 @@ class FeetechProtocol:
     ADDR_TORQUE_ENABLE = 24
     ADDR_GOAL_POSITION = 30
     ADDR_GOAL_SPEED = 32
+    # 目标位置和目标速度连续，SYNC_WRITE一次写入4字节
+    GOAL_BLOCK_LENGTH = ADDR_GOAL_SPEED + 2 - ADDR_GOAL_POSITION
+    POSITION_MAX = 1023            # 位置范围通常是0-1023或0-4095，取决于舵机型号
+    SPEED_MAX = 1023
     ADDR_PRESENT_POSITION = 36
     ADDR_PRESENT_SPEED = 38
     ADDR_PRESENT_LOAD = 40
     ADDR_PRESENT_VOLTAGE = 42
     ADDR_PRESENT_TEMPERATURE = 43
+    # 位置、速度、负载、电压、温度在内存中连续，一次读取即可
+    STATUS_BLOCK_LENGTH = ADDR_PRESENT_TEMPERATURE - ADDR_PRESENT_POSITION + 1
+
+    # get_status_many返回的结构化数组类型
+    STATUS_DTYPE = np.dtype([
+        ('id', np.uint8),
+        ('position', np.uint16),
+        ('speed', np.uint16),
+        ('load', np.uint16),
+        ('voltage', np.float32),
+        ('temperature', np.uint8),
+        ('connected', np.bool_),
+    ])
     
     # 默认配置
     FEETECH_BAUDRATE = 1000000
     DEFAULT_TIMEOUT = 1.0
+    SYNC_READ_TIMEOUT = 0.02       # SYNC_READ基础等待时间(秒)
+    SYNC_READ_TIMEOUT_PER_ID = 0.002  # 每个舵机应答额外等待时间(秒)
+    FALLBACK_READ_TIMEOUT = 0.05   # 不支持SYNC_READ时逐个读取的超时(秒)
+    RECEIVE_POLL_INTERVAL = 0.0002 # 串口无数据时的等待间隔(秒)
+    STREAM_RATE = 50               # 轨迹流式发送默认控制频率(Hz)
+    
+    # 总线扫描参数
+    COMMON_BAUDRATES = [1000000, 500000, 250000, 128000, 115200, 76800, 57600, 38400]
+    SCAN_ID_RANGE = range(0, 253)
+    SCAN_RESPONSE_LATENCY = 0.003  # USB转串口延迟 + 舵机应答延迟(秒)
+    BROADCAST_PING_WINDOW = 0.05   # 广播PING收集应答的时间(秒)
     
-    _serial = None
-    port = None
-    baudrate = FEETECH_BAUDRATE
     timeout = DEFAULT_TIMEOUT
+    _sync_write_templates = {}     # {舵机ID元组: (数据包模板, 数据打包格式)}，模板只读
+    _topology_cache = {}           # {串口: {(波特率元组, ID元组): {波特率: [舵机ID]}}}
 
     _COMMAND_MAP = {
         FeetechCommands.PING: INSTRUCTION_PING,
@@ -91,39 +131,58 @@ class FeetechProtocol:
         FeetechCommands.ACTION: INSTRUCTION_ACTION,
         FeetechCommands.RESET: INSTRUCTION_RESET,
         FeetechCommands.SYNC_WRITE: INSTRUCTION_SYNC_WRITE,
+        FeetechCommands.SYNC_READ: INSTRUCTION_SYNC_READ,
     }
 
-    @classmethod
-    def connect(cls, port: str, baudrate: int = 1000000) -> bool:
-        """建立串口连接"""
-        cls.port = port
-        cls.baudrate = baudrate
+    def __init__(self):
+        self._serial = None
+        self.port = None
+        self.baudrate = self.FEETECH_BAUDRATE
+        self._sync_read_supported = None    # None表示尚未探测
+        self._rx_buffer = bytearray()       # 接收缓冲区，跨多次receive复用
+
+    @connection_method
+    def connect(self, port: str, baudrate: int = 1000000, capture=None) -> bool:
+        """建立串口连接，capture为收发记录文件或目录(见protocol.serial_trace)"""
+        if not ConnectionRegistry.is_available(port, self):
+            print(f"Feetech connection error: {port} is already in use")
+            return False
+        self.port = port
+        self.baudrate = baudrate
         try:
-            cls._serial = serial.Serial(
-                port=cls.port,
-                baudrate=cls.baudrate,
-                timeout=cls.timeout,
+            self._serial = serial.Serial(
+                port=self.port,
+                baudrate=self.baudrate,
+                timeout=self.timeout,
                 bytesize=serial.EIGHTBITS,
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE
             )
-            cls._serial.setDTR(False)
-            cls._serial.setRTS(False)
+            self._serial.setDTR(False)
+            self._serial.setRTS(False)
             # 清空缓冲区
-            cls._serial.reset_input_buffer()
-            cls._serial.reset_output_buffer()
+            self._serial.reset_input_buffer()
+            self._serial.reset_output_buffer()
+            if capture:
+                # 只在需要记录时导入，本模块仍可在protocol目录下单独使用
+                from protocol.serial_trace import SerialCapture, TraceWriter
+                self._serial = SerialCapture(self._serial, TraceWriter.create(capture, port=port, baudrate=baudrate))
+            self._sync_read_supported = None
+            self._rx_buffer.clear()
+            ConnectionRegistry.register(port, self)
             return True
         except Exception as e:
             print(f"Feetech connection error: {e}")
             return False
 
-    @classmethod
-    def disconnect(cls) -> bool:
+    @connection_method
+    def disconnect(self) -> bool:
         """断开串口连接"""
-        if cls._serial and cls._serial.is_open:
+        if self._serial and self._serial.is_open:
             try:
-                cls._serial.close()
-                cls._serial = None
+                self._serial.close()
+                self._serial = None
+                ConnectionRegistry.unregister(self)
                 return True
             except Exception as e:
                 print(f"Feetech disconnection error: {e}")
@@ -154,13 +213,13 @@ class FeetechProtocol:
         
         return packet
 
-    @classmethod
-    def send(cls, packet: List[int], sleep_time: float = 0.005) -> bool:
+    @connection_method
+    def send(self, packet: List[int], sleep_time: float = 0.005) -> bool:
         """发送数据包"""
         try:
-            if cls._serial and cls._serial.is_open:
+            if self._serial and self._serial.is_open:
                 data = bytes(packet)
-                cls._serial.write(data)
+                self._serial.write(data)
                 if sleep_time > 0:
                     time.sleep(sleep_time)
                 return True
@@ -169,74 +228,212 @@ class FeetechProtocol:
             print(f"Feetech send error: {e}")
             return False
 
-    @classmethod
-    def receive(cls, timeout: float = 5.0, expected_length: int = None) -> Tuple[List[int], bool]:
-        """接收数据包"""
-        if not cls._serial or not cls._serial.is_open:
-            return [], False
+    @connection_method
+    def receive(self, timeout: float = 5.0, expected_length: int = None) -> Tuple[bytes, bool]:
+        """接收数据包
+
+        一次读取所有可用字节到接收缓冲区，再从缓冲区中解析出完整的数据包。
+
+        Returns:
+            (数据包, 是否成功)，数据包为bytes，可按下标和切片访问各字段
+        """
+        if not self._serial or not self._serial.is_open:
+            return b"", False
         
-        start_time = time.time()
-        received_data = []
-        
-        while time.time() - start_time < timeout:
-            if cls._serial.in_waiting > 0:
-                byte = cls._serial.read(1)
-                if byte:
-                    received_data.append(ord(byte))
-                    
-                    # 检查是否接收到完整数据包
-                    if len(received_data) >= 4:  # 最小包长度
-                        # 检查包头
-                        if received_data[0] == 0xFF and received_data[1] == 0xFF:
-                            expected_packet_length = received_data[3] + 4  # 长度字段 + 头部
-                            if len(received_data) >= expected_packet_length:
-                                # 验证校验和
-                                packet = received_data[:expected_packet_length]
-                                calculated_checksum = cls._calculate_checksum(packet[:-1])
-                                if packet[-1] == calculated_checksum:
-                                    return packet, True
-                                else:
-                                    print(f"Checksum error: expected {calculated_checksum}, got {packet[-1]}")
-                                    received_data = []
-            time.sleep(0.001)
-        
-        return received_data, False
+        deadline = time.time() + timeout
+        while True:
+            packet = self._parse_packet()
+            if packet is not None:
+                return packet, True
+            
+            waiting = self._serial.in_waiting
+            if waiting > 0:
+                self._rx_buffer += self._serial.read(waiting)
+                continue
+            
+            if time.time() >= deadline:
+                # 超时丢弃不完整的数据，避免与后续应答混淆
+                received_data = bytes(self._rx_buffer)
+                self._rx_buffer.clear()
+                return received_data, False
+            time.sleep(self.RECEIVE_POLL_INTERVAL)
 
-    @classmethod
-    def clear_serial_buffer(cls):
+    @connection_method
+    def _parse_packet(self):
+        """从接收缓冲区解析一个完整的数据包，没有完整数据包时返回None"""
+        buffer = self._rx_buffer
+        while True:
+            start = buffer.find(b"\xff\xff")
+            if start < 0:
+                # 保留末尾可能是包头第一个字节的0xFF
+                del buffer[:len(buffer) - 1 if buffer.endswith(b"\xff") else len(buffer)]
+                return None
+            if start > 0:
+                del buffer[:start]
+            if len(buffer) < 4:
+                return None
+            
+            # ID不会是0xFF，连续的0xFF说明包头前有多余字节
+            if buffer[2] == 0xFF:
+                del buffer[:1]
+                continue
+            length = buffer[3]
+            if length < 2:
+                del buffer[:2]
+                continue
+            packet_length = length + 4  # 长度字段 + 头部
+            if len(buffer) < packet_length:
+                return None
+            
+            with memoryview(buffer) as view:
+                calculated_checksum = (~sum(view[2:packet_length - 1])) & 0xFF
+                valid = calculated_checksum == view[packet_length - 1]
+                packet = bytes(view[:packet_length]) if valid else None
+            if valid:
+                del buffer[:packet_length]
+                return packet
+            
+            print(f"Checksum error: expected {calculated_checksum}, got {buffer[packet_length - 1]}")
+            # 跳过这个包头，从后面重新同步
+            del buffer[:2]
+
+    @connection_method
+    def clear_serial_buffer(self):
         """清空串口缓冲区"""
-        if cls._serial and cls._serial.is_open:
-            cls._serial.reset_input_buffer()
-            cls._serial.reset_output_buffer()
+        self._rx_buffer.clear()
+        if self._serial and self._serial.is_open:
+            self._serial.reset_input_buffer()
+            self._serial.reset_output_buffer()
 
-    @classmethod
-    def is_connected(cls) -> bool:
+    @connection_method
+    def is_connected(self) -> bool:
         """检查连接状态"""
-        return cls._serial is not None and cls._serial.is_open
+        return self._serial is not None and self._serial.is_open
 
-    @classmethod
-    def ping(cls, servo_id: int) -> bool:
+    @connection_method
+    def ping(self, servo_id: int, timeout: float = 1.0) -> bool:
         """发送PING命令检测舵机"""
-        if not cls.is_connected():
+        if not self.is_connected():
             return False
         
-        packet = cls._create_packet(servo_id, cls.INSTRUCTION_PING)
-        if cls.send(packet):
-            response, success = cls.receive(timeout=1.0)
+        packet = self._create_packet(servo_id, self.INSTRUCTION_PING)
+        if self.send(packet):
+            response, success = self.receive(timeout=timeout)
             return success and len(response) >= 6
         return False
 
     @classmethod
-    def read_data(cls, servo_id: int, address: int, length: int = 1) -> Tuple[List[int], bool]:
+    def _ping_timeout(cls, baudrate: int) -> float:
+        """根据波特率计算单个PING的等待时间: 请求和应答各6字节，每字节10位"""
+        return 12 * 10 / baudrate + cls.SCAN_RESPONSE_LATENCY
+
+    @connection_method
+    def _set_baudrate(self, baudrate: int):
+        """切换当前串口波特率并清空缓冲区"""
+        self._serial.baudrate = baudrate
+        self.baudrate = baudrate
+        self.clear_serial_buffer()
+
+    @connection_method
+    def _broadcast_ping(self) -> bool:
+        """广播PING，判断当前波特率上是否有舵机
+
+        多个舵机同时应答会在总线上冲突，可能一个校验正确的应答都没有，
+        因此窗口内收到任何字节都视为有舵机，完整列表由逐个PING确定。
+        """
+        packet = self._create_packet(self.BROADCAST_ID, self.INSTRUCTION_PING)
+        if not self.send(packet, sleep_time=0):
+            return False
+        received = 0
+        deadline = time.time() + self.BROADCAST_PING_WINDOW
+        while time.time() < deadline:
+            waiting = self._serial.in_waiting
+            if waiting > 0:
+                received += len(self._serial.read(waiting))
+            else:
+                time.sleep(self.RECEIVE_POLL_INTERVAL)
+        self.clear_serial_buffer()
+        return received > 0
+
+    @connection_method
+    def _sweep_ids(self, id_range, timeout: float) -> List[int]:
+        """逐个PING ID，使用按波特率计算的短超时"""
+        found = []
+        for servo_id in id_range:
+            packet = self._create_packet(servo_id, self.INSTRUCTION_PING)
+            if not self.send(packet, sleep_time=0):
+                break
+            response, success = self.receive(timeout=timeout)
+            # 忽略上一个ID迟到的应答
+            if success and response[2] == servo_id:
+                found.append(servo_id)
+        return found
+
+    @connection_method
+    def scan(self, baudrates: List[int] = None, id_range=None, broadcast: bool = True,
+             use_cache: bool = True) -> dict:
+        """扫描当前串口上的舵机
+
+        依次尝试各个波特率。开启broadcast时先广播PING，没有收到任何字节的波特率直接跳过，
+        否则再用短超时逐个PING得到完整的ID列表。扫描结果按串口、波特率和ID范围缓存。
+        扫描结束后若只在一个波特率上发现舵机，串口保持在该波特率，否则恢复原波特率。
+
+        Args:
+            baudrates: 要尝试的波特率，默认COMMON_BAUDRATES
+            id_range: 要扫描的ID，默认SCAN_ID_RANGE
+            broadcast: 是否使用广播PING跳过没有舵机的波特率
+            use_cache: 是否直接返回相同参数的缓存结果
+
+        Returns:
+            {波特率: [舵机ID]}，只包含发现了舵机的波特率
+        """
+        if not self.is_connected():
+            return {}
+        baudrates = baudrates or self.COMMON_BAUDRATES
+        id_range = id_range if id_range is not None else self.SCAN_ID_RANGE
+        cache_key = (tuple(baudrates), tuple(id_range))
+        cached = self._topology_cache.get(self.port, {}).get(cache_key)
+        if use_cache and cached is not None:
+            if len(cached) == 1:
+                self._set_baudrate(next(iter(cached)))
+            return {baudrate: list(servo_ids) for baudrate, servo_ids in cached.items()}
+        
+        original_baudrate = self.baudrate
+        topology = {}
+        try:
+            for baudrate in baudrates:
+                self._set_baudrate(baudrate)
+                if broadcast and not self._broadcast_ping():
+                    continue
+                servo_ids = self._sweep_ids(id_range, self._ping_timeout(baudrate))
+                if servo_ids:
+                    topology[baudrate] = servo_ids
+        except Exception as e:
+            print(f"Feetech scan error: {e}")
+        
+        self._set_baudrate(next(iter(topology)) if len(topology) == 1 else original_baudrate)
+        self._topology_cache.setdefault(self.port, {})[cache_key] = topology
+        return {baudrate: list(servo_ids) for baudrate, servo_ids in topology.items()}
+
+    @classmethod
+    def clear_topology_cache(cls, port: str = None):
+        """清除扫描缓存，port为None时清除所有串口"""
+        if port is None:
+            cls._topology_cache.clear()
+        else:
+            cls._topology_cache.pop(port, None)
+
+    @connection_method
+    def read_data(self, servo_id: int, address: int, length: int = 1, timeout: float = 1.0) -> Tuple[List[int], bool]:
         """读取舵机数据"""
-        if not cls.is_connected():
+        if not self.is_connected():
             return [], False
         
         parameters = [address, length]
-        packet = cls._create_packet(servo_id, cls.INSTRUCTION_READ, parameters)
+        packet = self._create_packet(servo_id, self.INSTRUCTION_READ, parameters)
         
-        if cls.send(packet):
-            response, success = cls.receive(timeout=1.0)
+        if self.send(packet):
+            response, success = self.receive(timeout=timeout)
             if success and len(response) >= 6:
                 # 提取参数数据
                 param_length = response[3] - 2  # 减去指令和校验和
@@ -244,56 +441,188 @@ class FeetechProtocol:
                     return response[5:5+param_length], True
         return [], False
 
-    @classmethod
-    def write_data(cls, servo_id: int, address: int, data: List[int]) -> bool:
+    @connection_method
+    def write_data(self, servo_id: int, address: int, data: List[int]) -> bool:
         """写入舵机数据"""
-        if not cls.is_connected():
+        if not self.is_connected():
             return False
         
         parameters = [address] + data
-        packet = cls._create_packet(servo_id, cls.INSTRUCTION_WRITE, parameters)
+        packet = self._create_packet(servo_id, self.INSTRUCTION_WRITE, parameters)
         
-        if cls.send(packet):
-            response, success = cls.receive(timeout=1.0)
+        if self.send(packet):
+            response, success = self.receive(timeout=1.0)
             return success
         return False
 
-    @classmethod
-    def set_position(cls, servo_id: int, position: int, speed: int = 0) -> bool:
+    @connection_method
+    def set_position(self, servo_id: int, position: int, speed: int = 0) -> bool:
         """设置舵机位置"""
-        # 位置范围通常是0-1023或0-4095，取决于舵机型号
-        position = max(0, min(position, 1023))
-        speed = max(0, min(speed, 1023))
+        position = max(0, min(position, self.POSITION_MAX))
+        speed = max(0, min(speed, self.SPEED_MAX))
         
         # 写入目标位置
         pos_data = [position & 0xFF, (position >> 8) & 0xFF]
-        if not cls.write_data(servo_id, cls.ADDR_GOAL_POSITION, pos_data):
+        if not self.write_data(servo_id, self.ADDR_GOAL_POSITION, pos_data):
             return False
         
         # 如果指定了速度，也设置速度
         if speed > 0:
             speed_data = [speed & 0xFF, (speed >> 8) & 0xFF]
-            return cls.write_data(servo_id, cls.ADDR_GOAL_SPEED, speed_data)
+            return self.write_data(servo_id, self.ADDR_GOAL_SPEED, speed_data)
         
         return True
 
     @classmethod
-    def get_position(cls, servo_id: int) -> Tuple[int, bool]:
+    def _get_sync_write_template(cls, servo_ids: tuple):
+        """获取SYNC_WRITE目标位置/速度数据包模板，按舵机ID组合缓存"""
+        cached = cls._sync_write_templates.get(servo_ids)
+        if cached is None:
+            parameters = [cls.ADDR_GOAL_POSITION, cls.GOAL_BLOCK_LENGTH]
+            for servo_id in servo_ids:
+                parameters += [servo_id] + [0] * cls.GOAL_BLOCK_LENGTH
+            template = bytes(cls._create_packet(cls.BROADCAST_ID, cls.INSTRUCTION_SYNC_WRITE, parameters))
+            # 每个舵机: ID + 位置(uint16 LE) + 速度(uint16 LE)
+            packer = struct.Struct("<" + "BHH" * len(servo_ids))
+            cached = (template, packer)
+            cls._sync_write_templates[servo_ids] = cached
+        return cached
+
+    @connection_method
+    def set_positions_sync(self, servo_ids: List[int], positions: List[int], speeds=0) -> bool:
+        """用一个SYNC_WRITE数据包同时设置多个舵机的目标位置和速度
+
+        Args:
+            servo_ids: 舵机ID列表
+            positions: 与servo_ids对应的目标位置
+            speeds: 与servo_ids对应的速度，或所有舵机共用的一个速度
+        """
+        if not self.is_connected():
+            return False
+        
+        servo_ids = tuple(servo_ids)
+        if len(positions) != len(servo_ids):
+            raise ValueError("positions must match servo_ids")
+        if isinstance(speeds, (int, float)):
+            speeds = [speeds] * len(servo_ids)
+        elif len(speeds) != len(servo_ids):
+            raise ValueError("speeds must match servo_ids")
+        
+        template, packer = self._get_sync_write_template(servo_ids)
+        # 模板在实例和线程间共享，每次复制后再填写
+        frame = bytearray(template)
+        values = []
+        for servo_id, position, speed in zip(servo_ids, positions, speeds):
+            values.append(servo_id)
+            values.append(max(0, min(int(position), self.POSITION_MAX)))
+            values.append(max(0, min(int(speed), self.SPEED_MAX)))
+        # 参数从包头(2) + ID + 长度 + 指令 + 地址 + 数据长度之后开始
+        packer.pack_into(frame, 7, *values)
+        frame[-1] = (~sum(memoryview(frame)[2:-1])) & 0xFF
+        
+        # SYNC_WRITE为广播写入，舵机不返回应答
+        return self.send(frame, sleep_time=0)
+
+    @connection_method
+    def stream_trajectory(self, servo_ids: List[int], trajectory, rate: float = None, speeds=0,
+                          to_position: Callable = None, should_continue: Callable = None,
+                          on_progress: Callable = None) -> Tuple[int, bool]:
+        """按固定控制频率流式发送关节轨迹，每个点一个SYNC_WRITE数据包
+
+        Args:
+            servo_ids: 舵机ID列表
+            trajectory: 轨迹点序列，如planner.plan(...).trajectory
+            rate: 控制频率(Hz)，默认STREAM_RATE
+            to_position: 把一个轨迹点转换为舵机位置列表，默认轨迹点已是舵机位置
+            should_continue: 返回False时停止发送
+            on_progress: 每个点发送后调用on_progress(index, point)
+
+        Returns:
+            (已发送的点数, 是否全部发送)
+        """
+        period = 1.0 / (rate or self.STREAM_RATE)
+        next_time = time.perf_counter()
+        sent = 0
+        for index, point in enumerate(trajectory):
+            if should_continue is not None and not should_continue():
+                return sent, False
+            positions = to_position(point) if to_position is not None else point
+            if not self.set_positions_sync(servo_ids, positions, speeds):
+                return sent, False
+            sent += 1
+            if on_progress is not None:
+                on_progress(index, point)
+            
+            # 按绝对时间调度，发送耗时不会累积成漂移；落后时不再等待
+            next_time += period
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_time = time.perf_counter()
+        return sent, True
+
+    @connection_method
+    def get_position(self, servo_id: int) -> Tuple[int, bool]:
         """获取舵机当前位置"""
-        data, success = cls.read_data(servo_id, cls.ADDR_PRESENT_POSITION, 2)
+        data, success = self.read_data(servo_id, self.ADDR_PRESENT_POSITION, 2)
         if success and len(data) >= 2:
             position = data[0] + (data[1] << 8)
             return position, True
         return 0, False
 
-    @classmethod
-    def set_torque_enable(cls, servo_id: int, enable: bool) -> bool:
+    @connection_method
+    def set_torque_enable(self, servo_id: int, enable: bool) -> bool:
         """设置扭矩使能"""
         data = [1 if enable else 0]
-        return cls.write_data(servo_id, cls.ADDR_TORQUE_ENABLE, data)
+        return self.write_data(servo_id, self.ADDR_TORQUE_ENABLE, data)
+
+    @connection_method
+    def sync_read(self, servo_ids: List[int], address: int, length: int, timeout: float = None) -> dict:
+        """SYNC_READ一次读取多个舵机同一地址段的数据
+
+        Returns:
+            {servo_id: data}，未应答的舵机不在结果中
+        """
+        results = {}
+        servo_ids = list(servo_ids)
+        if not servo_ids or not self.is_connected():
+            return results
+        if timeout is None:
+            timeout = self.SYNC_READ_TIMEOUT + self.SYNC_READ_TIMEOUT_PER_ID * len(servo_ids)
+        
+        packet = self._create_packet(self.BROADCAST_ID, self.INSTRUCTION_SYNC_READ, [address, length] + servo_ids)
+        if not self.send(packet, sleep_time=0):
+            return results
+        
+        # 舵机按ID顺序依次应答，每个应答是一个独立的状态包
+        pending = set(servo_ids)
+        deadline = time.time() + timeout
+        while pending:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            response, success = self.receive(timeout=remaining)
+            if not success:
+                break
+            servo_id = response[2]
+            if servo_id in pending and response[3] - 2 >= length:
+                results[servo_id] = response[5:5 + length]
+                pending.discard(servo_id)
+        return results
 
     @classmethod
-    def get_status(cls, servo_id: int) -> dict:
+    def _decode_status(cls, data: List[int]) -> tuple:
+        """解析位置到温度的连续数据块，返回(position, speed, load, voltage, temperature)"""
+        position = data[0] + (data[1] << 8)
+        speed = data[2] + (data[3] << 8)
+        load = data[4] + (data[5] << 8)
+        voltage = data[6] / 10.0  # 通常电压值需要除以10
+        temperature = data[7]
+        return position, speed, load, voltage, temperature
+
+    @connection_method
+    def get_status(self, servo_id: int) -> dict:
         """获取舵机状态信息"""
         status = {
             'position': 0,
@@ -304,86 +633,112 @@ class FeetechProtocol:
             'connected': False
         }
         
-        # 检测舵机连接
-        if not cls.ping(servo_id):
+        # 一次读取位置到温度的连续区域，能读到即表示舵机在线
+        data, success = self.read_data(servo_id, self.ADDR_PRESENT_POSITION, self.STATUS_BLOCK_LENGTH)
+        if not success or len(data) < self.STATUS_BLOCK_LENGTH:
             return status
         
         status['connected'] = True
+        (status['position'], status['speed'], status['load'],
+         status['voltage'], status['temperature']) = self._decode_status(data)
+        return status
+
+    @connection_method
+    def get_status_many(self, servo_ids: List[int]) -> np.ndarray:
+        """一次总线事务获取多个舵机的状态
+
+        优先使用SYNC_READ；舵机不支持时退回到每个舵机一次连续读取。
+
+        Returns:
+            STATUS_DTYPE结构化数组，与servo_ids一一对应，未应答的舵机connected为False
+        """
+        servo_ids = list(servo_ids)
+        status = np.zeros(len(servo_ids), dtype=self.STATUS_DTYPE)
+        status['id'] = servo_ids
+        if not servo_ids or not self.is_connected():
+            return status
         
-        # 读取位置
-        position, success = cls.get_position(servo_id)
-        if success:
-            status['position'] = position
-        
-        # 读取速度
-        data, success = cls.read_data(servo_id, cls.ADDR_PRESENT_SPEED, 2)
-        if success and len(data) >= 2:
-            status['speed'] = data[0] + (data[1] << 8)
-        
-        # 读取负载
-        data, success = cls.read_data(servo_id, cls.ADDR_PRESENT_LOAD, 2)
-        if success and len(data) >= 2:
-            status['load'] = data[0] + (data[1] << 8)
-        
-        # 读取电压
-        data, success = cls.read_data(servo_id, cls.ADDR_PRESENT_VOLTAGE, 1)
-        if success and len(data) >= 1:
-            status['voltage'] = data[0] / 10.0  # 通常电压值需要除以10
+        blocks = {}
+        if self._sync_read_supported is not False:
+            blocks = self.sync_read(servo_ids, self.ADDR_PRESENT_POSITION, self.STATUS_BLOCK_LENGTH)
         
-        # 读取温度
-        data, success = cls.read_data(servo_id, cls.ADDR_PRESENT_TEMPERATURE, 1)
-        if success and len(data) >= 1:
-            status['temperature'] = data[0]
+        if blocks:
+            self._sync_read_supported = True
+        elif self._sync_read_supported is not True:
+            # SYNC_READ无应答且尚未确认支持，逐个连续读取
+            self.clear_serial_buffer()
+            for servo_id in servo_ids:
+                data, success = self.read_data(servo_id, self.ADDR_PRESENT_POSITION,
+                                              self.STATUS_BLOCK_LENGTH, timeout=self.FALLBACK_READ_TIMEOUT)
+                if success and len(data) >= self.STATUS_BLOCK_LENGTH:
+                    blocks[servo_id] = data
+            # 逐个读取成功说明舵机不支持SYNC_READ，以后直接逐个读取
+            if blocks:
+                self._sync_read_supported = False
         
+        for index, servo_id in enumerate(servo_ids):
+            data = blocks.get(servo_id)
+            if data is not None:
+                status[index] = (servo_id, *self._decode_status(data), True)
         return status
 
-    @classmethod
-    def execute_command(cls, command: Enum, *args, **kwargs) -> Any:
+    @connection_method
+    def execute_command(self, command: Enum, *args, **kwargs) -> Any:
         """执行命令"""
-        if not cls.is_connected():
+        if not self.is_connected():
             raise ConnectionError("Feetech port not connected")
         
         # 高级命令处理
         if command == FeetechCommands.SET_POSITION:
             if len(args) >= 2:
-                return cls.set_position(args[0], args[1], args[2] if len(args) > 2 else 0)
+                return self.set_position(args[0], args[1], args[2] if len(args) > 2 else 0)
             raise ValueError("SET_POSITION requires servo_id and position")
         
+        elif command == FeetechCommands.SET_POSITIONS_SYNC:
+            if len(args) >= 2:
+                return self.set_positions_sync(args[0], args[1], args[2] if len(args) > 2 else 0)
+            raise ValueError("SET_POSITIONS_SYNC requires servo_ids and positions")
+        
         elif command == FeetechCommands.GET_POSITION:
             if len(args) >= 1:
-                return cls.get_position(args[0])
+                return self.get_position(args[0])
             raise ValueError("GET_POSITION requires servo_id")
         
         elif command == FeetechCommands.TORQUE_ENABLE:
             if len(args) >= 1:
-                return cls.set_torque_enable(args[0], True)
+                return self.set_torque_enable(args[0], True)
             raise ValueError("TORQUE_ENABLE requires servo_id")
         
         elif command == FeetechCommands.TORQUE_DISABLE:
             if len(args) >= 1:
-                return cls.set_torque_enable(args[0], False)
+                return self.set_torque_enable(args[0], False)
             raise ValueError("TORQUE_DISABLE requires servo_id")
         
         elif command == FeetechCommands.GET_STATUS:
             if len(args) >= 1:
-                return cls.get_status(args[0])
+                return self.get_status(args[0])
             raise ValueError("GET_STATUS requires servo_id")
         
+        elif command == FeetechCommands.GET_STATUS_MANY:
+            if len(args) >= 1:
+                return self.get_status_many(args[0])
+            raise ValueError("GET_STATUS_MANY requires servo_ids")
+        
         elif command == FeetechCommands.PING:
             if len(args) >= 1:
-                return cls.ping(args[0])
+                return self.ping(args[0])
             raise ValueError("PING requires servo_id")
         
         # 基础命令处理
-        elif command in cls._COMMAND_MAP:
-            instruction = cls._COMMAND_MAP[command]
+        elif command in self._COMMAND_MAP:
+            instruction = self._COMMAND_MAP[command]
             if len(args) >= 1:
                 servo_id = args[0]
                 parameters = list(args[1:]) if len(args) > 1 else []
-                packet = cls._create_packet(servo_id, instruction, parameters)
+                packet = self._create_packet(servo_id, instruction, parameters)
                 
-                if cls.send(packet):
-                    response, success = cls.receive()
+                if self.send(packet):
+                    response, success = self.receive()
                     return response if success else None
             raise ValueError(f"Command {command.value} requires servo_id")
         
@@ -0,0 +1,582 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+universal_servo固件模拟器
+在pty上模拟universal_servo.ino的命令集和时序，SerialProtocol.connect可以像真实串口一样打开(仅支持Linux/macOS)
+
+用法: python -m protocol.firmware_emulator [舵机数量]
+"""
+
+import os
+import re
+import sys
+import math
+import time
+import tty
+import termios
+import select
+import struct
+import binascii
+import threading
+from collections import deque
+
+
+class FirmwareEmulator:
+    """universal_servo.ino的主机端模拟
+
+    与固件一样每个循环最多读取一条命令，循环末尾延时LOOP_INTERVAL。串口按波特率逐字节到达，
+    超出接收缓冲区的字节被丢弃。模拟内容:
+        EXEC队列(CMD_QUEUE_SIZE)、QFULL/BERR拒绝锁存、QSTAT/QFLUSH、BINON二进制帧
+        EXEC按固件的运动时长公式执行，完成后出队下一条
+        REP立即到位并回复CP1，M280回复TP0，TOOL[...]回复CP2，DELAY阻塞循环
+        BAUD/BAUDOK波特率切换，主机端pty的波特率与固件不一致时双方收到的都是乱码
+        TRAJ上传轨迹到固件内存，TPLAY/TPAUSE/TRESUME本地回放
+    """
+
+    FIRMWARE_VERSION = "3.0.0"
+    LOOP_INTERVAL = 0.005           # loop()末尾的delay(5)
+    CMD_QUEUE_SIZE = 45
+    RX_BUFFER_SIZE = 256            # 固件串口接收缓冲区(字节)
+    BASE_MOTION_DURATION = 0.9      # 90度运动时间(秒)
+    MIN_STEP = 1.5                  # 小于该角度的变化立即到位
+    ANGLE_SCALE = 50.0
+    FRAME_SYNC1 = 0xA5
+    FRAME_SYNC2 = 0x5A
+    FRAME_TYPE_EXEC = 0x01
+    FRAME_TYPE_TRAJ = 0x02
+    TRAJ_CAPACITY = 1000
+    TRAJ_CHUNK_BYTES = 192
+    BITS_PER_BYTE = 10              # 8N1
+    SUPPORTED_BAUDRATES = (230400, 460800, 921600)
+    BAUD_CONFIRM = 1.0              # 未收到BAUDOK时恢复启动波特率的时间(秒)
+    _TERMIOS_SPEEDS = {getattr(termios, name): int(name[1:]) for name in dir(termios) if re.fullmatch(r"B\d+", name)}
+
+    def __init__(self, num_servos=6, joint_limits=None, home_positions=None, baudrate=115200, motion_scale=1.0,
+                 link_latency=0.0, max_baudrate=None, boot_delay=0.0):
+        """
+        Args:
+            num_servos: 关节数量
+            joint_limits: 每个关节的(下限, 上限)，默认(0, 180)
+            home_positions: 初始角度，默认90度
+            baudrate: 固件启动时的串口波特率，决定字节传输时间
+            motion_scale: 运动时长系数，小于1时加快模拟的机械运动
+            link_latency: USB转串口芯片的单向延迟(秒)，每个方向的数据都额外延迟该时间
+            max_baudrate: 线路实际能达到的最高波特率，更高的速率能切换但数据出错，默认不限制
+            boot_delay: 打开端口后固件setup()的时间(秒)，期间收到的数据被丢弃，模拟ESP32打开串口时复位
+        """
+        self.num_servos = num_servos
+        self.joint_limits = joint_limits or [(0.0, 180.0)] * num_servos
+        self.home_positions = list(home_positions or [90.0] * num_servos)
+        self.boot_baudrate = baudrate
+        self.max_baudrate = max_baudrate
+        self.motion_scale = motion_scale
+        self.link_latency = link_latency
+        self.boot_delay = boot_delay
+        self._boot_until = 0.0
+
+        self._master = None
+        self._slave = None
+        self.port = None
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+        # 串口接收: 已到达固件缓冲区的字节，以及仍在线路上传输的(到达时间, 数据, 发送时间)
+        self._rx = bytearray()
+        self._rx_sent_times = deque()   # 接收缓冲区中每个数据块的(结束位置, 主机发送时间)，用于统计确认延迟
+        self._rx_in_flight = deque()
+        self._rx_line_busy = 0.0
+        self._tx_queue = deque()
+        self._tx_line_busy = 0.0
+        self._tx_cond = threading.Condition()
+
+        self._reset_state()
+
+    def _reset_state(self):
+        n = self.num_servos
+        self.baudrate = self.boot_baudrate
+        self.byte_time = self.BITS_PER_BYTE / self.baudrate
+        self._baud_pending_since = None
+        self.current_angles = list(self.home_positions)
+        self.target_angles = list(self.home_positions)
+        self.speed_factors = [1.0] * n
+        self.queue = deque()
+        self.queue_rejecting = False
+        self.stream_session = False     # QSTAT开始，队列排空或QFLUSH时结束；只在会话中锁存拒绝
+        self.binary_mode = False
+        self.expected_seq = 0
+        self.is_execute = False
+        self.is_micro_step = False
+        self.is_move_tool = False
+        self.is_recording = False
+        self.tool_state = 90
+        self.target_tool_state = 90
+        self._motion = None             # (开始时间, 时长, 起点, 终点)
+        self.traj_points = []           # 上传的轨迹点(int16原始值)
+        self.traj_count = 0
+        self.traj_index = 0
+        self.traj_playing = False
+        self.traj_paused = False
+
+        # 统计
+        self.executed = 0
+        self.rx_overflow_bytes = 0
+        self.queue_samples = []
+        self.acks = []                  # (信号, 命令发送时间, 应答发出时间)
+        self._command_sent_time = None
+
+    # ------------------------------------------------------------------ pty
+
+    def start(self) -> str:
+        """创建pty并启动模拟线程，返回可供SerialProtocol.connect打开的端口名"""
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._boot_until = time.perf_counter() + self.boot_delay
+        self._stop_event.clear()
+        self._threads = [
+            threading.Thread(target=self._rx_loop, name="emulator-rx", daemon=True),
+            threading.Thread(target=self._tx_loop, name="emulator-tx", daemon=True),
+            threading.Thread(target=self._firmware_loop, name="emulator-loop", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self.port
+
+    def stop(self):
+        """停止模拟并关闭pty"""
+        self._stop_event.set()
+        with self._tx_cond:
+            self._tx_cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._master = self._slave = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _rx_loop(self):
+        """读取主机写入的数据，按波特率计算每块数据到达固件的时间"""
+        while not self._stop_event.is_set():
+            ready, _, _ = select.select([self._master], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:
+                break
+            now = time.perf_counter()
+            if not self._line_ok(self.baudrate):
+                data = self._garble(data)
+            with self._lock:
+                start = max(now + self.link_latency, self._rx_line_busy)
+                self._rx_line_busy = start + len(data) * self.byte_time
+                self._rx_in_flight.append((self._rx_line_busy, data, now))
+
+    def _tx_loop(self):
+        """按波特率把固件输出写回主机"""
+        while not self._stop_event.is_set():
+            with self._tx_cond:
+                while not self._tx_queue and not self._stop_event.is_set():
+                    self._tx_cond.wait(0.05)
+                if self._stop_event.is_set():
+                    return
+                due, data, rate = self._tx_queue[0]
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            with self._tx_cond:
+                self._tx_queue.popleft()
+            if not self._line_ok(rate):
+                data = self._garble(data)
+            try:
+                os.write(self._master, data)
+            except OSError:
+                return
+
+    def _println(self, line):
+        """Serial.println，确认信号记录到acks用于统计延迟"""
+        data = (line + "\r\n").encode()
+        now = time.perf_counter()
+        with self._tx_cond:
+            start = max(now, self._tx_line_busy)
+            self._tx_line_busy = start + len(data) * self.byte_time
+            self._tx_queue.append((self._tx_line_busy + self.link_latency, data, self.baudrate))
+            self._tx_cond.notify()
+        if line in ("CP0", "CP1", "CP2", "TP0", "QFULL", "BERR") or line.startswith(("QS,", "QF,")):
+            self.acks.append((line.split(',')[0], self._command_sent_time, now))
+
+    def _host_baudrate(self):
+        """主机打开pty时设置的波特率，无法识别时返回None"""
+        try:
+            return self._TERMIOS_SPEEDS.get(termios.tcgetattr(self._slave)[5])
+        except (termios.error, TypeError):
+            return None
+
+    def _line_ok(self, rate):
+        """固件以rate收发时数据能否被正确接收"""
+        host = self._host_baudrate()
+        if host is not None and host != rate:
+            return False
+        return self.max_baudrate is None or rate <= self.max_baudrate
+
+    @staticmethod
+    def _garble(data):
+        """波特率不一致时收到的乱码，不会出现换行符"""
+        return bytes(b | 0x80 for b in data)
+
+    def _set_baudrate(self, rate):
+        """Serial.updateBaudRate"""
+        self.baudrate = rate
+        self.byte_time = self.BITS_PER_BYTE / rate
+
+    def _flush(self):
+        """Serial.flush: 等待已输出的数据发送完毕"""
+        with self._tx_cond:
+            remaining = self._tx_line_busy - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def _receive(self):
+        """把已经到达的字节放入接收缓冲区，缓冲区满时丢弃"""
+        now = time.perf_counter()
+        with self._lock:
+            while self._rx_in_flight and self._rx_in_flight[0][0] <= now:
+                arrival, data, sent = self._rx_in_flight.popleft()
+                if arrival < self._boot_until:
+                    # 固件还在启动
+                    continue
+                free = self.RX_BUFFER_SIZE - len(self._rx)
+                if free < len(data):
+                    self.rx_overflow_bytes += len(data) - max(free, 0)
+                    data = data[:max(free, 0)]
+                if data:
+                    self._rx_sent_times.append((len(self._rx) + len(data), sent))
+                    self._rx += data
+
+    def _consume(self, count):
+        """从接收缓冲区取出count字节，并记录这条命令的主机发送时间"""
+        data = bytes(self._rx[:count])
+        del self._rx[:count]
+        # 命令在最后一个字节到达时才完整，取该字节所在数据块的发送时间
+        sent = None
+        remaining = deque()
+        for end, sent_time in self._rx_sent_times:
+            if sent is None and end >= count:
+                sent = sent_time
+            if end > count:
+                remaining.append((end - count, sent_time))
+        self._rx_sent_times = remaining
+        self._command_sent_time = sent
+        return data
+
+    def _read_line(self):
+        """Serial.readStringUntil('\\n')，整行尚未到达时返回None"""
+        index = self._rx.find(b'\n')
+        if index == -1:
+            return None
+        return self._consume(index + 1)[:-1].decode(errors='ignore').strip()
+
+    # ------------------------------------------------------------------ firmware
+
+    def _firmware_loop(self):
+        while not self._stop_event.is_set() and time.perf_counter() < self._boot_until:
+            time.sleep(self.LOOP_INTERVAL)
+        while not self._stop_event.is_set():
+            if self._baud_pending_since is not None and time.perf_counter() - self._baud_pending_since > self.BAUD_CONFIRM:
+                # 主机没有确认新波特率，恢复启动波特率
+                self._set_baudrate(self.boot_baudrate)
+                self._baud_pending_since = None
+            self._receive()
+            with self._lock:
+                command = self._next_command()
+            if command is not None:
+                self._handle_command(command)
+            self._update_motion()
+            self.queue_samples.append(len(self.queue))
+            time.sleep(self.LOOP_INTERVAL)
+
+    @property
+    def traj_chunk_points(self):
+        return max(1, self.TRAJ_CHUNK_BYTES // (2 * self.num_servos))
+
+    def _next_command(self):
+        """与loop()开头一致: 二进制帧或一行文本命令；EXEC需要等下一行角度数据"""
+        if not self._rx:
+            return None
+        if self.binary_mode and self._rx[0] == self.FRAME_SYNC1:
+            if len(self._rx) < 5:
+                return None
+            count = self._rx[3]
+            if self._rx[1] == self.FRAME_SYNC2 and self._rx[2] == self.FRAME_TYPE_TRAJ and self._rx[4] == self.num_servos:
+                # 点数不合法时固件只读取5字节头
+                frame_length = 5 + 2 + 2 * self.num_servos * count + 2 if 0 < count <= self.traj_chunk_points else 5
+            else:
+                frame_length = 5 + 2 * self.num_servos + 2
+            if len(self._rx) < frame_length:
+                return None
+            return self._consume(frame_length)
+        index = self._rx.find(b'\n')
+        if index == -1:
+            return None
+        if self._rx[:index].strip() == b"EXEC":
+            if self._rx.find(b'\n', index + 1) == -1:
+                return None
+            self._read_line()
+            return ("EXEC", self._read_line())
+        return self._read_line()
+
+    def _map_angle(self, angle, index):
+        low, high = self.joint_limits[index]
+        return min(max(angle, low), high)
+
+    def _accept_exec(self, angles):
+        if not self.queue_rejecting and len(self.queue) < self.CMD_QUEUE_SIZE:
+            self.queue.append(angles)
+            self._println("CP0")
+            if not self.is_execute:
+                self._start_next_motion()
+            return True
+        self.queue_rejecting = self.stream_session
+        self._println("QFULL")
+        return False
+
+    def _handle_trajectory_frame(self, frame):
+        """handleTrajectoryFrame"""
+        n, count = self.num_servos, frame[3]
+        received = len(self.traj_points)
+        if len(frame) == 5:
+            self._println(f"TE,{received}")
+            return
+        payload_end = 7 + 2 * n * count
+        start = struct.unpack_from("<H", frame, 5)[0]
+        if (struct.unpack_from("<H", frame, payload_end)[0] != binascii.crc_hqx(frame[2:payload_end], 0xFFFF) or
+                self.traj_playing or start != received or start + count > self.traj_count):
+            self._println(f"TE,{received}")
+            return
+        raw = struct.unpack_from(f"<{n * count}h", frame, 7)
+        self.traj_points.extend(raw[i:i + n] for i in range(0, len(raw), n))
+        self._println(f"TK,{len(self.traj_points)}")
+
+    def _handle_binary_frame(self, frame):
+        n = self.num_servos
+        if frame[1] == self.FRAME_SYNC2 and frame[2] == self.FRAME_TYPE_TRAJ and frame[4] == n:
+            self._handle_trajectory_frame(frame)
+            return
+        if (frame[1] != self.FRAME_SYNC2 or frame[2] != self.FRAME_TYPE_EXEC or frame[4] != n or
+                struct.unpack_from("<H", frame, 5 + 2 * n)[0] != binascii.crc_hqx(frame[2:5 + 2 * n], 0xFFFF) or
+                frame[3] != self.expected_seq):
+            self.queue_rejecting = self.stream_session
+            self._println("BERR")
+            return
+        raw = struct.unpack_from(f"<{n}h", frame, 5)
+        angles = [self._map_angle(value / self.ANGLE_SCALE, i) for i, value in enumerate(raw)]
+        if self._accept_exec(angles):
+            self.expected_seq = (self.expected_seq + 1) & 0xFF
+
+    def _handle_command(self, command):
+        if isinstance(command, bytes):
+            self._handle_binary_frame(command)
+            return
+        if isinstance(command, tuple):
+            try:
+                values = [float(v) for v in command[1].split(',')]
+            except ValueError:
+                return
+            if len(values) >= self.num_servos:
+                self._accept_exec([self._map_angle(v, i) for i, v in enumerate(values[:self.num_servos])])
+            return
+
+        if command == "VERC":
+            for line in ("INFOS", "VER," + self.FIRMWARE_VERSION, "Universal Servo Controller (emulator)", "INFOE"):
+                self._println(line)
+        elif command.startswith("DELAY,"):
+            param = command[6:]
+            seconds = float(param[2:]) / 1000.0 if param.startswith("MS") else float(param[1:] or 0)
+            time.sleep(seconds)
+        elif command == "RECSTART":
+            self.is_recording = True
+        elif command == "RECSTOP":
+            self.is_recording = False
+        elif command.startswith("REP,"):
+            try:
+                values = [float(v) for v in command[4:].split(',')]
+            except ValueError:
+                return
+            if len(values) < self.num_servos:
+                return
+            self.target_angles = values[:self.num_servos]
+            self.is_micro_step = True
+        elif command.startswith("TOOL["):
+            self._println("CP2")
+        elif command.startswith("M280"):
+            parts = command.split(',')
+            if len(parts) > 1:
+                try:
+                    # 夹爪模式: 把开合距离换算为舵机角度
+                    self.target_tool_state = int(90 + (float(parts[1]) / 0.008) * 90)
+                except ValueError:
+                    return
+                self.is_move_tool = True
+        elif command == "QSTAT":
+            self.stream_session = True
+            self.queue_rejecting = False
+            self._println(f"QS,{len(self.queue)},{self.CMD_QUEUE_SIZE},{self.expected_seq}")
+        elif command == "BINON":
+            self.binary_mode = True
+            self.expected_seq = 0
+            self._println("BIN1")
+        elif command == "BINOFF":
+            self.binary_mode = False
+        elif command.startswith("BAUD,"):
+            rate = int(command[5:]) if command[5:].isdigit() else 0
+            if rate in self.SUPPORTED_BAUDRATES:
+                self._println(f"BD,{rate}")
+                self._flush()
+                self._set_baudrate(rate)
+                self._baud_pending_since = time.perf_counter()
+            else:
+                self._println("BD,0")
+        elif command == "BAUDOK":
+            self._baud_pending_since = None
+            self._println("BD,OK")
+        elif command == "QFLUSH":
+            dropped = len(self.queue)
+            self.queue.clear()
+            self.target_angles = list(self.current_angles)
+            self._motion = None
+            self.is_execute = False
+            self.queue_rejecting = False
+            self.stream_session = False
+            self.traj_playing = False
+            self.traj_paused = False
+            self._println(f"QF,{dropped}")
+        elif command.startswith("TRAJ,"):
+            count = int(command[5:]) if command[5:].isdigit() else 0
+            if self.traj_playing or not 0 < count <= self.TRAJ_CAPACITY:
+                self._println(f"TA,0,{self.traj_chunk_points},{self.TRAJ_CAPACITY}")
+            else:
+                self.traj_count = count
+                self.traj_points = []
+                self._println(f"TA,{count},{self.traj_chunk_points},{self.TRAJ_CAPACITY}")
+        elif command == "TPLAY":
+            if self.traj_playing or self.traj_count == 0 or len(self.traj_points) != self.traj_count:
+                self._println("TS,0")
+            else:
+                self.traj_playing = True
+                self.traj_paused = False
+                self.traj_index = 0
+                self._println(f"TS,{self.traj_count}")
+                if not self.is_execute:
+                    self._start_next_motion()
+        elif command == "TPAUSE":
+            self.traj_paused = True
+        elif command == "TRESUME":
+            self.traj_paused = False
+            if self.traj_playing and not self.is_execute:
+                self._start_next_motion()
+        elif command.startswith("SPD,"):
+            for item in command[4:].split(','):
+                joint, _, speed = item.strip().partition(':')
+                try:
+                    index, factor = int(joint[1:]) - 1, float(speed)
+                except ValueError:
+                    continue
+                if joint.startswith("J") and 0 <= index < self.num_servos and factor > 0:
+                    self.speed_factors[index] = factor
+
+    def _motion_duration(self, target):
+        """calculateGlobalMotionDuration"""
+        duration = 0.0
+        for i, (goal, current) in enumerate(zip(target, self.current_angles)):
+            change = abs(goal - current)
+            if change >= self.MIN_STEP:
+                duration = max(duration, self.BASE_MOTION_DURATION * change / 90.0 / self.speed_factors[i])
+        return duration * self.motion_scale
+
+    def _start_next_motion(self):
+        """startNextMotion: 正在回放的轨迹优先于EXEC队列"""
+        if self.traj_playing and self.traj_paused:
+            self.is_execute = False
+            self._motion = None
+            return
+        if self.traj_playing and self.traj_index < self.traj_count:
+            raw = self.traj_points[self.traj_index]
+            self.target_angles = [self._map_angle(value / self.ANGLE_SCALE, i) for i, value in enumerate(raw)]
+            self._println(f"TI,{self.traj_index}")
+            self.traj_index += 1
+        else:
+            if self.traj_playing:
+                self.traj_playing = False
+                self._println(f"TD,{self.traj_count}")
+            if not self.queue:
+                self.is_execute = False
+                self._motion = None
+                return
+            self.target_angles = self.queue.popleft()
+        self._motion = (None, self._motion_duration(self.target_angles), list(self.current_angles), self.target_angles)
+        self.is_execute = True
+
+    def _update_motion(self):
+        """loop()中的运动分支: REP优先，其次EXEC，最后M280"""
+        if self.is_micro_step:
+            self.current_angles = list(self.target_angles)
+            self._println("CP1")
+            self.is_micro_step = False
+        elif self.is_execute and self._motion is not None:
+            start, duration, origin, target = self._motion
+            now = time.perf_counter()
+            if start is None:
+                start = now
+                self._motion = (start, duration, origin, target)
+            progress = 1.0 if duration <= 0 else min((now - start) / duration, 1.0)
+            # sin²插值
+            smooth = math.sin(progress * math.pi / 2.0) ** 2
+            self.current_angles = [a + (b - a) * smooth for a, b in zip(origin, target)]
+            if progress >= 1.0:
+                self.executed += 1
+                self._start_next_motion()
+                if not self.is_execute:
+                    # 队列排空，流式会话结束
+                    self.stream_session = False
+                    self.queue_rejecting = False
+        elif self.is_move_tool:
+            self.tool_state = min(max(self.target_tool_state, 90), 180)
+
+        if self.is_move_tool and self.tool_state == min(max(self.target_tool_state, 90), 180):
+            self._println("TP0")
+            self.is_move_tool = False
+
+    # ------------------------------------------------------------------ statistics
+
+    def reset_stats(self):
+        """清空统计数据"""
+        self.executed = 0
+        self.rx_overflow_bytes = 0
+        self.queue_samples = []
+        self.acks = []
+
+    def ack_latencies(self, signal):
+        """从主机写入命令到固件发出应答的时间(秒)列表"""
+        return [emitted - sent for name, sent, emitted in list(self.acks) if name == signal and sent is not None]
+
+
+if __name__ == "__main__":
+    emulator = FirmwareEmulator(num_servos=int(sys.argv[1]) if len(sys.argv) > 1 else 6)
+    port = emulator.start()
+    print(f"Firmware emulator listening on {port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        emulator.stop()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+主机与控制器通信性能测试
+使用FirmwareEmulator代替ESP32，测量G代码执行(流式发送和上传后本地回放)、任务板和轨迹回放三条发送路径的
+路径点吞吐量、应答延迟分位数和固件队列占用(仅支持Linux/macOS)
+
+用法(在src目录下): python -m protocol.serial_benchmark
+"""
+
+import time
+
+import numpy as np
+
+from protocol.firmware_emulator import FirmwareEmulator
+from protocol.serial_protocol import SerialProtocol
+from utils.replay_scheduler import ReplayScheduler
+from utils.trajectory_file import TrajectoryFile
+
+NUM_SERVOS = 6
+HOME = [90.0] * NUM_SERVOS
+LINK_LATENCY = 0.004    # USB转串口芯片的单向延迟(秒)
+
+
+def line_path(start, step, count):
+    """从start开始每个关节每步变化step度的路径"""
+    start = np.asarray(start, dtype=np.float64)
+    return [start + step * (i + 1) for i in range(count)]
+
+
+def run_gcode(window=None, upload=False):
+    """G代码执行器: 连续EXEC合并为一批流水线发送(upload时上传到固件本地回放)，DELAY直接发送，M280等待TP0"""
+    waypoints = 0
+    position = HOME
+    for _ in range(3):
+        batch = line_path(position, 0.5, 100)
+        if upload:
+            acked, success = SerialProtocol.execute_trajectory(batch)
+        else:
+            acked, success = SerialProtocol.stream_exec(batch, window=window)
+        waypoints += acked
+        if not success:
+            break
+        position = batch[-1]
+        SerialProtocol.send("DELAY,MS50\n", sleep_time=0)
+        SerialProtocol.send("M280,0.004\n", sleep_time=0)
+        SerialProtocol.receive(timeout=5, expected_signal="TP0")
+    return waypoints, "CP0"
+
+
+def run_task_board():
+    """任务板: 每个plan工作单元单独流式发送，工具和延时工作单元穿插其间"""
+    waypoints = 0
+    position = HOME
+    for step in (2.0, -2.0, 1.0, -1.0):
+        trajectory = line_path(position, step, 40)
+        acked, success = SerialProtocol.stream_exec(trajectory)
+        waypoints += acked
+        if not success:
+            break
+        position = trajectory[-1]
+        SerialProtocol.send("M280,0.008\n" if step > 0 else "M280,0\n", sleep_time=0)
+        SerialProtocol.receive(timeout=5, expected_signal="TP0")
+        time.sleep(0.05)
+    return waypoints, "CP0"
+
+
+def run_replay(rate=50, count=500):
+    """示教回放: 按录制时间戳以rate Hz发送REP"""
+    lines = [f"REC,{','.join(f'{90 + 20 * np.sin(i / 50):.2f}' for _ in range(NUM_SERVOS))}" for i in range(count)]
+    trajectory = TrajectoryFile.from_lines(lines, np.arange(count) / rate)
+    scheduler = ReplayScheduler(SerialProtocol, trajectory)
+    scheduler.run()
+    return scheduler.progress, "CP1"
+
+
+def report(name, emulator, waypoints, signal, elapsed):
+    latencies = np.array(emulator.ack_latencies(signal)) * 1000
+    queue = np.array(emulator.queue_samples)
+    text = f"{name:18s}: {waypoints:4d} waypoints in {elapsed:6.2f}s, {waypoints / elapsed:6.1f} waypoints/s"
+    if len(latencies):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        text += f" | {signal} latency p50 {p50:5.1f} ms p95 {p95:5.1f} ms p99 {p99:5.1f} ms"
+    if len(queue):
+        text += f" | queue mean {queue.mean():4.1f} max {queue.max():2d}/{emulator.CMD_QUEUE_SIZE}"
+    if emulator.rx_overflow_bytes:
+        text += f" | rx overflow {emulator.rx_overflow_bytes} bytes"
+    print(text)
+
+
+def main():
+    """主函数 - 在模拟器上依次测试各条发送路径"""
+    scenarios = [
+        ("gcode (lockstep)", lambda: run_gcode(window=1)),
+        ("gcode", run_gcode),
+        ("gcode (upload)", lambda: run_gcode(upload=True)),
+        ("task board", run_task_board),
+        ("replay", run_replay),
+    ]
+    for binary in (False, True):
+        print(f"--- {'binary' if binary else 'ASCII'} EXEC frames ---")
+        for name, scenario in scenarios:
+            with FirmwareEmulator(num_servos=NUM_SERVOS, home_positions=HOME, link_latency=LINK_LATENCY) as emulator:
+                if not SerialProtocol.connect(emulator.port, binary=binary):
+                    print("连接模拟器失败！")
+                    return
+                try:
+                    emulator.reset_stats()
+                    start = time.perf_counter()
+                    waypoints, signal = scenario()
+                    report(name, emulator, waypoints, signal, time.perf_counter() - start)
+                finally:
+                    SerialProtocol.disconnect()
+
+
+if __name__ == "__main__":
+    main()
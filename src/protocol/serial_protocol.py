@@ -1,8 +1,18 @@
+import os
 import serial
+import struct
+import binascii
+import threading
+from collections import deque
+from concurrent.futures import Future, FIRST_COMPLETED, TimeoutError as FutureTimeoutError, wait as wait_futures
 from enum import Enum
 from typing import Any
 import time
 
+from protocol.serial_reader import SerialLineReader
+from protocol.serial_trace import SerialCapture, SerialReplay, TraceWriter
+from protocol.connection_registry import ConnectionRegistry, ProtocolConnection, connection_method
+
 class SerialCommands(Enum):
     """串口协议支持的命令"""
     # 串口特有的命令
@@ -31,16 +41,61 @@ class SerialCommands(Enum):
     DELAY          = "DELAY"
     RESET_ALARM    = "RESET_ALARM"
     GET_ALARM      = "GET_ALARM"
+    QSTAT          = "QSTAT"
+    BINON          = "BINON"
+    BINOFF         = "BINOFF"
+    QFLUSH         = "QFLUSH"
+    TRAJ           = "TRAJ"
+    TPLAY          = "TPLAY"
+    TPAUSE         = "TPAUSE"
+    TRESUME        = "TRESUME"
+    GPULSE         = "GPULSE"
+
+class SerialProtocol(ProtocolConnection):
+    """串口通信协议实现
 
-class SerialProtocol:
-    """串口通信协议实现"""
+    每个实例是一条串口连接，拥有自己的读取线程；通过类调用时使用默认连接。
+    """
     
     SERIAL_BAUDRATE = 115200
-    _serial = None
-    port = None
-    baudrate = SERIAL_BAUDRATE
     timeout = 1.0
 
+    # 收发记录: capture_dir不为空时每次连接都记录到其中的新文件，见protocol.serial_trace
+    capture_dir = None
+
+    # 波特率协商: 固件以115200启动，连接后依次提出更高的速率，双方切换后用VERC往返验证
+    NEGOTIATE_BAUDRATES = (921600, 460800, 230400)
+    BAUD_REPLY_TIMEOUT = 0.3       # 协商时等待单条应答的时间(秒)
+    BAUD_CONFIRM_TIMEOUT = 1.0     # 固件未收到BAUDOK时恢复启动速率的时间(秒)，与固件BAUD_CONFIRM_MS一致
+    READY_TIMEOUT = 4.0            # 打开串口后等待固件启动完成的时间(秒)，ESP32打开串口时复位，setup()约2秒
+    baud_negotiation = True
+    port_baudrates = {}            # {串口: 上次协商得到的波特率}，由Config持久化
+    on_baudrate_negotiated = None  # 可选回调on_baudrate_negotiated(port, baudrate)
+
+    # EXEC流式发送参数
+    STREAM_WINDOW = 4          # 在途未确认EXEC数量上限，受固件串口接收缓冲区限制
+    QFULL_BACKOFF_MIN = 0.02   # 队列满时的初始退避时间(秒)
+    QFULL_BACKOFF_MAX = 0.2    # 队列满时的最大退避时间(秒)
+
+    # 二进制EXEC帧: A5 5A | type | seq | n | n*int16(LE, 角度*ANGLE_SCALE) | CRC16-CCITT(LE, type..payload)
+    FRAME_SYNC = b"\xA5\x5A"
+    FRAME_TYPE_EXEC = 0x01
+    ANGLE_SCALE = 50           # 0.02°分辨率，int16可表示±655°
+
+    _EXEC_REPLIES = frozenset(("CP0", "QFULL", "BERR"))
+
+    # 轨迹上传: 整条轨迹以TRAJ帧分块写入固件内存，固件本地回放，运动节奏不受USB链路和主机调度影响
+    # TRAJ帧: A5 5A | 0x02 | 点数k | n | 起始序号(uint16 LE) | k*n*int16 | CRC16-CCITT(LE, type..payload)
+    FRAME_TYPE_TRAJ = 0x02
+    TRAJ_MIN_POINTS = 8            # 更短的轨迹流式发送更快
+    TRAJ_REPLY_TIMEOUT = 0.5       # 等待TRAJ帧确认的时间(秒)
+    TRAJ_MAX_RETRIES = 3           # 同一位置连续重发的次数上限
+    TRAJ_POLL_INTERVAL = 0.05      # 回放时检查暂停和中止的间隔(秒)
+    trajectory_upload = True
+
+    # 优先通道: 这些命令不排在流式发送的路径点之后，也不做发送后的等待
+    PRIORITY_COMMANDS = frozenset(("QFLUSH", "REPPAUSE", "REPSTOP", "RESET_ALARM"))
+
     _COMMAND_MAP = {
         SerialCommands.EXEC: "EXEC",
         SerialCommands.HOME: "HOME",
@@ -66,47 +121,139 @@ class SerialProtocol:
         SerialCommands.TOOLVACUUMPUMP: "TOOL[VACUUM_PUMP]",
         SerialCommands.DELAY: "DELAY",
         SerialCommands.RESET_ALARM: "RESET_ALARM",
-        SerialCommands.GET_ALARM: "GET_ALARM"
+        SerialCommands.GET_ALARM: "GET_ALARM",
+        SerialCommands.QSTAT: "QSTAT",
+        SerialCommands.BINON: "BINON",
+        SerialCommands.BINOFF: "BINOFF",
+        SerialCommands.QFLUSH: "QFLUSH",
+        SerialCommands.TRAJ: "TRAJ",
+        SerialCommands.TPLAY: "TPLAY",
+        SerialCommands.TPAUSE: "TPAUSE",
+        SerialCommands.TRESUME: "TRESUME",
+        SerialCommands.GPULSE: "GPULSE"
     }
 
-    @classmethod
-    def connect(cls, port: str, baudrate: int = 115200) -> bool:
-        """建立串口连接"""
-        cls.port = port
-        cls.baudrate = baudrate
+    def __init__(self):
+        self._serial = None
+        self._reader = None
+        self.port = None
+        self.baudrate = self.SERIAL_BAUDRATE
+        self.binary_mode = False           # 连接时与固件协商得到
+        self.trace_path = None
+        self.trajectory_capacity = None    # 固件轨迹缓冲区容量，None表示尚未检测，0表示不支持
+        self._uploaded_trajectory = None
+        self._write_lock = threading.Lock()
+        self._abort_future = Future()      # stop()时完成，唤醒并中止正在进行的流式发送
+
+    @connection_method
+    def connect(self, port: str, baudrate: int = 115200, binary: bool = True, capture=None, negotiate=None) -> bool:
+        """建立串口连接
+
+        Args:
+            port: 串口名称，replay://记录文件[?speed=倍数]表示回放记录文件
+            baudrate: 波特率，即固件启动时的波特率
+            binary: 是否尝试与固件协商二进制EXEC帧，协商失败时使用ASCII命令
+            capture: 收发记录文件或目录，默认使用capture_dir
+            negotiate: 是否协商更高的波特率，默认使用baud_negotiation，回放记录文件时不协商
+        """
+        if self.is_connected():
+            # 已连接的实例重新连接时先停止旧的读取线程并关闭旧串口
+            self.disconnect()
+        if not ConnectionRegistry.is_available(port, self):
+            print(f"Serial connection error: {port} is already in use")
+            return False
+        self.port = port
+        self.baudrate = baudrate
+        self.binary_mode = False
+        self.trace_path = None
+        self.trajectory_capacity = None
+        self._uploaded_trajectory = None
         try:
-            cls._serial = serial.Serial(
-                port=cls.port,
-                baudrate=cls.baudrate,
-                timeout=cls.timeout
-            )
-            cls._serial.setDTR(False)
-            cls._serial.setRTS(False)
+            if port.startswith(SerialReplay.URL_PREFIX):
+                self._serial = SerialReplay.from_url(port, timeout=self.timeout)
+            else:
+                self._serial = serial.Serial(
+                    port=self.port,
+                    baudrate=self.baudrate,
+                    timeout=self.timeout
+                )
+            try:
+                self._serial.setDTR(False)
+                self._serial.setRTS(False)
+            except OSError:
+                # pty(固件模拟器)和部分USB转串口不支持调制解调器控制线
+                pass
+            replay = port.startswith(SerialReplay.URL_PREFIX)
+            if negotiate is None:
+                negotiate = self.baud_negotiation and not replay
+            # 固件启动完成前发送的BAUD/BINON没有应答，会被误认为旧固件
+            ready = replay or self._wait_ready()
+            if negotiate and ready:
+                # 在读取线程启动和开始记录之前切换，记录文件从协商后的速率开始
+                self._negotiate_baudrate()
+            capture = capture or self.capture_dir
+            if capture:
+                if capture == self.capture_dir:
+                    os.makedirs(capture, exist_ok=True)
+                writer = TraceWriter.create(capture, port=port, baudrate=self.baudrate)
+                self._serial = SerialCapture(self._serial, writer)
+                self.trace_path = writer.path
+            self._reader = SerialLineReader(self._serial, name=f"serial-reader-{port}")
+            self._reader.start()
+            if binary:
+                self.binary_mode = self._negotiate_binary()
+            if not ConnectionRegistry.register(port, self):
+                # 打开和协商期间另一个连接抢先登记了同一端口
+                print(f"Serial connection error: {port} is already in use")
+                self.disconnect()
+                return False
             return True
         except Exception as e:
             print(f"Serial connection error: {e}")
+            self.disconnect()
             return False
 
-    @classmethod
-    def disconnect(cls) -> bool:
+    @connection_method
+    def disconnect(self) -> bool:
         """断开串口连接"""
-        if cls._serial and cls._serial.is_open:
+        if self._serial and self._serial.is_open:
             try:
-                cls._serial.close()
-                cls._serial = None
+                if self._reader is not None:
+                    self._reader.stop()
+                    self._reader = None
+                self._serial.close()
+                self._serial = None
+                self.binary_mode = False
+                ConnectionRegistry.unregister(self)
                 return True
             except Exception as e:
                 print(f"Serial disconnection error: {e}")
         return False
 
-    @classmethod
-    def send(cls, data, sleep_time=0.005) -> bool:
-        """向串口写入数据"""
+    @connection_method
+    def _write(self, data: bytes, abort: Future = None) -> bool:
+        """写入一个完整的命令或帧，多个线程同时发送时不会交错
+
+        Args:
+            abort: 可选，在写锁内检查，已中止时不写入并返回False。send_priority先中止再写入，
+                   因此中止后流式发送的路径点不会排在QFLUSH之后
+        """
+        with self._write_lock:
+            if abort is not None and abort.done():
+                return False
+            self._serial.write(data)
+            return True
+
+    @connection_method
+    def send(self, data, sleep_time=0.005) -> bool:
+        """向串口写入数据，PRIORITY_COMMANDS中的命令走优先通道"""
+        if isinstance(data, str) and data.split(',', 1)[0].strip() in self.PRIORITY_COMMANDS:
+            return self.send_priority(data)
         try:
-            if cls._serial and cls._serial.is_open:
+            if self._serial and self._serial.is_open:
                 if isinstance(data, str):
                     data = data.encode()
-                cls._serial.write(data)
+                self._write(data)
                 if sleep_time > 0:
                     time.sleep(sleep_time)
                 return True
@@ -115,61 +262,549 @@ class SerialProtocol:
             print(f"Serial write error: {e}")
             return False
 
-    @classmethod
-    def receive(cls, timeout=5, expected_signal=None):
-        """接收串口数据并返回"""
-        if not cls._serial or not cls._serial.is_open:
+    @connection_method
+    def send_priority(self, data, abort_stream: bool = False) -> bool:
+        """优先发送命令
+
+        流式发送每写完一帧就释放写锁，优先命令在当前帧之后立即写出，
+        不会排在尚未发送的路径点之后。
+
+        Args:
+            data: 命令字符串
+            abort_stream: 是否同时中止正在进行的stream_exec
+        """
+        if abort_stream:
+            abort, self._abort_future = self._abort_future, Future()
+            abort.set_result(True)
+        try:
+            if self._serial and self._serial.is_open:
+                if isinstance(data, str):
+                    data = data.encode()
+                self._write(data)
+                return True
+            return False
+        except Exception as e:
+            print(f"Serial write error: {e}")
+            return False
+
+    @connection_method
+    def stop(self, timeout=0.5):
+        """紧急停止: 中止流式发送，并让固件清空EXEC队列、停止当前运动
+
+        stream_exec在QFLUSH写出之后不会再写入路径点，固件清空队列后即可接收新的EXEC。
+
+        Returns:
+            (从发出停止到收到固件确认的时间(秒), 是否收到确认)
+        """
+        if not self.is_connected() or self._reader is None:
+            return 0.0, False
+
+        start = time.perf_counter()
+        future = self.expect(lambda line: line.startswith("QF,"))
+        if not self.send_priority("QFLUSH\n", abort_stream=True):
+            self.cancel_expect(future)
+            return 0.0, False
+        try:
+            future.result(timeout=timeout)
+            return time.perf_counter() - start, True
+        except FutureTimeoutError:
+            self.cancel_expect(future)
+            return time.perf_counter() - start, False
+
+    @connection_method
+    def receive(self, timeout=5, expected_signal=None):
+        """接收串口数据并返回
+
+        由后台读取线程分发，等待期间不再轮询串口；调用前已到达的应答也不会丢失。
+
+        Args:
+            timeout: 超时时间(秒)
+            expected_signal: 期望的信号，可以是字符串、字符串集合或判断函数
+
+        Returns:
+            (收到的行列表, 是否收到期望信号)
+        """
+        if not self.is_connected() or self._reader is None:
             return [], False
-            
-        buffer = ""
-        received_lines = []
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
-            if cls._serial.in_waiting:
-                buffer += cls._serial.read(cls._serial.in_waiting).decode()
-                lines = buffer.split('\n')
-                buffer = lines.pop()  # 保留不完整的行在缓冲区
-                
-                for line in lines:
-                    line = line.strip()
-                    if line:  # 忽略空行
-                        received_lines.append(line)
-                        
-                        if expected_signal and line == expected_signal:
-                            return received_lines, True
-                            
-            time.sleep(0.001)
-        
-        return received_lines, False
 
-    @classmethod
-    def clear_serial_buffer(cls):
-        """清空串口缓冲区"""
-        if cls._serial and cls._serial.is_open:
-            cls._serial.reset_input_buffer()
-            cls._serial.reset_output_buffer()
+        future = self._reader.expect(expected_signal)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            lines = self._reader.cancel(future)
+            if not future.cancelled():
+                return future.result()
+            return lines, False
+
+    @connection_method
+    def expect(self, expected_signal) -> Future:
+        """返回等待指定信号(如CP0、CP1、TP0、POT0、QFULL)的future，结果为(收到的行列表, True)
+
+        应在发送命令前调用，超时后应调用cancel_expect释放等待。
+        """
+        if self._reader is None:
+            raise ConnectionError("Serial port not connected")
+        return self._reader.expect(expected_signal)
+
+    @connection_method
+    def cancel_expect(self, future: Future) -> list:
+        """取消等待，返回已收到的行"""
+        if self._reader is None:
+            return []
+        return self._reader.cancel(future)
+
+    @connection_method
+    def subscribe(self, callback):
+        """订阅串口收到的每一行，callback(line)在读取线程中调用"""
+        if self._reader is None:
+            raise ConnectionError("Serial port not connected")
+        self._reader.subscribe(callback)
+
+    @connection_method
+    def unsubscribe(self, callback):
+        if self._reader is not None:
+            self._reader.unsubscribe(callback)
+
+    @connection_method
+    def _wait_exec_reply(self, timeout: float, abort: Future):
+        """等待下一条EXEC应答，超时或被stop()中止时返回None"""
+        return self._wait_reply(self._EXEC_REPLIES, timeout, abort)
+
+    @connection_method
+    def _wait_reply(self, expected_signal, timeout: float, abort: Future):
+        """等待下一条匹配的应答，超时或被stop()中止时返回None"""
+        future = self.expect(expected_signal)
+        done, _ = wait_futures((future, abort), timeout=timeout, return_when=FIRST_COMPLETED)
+        if future not in done:
+            self.cancel_expect(future)
+            if not future.done() or future.cancelled():
+                return None
+        return future.result()[0][-1]
+
+    @connection_method
+    def _read_line(self, timeout: float, expected_signal=None):
+        """读取下一条匹配的行，超时返回None"""
+        lines, success = self.receive(timeout, expected_signal or (lambda line: True))
+        return lines[-1] if success else None
+
+    @connection_method
+    def _request_line(self, command: str, prefix: str):
+        """读取线程启动前使用: 发送命令并读取以prefix开头的应答，超时返回None"""
+        self._serial.write(command.encode())
+        deadline = time.perf_counter() + self.BAUD_REPLY_TIMEOUT
+        while time.perf_counter() < deadline:
+            line = self._serial.readline().decode(errors='ignore').strip()
+            if line.startswith(prefix):
+                return line
+        return None
+
+    @connection_method
+    def _wait_ready(self) -> bool:
+        """读取线程启动前使用: 重复发送VERC直到固件应答，超时返回False"""
+        original_timeout = self._serial.timeout
+        self._serial.timeout = self.BAUD_REPLY_TIMEOUT
+        try:
+            deadline = time.perf_counter() + self.READY_TIMEOUT
+            while time.perf_counter() < deadline:
+                if self._request_line("VERC\n", "VER,") is not None:
+                    # 启动期间缓存的VERC会产生多份应答，读到线路空闲为止
+                    drain_deadline = time.perf_counter() + 1.0
+                    while self._serial.readline() and time.perf_counter() < drain_deadline:
+                        pass
+                    return True
+            print(f"Serial connection warning: no reply from {self.port} within {self.READY_TIMEOUT}s")
+            return False
+        except Exception as e:
+            print(f"Serial ready check error: {e}")
+            return False
+        finally:
+            self._serial.timeout = original_timeout
+
+    @connection_method
+    def _negotiate_baudrate(self) -> int:
+        """与固件协商更高的波特率
+
+        先提出该串口上次协商得到的速率，再依次尝试NEGOTIATE_BAUDRATES。固件回复BD后双方切换，
+        VERC往返成功后发送BAUDOK让固件保持新速率；验证失败时主机恢复原速率，等待固件超时
+        恢复后尝试下一个。固件不支持BAUD时保持原速率。调用前固件必须已经启动完成(_wait_ready)。
+
+        Returns:
+            最终使用的波特率
+        """
+        base = self.baudrate
+        remembered = self.port_baudrates.get(self.port)
+        candidates = [rate for rate in self.NEGOTIATE_BAUDRATES if rate > base]
+        if remembered in candidates:
+            candidates.remove(remembered)
+            candidates.insert(0, remembered)
+
+        original_timeout = self._serial.timeout
+        self._serial.timeout = self.BAUD_REPLY_TIMEOUT
+        try:
+            self._serial.reset_input_buffer()
+            for rate in candidates:
+                reply = self._request_line(f"BAUD,{rate}\n", "BD,")
+                if reply is None:
+                    # 旧固件不认识BAUD命令
+                    break
+                if reply != f"BD,{rate}":
+                    continue
+                switched = time.perf_counter()
+                self._serial.baudrate = rate
+                self._serial.reset_input_buffer()
+                if self._request_line("VERC\n", "VER,") is not None and self._request_line("BAUDOK\n", "BD,OK") is not None:
+                    self.baudrate = rate
+                    break
+                # 新速率上通信失败，等固件恢复启动速率后再尝试下一个
+                self._serial.baudrate = base
+                time.sleep(max(0.0, switched + self.BAUD_CONFIRM_TIMEOUT + self.BAUD_REPLY_TIMEOUT - time.perf_counter()))
+                # 结束固件缓冲区中乱码组成的半行，避免和下一条命令拼在一起
+                self._serial.write(b"\n")
+                self._serial.reset_input_buffer()
+        except Exception as e:
+            print(f"Serial baudrate negotiation error: {e}")
+            self._serial.baudrate = base
+            self.baudrate = base
+        finally:
+            self._serial.timeout = original_timeout
+
+        # 只记录成功协商的更高速率；从类上读取回调，普通函数不会被绑定成实例方法
+        callback = type(self).on_baudrate_negotiated
+        if callback is not None and self.baudrate > base:
+            callback(self.port, self.baudrate)
+        return self.baudrate
+
+    @connection_method
+    def _negotiate_binary(self, timeout=0.5) -> bool:
+        """请求固件切换到二进制EXEC帧，固件回复BIN1表示支持
+
+        6轴路径点的二进制帧为19字节，ASCII为47字节，但serial_benchmark中流式G代码的吞吐量
+        没有提高(ASCII 146.7/二进制 144.0 路径点/秒，CP0延迟p50均为16.3 ms，队列平均占用0)：
+        瓶颈是固件每次循环只取一条EXEC并按运动节拍执行，而不是串口带宽。默认仍协商二进制帧，
+        因为帧带CRC和帧序号，损坏或被拒绝的帧能按序重发，且upload_trajectory需要二进制模式。
+        """
+        future = self.expect("BIN1")
+        self.send("BINON\n", sleep_time=0)
+        try:
+            _, success = future.result(timeout=timeout)
+            return success
+        except FutureTimeoutError:
+            self.cancel_expect(future)
+            return False
 
     @classmethod
-    def is_connected(cls) -> bool:
-        return cls._serial is not None and cls._serial.is_open
+    def encode_exec_frame(cls, angles, seq: int) -> bytes:
+        """将一个路径点(度)编码为二进制EXEC帧"""
+        values = [int(round(angle * cls.ANGLE_SCALE)) for angle in angles]
+        values = [max(-32768, min(32767, value)) for value in values]
+        body = struct.pack(f"<BBB{len(values)}h", cls.FRAME_TYPE_EXEC, seq & 0xFF, len(values), *values)
+        return cls.FRAME_SYNC + body + struct.pack("<H", binascii.crc_hqx(body, 0xFFFF))
+
+    @connection_method
+    def query_queue(self, timeout=0.5):
+        """查询固件EXEC队列状态，同时解除固件的QFULL锁存
+
+        Returns:
+            (已占用数量, 队列容量, 期望的帧序号)，固件不支持QSTAT时返回None；
+            旧固件不回报帧序号时该项为None
+        """
+        if not self.is_connected():
+            return None
+
+        self.send("QSTAT\n", sleep_time=0)
+        line = self._read_line(timeout, lambda line: line.startswith("QS,"))
+        if line is None:
+            return None
+        try:
+            values = [int(v) for v in line[3:].split(',')]
+            return values[0], values[1], values[2] if len(values) > 2 else None
+        except (ValueError, IndexError):
+            return None
+
+    @connection_method
+    def stream_exec(self, waypoints, window=None, timeout=5, should_continue=None, on_progress=None):
+        """流水线发送EXEC路径点，使用固件队列空闲槽位作为信用进行流控
+
+        最多保持window条未确认的EXEC在途，不再逐点等待CP0往返。收到QFULL时
+        退避后从被拒绝的路径点重发；固件不支持QSTAT时退化为逐条确认。
+        已协商二进制模式时以带序号和CRC的帧发送，固件回复BERR时按QFULL处理重发。
+
+        Args:
+            waypoints: 关节角度序列(度)
+            window: 在途EXEC数量上限，默认为STREAM_WINDOW
+            timeout: 等待单条确认的超时时间(秒)
+            should_continue: 可选回调，返回False时中止发送，可在其中阻塞以实现暂停
+            on_progress: 可选回调on_progress(index, angles)，路径点被固件队列接收后调用
+
+        Returns:
+            (已被确认的路径点数量, 是否全部发送成功)
+        """
+        if not self.is_connected():
+            return 0, False
+
+        waypoints = list(waypoints)
+        total = len(waypoints)
+        window = max(1, window or self.STREAM_WINDOW)
+
+        status = self.query_queue()
+        if status is None:
+            # 旧固件没有QSTAT与QFULL锁存，只能逐条确认以保证顺序
+            window = 1
+            credits = None
+        else:
+            credits = status[1] - status[0]
+
+        if self.binary_mode and status is not None and status[2] is not None:
+            # 帧序号从固件期望值开始，被拒绝的帧重发时序号不变
+            seq_base = status[2]
+            commands = [self.encode_exec_frame(angles, seq_base + i) for i, angles in enumerate(waypoints)]
+        else:
+            commands = [("EXEC\n" + ",".join(f"{angle:.2f}" for angle in angles) + "\n").encode()
+                        for angles in waypoints]
+
+        in_flight = deque()
+        next_index = 0
+        acked = 0
+        backoff = self.QFULL_BACKOFF_MIN
+        abort = self._abort_future
+
+        try:
+            while acked < total:
+                if abort.done() or (should_continue is not None and not should_continue()):
+                    return acked, False
+
+                while next_index < total and len(in_flight) < window and (credits is None or credits > 0):
+                    if not self._write(commands[next_index], abort):
+                        return acked, False
+                    in_flight.append(next_index)
+                    next_index += 1
+                    if credits is not None:
+                        credits -= 1
+
+                if not in_flight:
+                    # 信用耗尽：等待机械臂消化队列后重新获取空闲槽位，stop()可打断等待
+                    wait_futures((abort,), timeout=backoff)
+                    backoff = min(backoff * 2, self.QFULL_BACKOFF_MAX)
+                    status = self.query_queue()
+                    if status is None:
+                        return acked, False
+                    credits = status[1] - status[0]
+                    continue
+
+                line = self._wait_exec_reply(timeout, abort)
+                if line is None:
+                    return acked, False
+
+                if line == "CP0":
+                    index = in_flight.popleft()
+                    acked += 1
+                    backoff = self.QFULL_BACKOFF_MIN
+                    if on_progress is not None:
+                        on_progress(index, waypoints[index])
+                elif line in ("QFULL", "BERR"):
+                    # 固件锁存拒绝状态，其后在途的EXEC都会被拒绝，全部回退重发
+                    rejected = in_flight.popleft()
+                    while in_flight:
+                        line = self._wait_exec_reply(timeout, abort)
+                        if line is None:
+                            return acked, False
+                        if line in ("QFULL", "BERR"):
+                            in_flight.popleft()
+                    next_index = rejected
+                    wait_futures((abort,), timeout=backoff)
+                    backoff = min(backoff * 2, self.QFULL_BACKOFF_MAX)
+                    if credits is not None:
+                        status = self.query_queue()
+                        if status is None:
+                            return acked, False
+                        credits = status[1] - status[0]
+        except Exception as e:
+            print(f"Serial stream error: {e}")
+            return acked, False
+
+        return acked, True
 
     @classmethod
-    def execute_command(cls, command: Enum, *args, **kwargs) -> Any:
-        if not cls.is_connected():
+    def encode_trajectory_frame(cls, start: int, points) -> bytes:
+        """将从start开始的一段轨迹点(度)编码为二进制TRAJ帧"""
+        values = [int(round(angle * cls.ANGLE_SCALE)) for point in points for angle in point]
+        values = [max(-32768, min(32767, value)) for value in values]
+        body = struct.pack(f"<BBBH{len(values)}h", cls.FRAME_TYPE_TRAJ, len(points), len(points[0]), start, *values)
+        return cls.FRAME_SYNC + body + struct.pack("<H", binascii.crc_hqx(body, 0xFFFF))
+
+    @staticmethod
+    def _is_upload_reply(line: str) -> bool:
+        return line.startswith(("TK,", "TE,")) or line == "BERR"
+
+    @staticmethod
+    def _is_playback_reply(line: str) -> bool:
+        # QFLUSH清空队列时也结束回放
+        return line.startswith(("TS,", "TI,", "TD,", "QF,"))
+
+    @connection_method
+    def upload_trajectory(self, waypoints, should_continue=None) -> bool:
+        """把整条轨迹分块上传到固件内存，之后由play_trajectory在固件本地回放
+
+        TRAJ,点数预留缓冲区后逐帧发送，固件按顺序接收并回复TK,已收到点数；帧损坏或位置不对时
+        回复TE,已收到点数，从该位置重发。需要已协商二进制模式。
+
+        Returns:
+            是否上传成功；固件不支持或轨迹超过固件容量时返回False
+        """
+        if not self.is_connected() or not self.binary_mode or self.trajectory_capacity == 0:
+            return False
+        waypoints = [list(angles) for angles in waypoints]
+        total = len(waypoints)
+        if total == 0 or (self.trajectory_capacity and total > self.trajectory_capacity):
+            return False
+
+        self._uploaded_trajectory = None
+        abort = self._abort_future
+        try:
+            self.send(f"TRAJ,{total}\n", sleep_time=0)
+            line = self._read_line(self.TRAJ_REPLY_TIMEOUT, lambda line: line.startswith("TA,"))
+            if line is None:
+                # 旧固件不认识TRAJ，本次连接不再尝试
+                self.trajectory_capacity = 0
+                return False
+            accepted, chunk_points, self.trajectory_capacity = (int(v) for v in line[3:].split(','))
+            if accepted != total:
+                return False
+
+            received = 0
+            retries = 0
+            while received < total:
+                if abort.done() or (should_continue is not None and not should_continue()):
+                    return False
+                self._write(self.encode_trajectory_frame(received, waypoints[received:received + chunk_points]))
+                line = self._wait_reply(self._is_upload_reply, self.TRAJ_REPLY_TIMEOUT, abort)
+                if line is not None and line.startswith("TK,"):
+                    received = int(line[3:])
+                    retries = 0
+                    continue
+                if line is not None and line.startswith("TE,"):
+                    received = int(line[3:])
+                retries += 1
+                if retries > self.TRAJ_MAX_RETRIES:
+                    return False
+        except Exception as e:
+            print(f"Serial trajectory upload error: {e}")
+            return False
+
+        self._uploaded_trajectory = waypoints
+        return True
+
+    @connection_method
+    def play_trajectory(self, timeout=5, should_continue=None, on_progress=None, is_paused=None):
+        """在固件本地回放upload_trajectory上传的轨迹
+
+        固件在每个点开始运动时回复TI,序号，全部完成后回复TD。is_paused返回True时发送TPAUSE，
+        固件走完当前点后停下，恢复时发送TRESUME；should_continue可以在暂停期间阻塞，
+        返回False或调用stop()时中止回放。
+
+        Args:
+            timeout: 两条进度通知之间的最长间隔(秒)，超时后用QSTAT确认固件仍在运行
+            should_continue: 可选回调，返回False时停止机械臂并中止回放
+            on_progress: 可选回调on_progress(index, angles)，路径点开始执行时调用
+            is_paused: 可选回调，返回True时暂停回放
+
+        Returns:
+            (已开始执行的路径点数量, 是否完整回放)
+        """
+        waypoints = self._uploaded_trajectory
+        if not self.is_connected() or not waypoints:
+            return 0, False
+
+        started = 0
+        paused = False
+        abort = self._abort_future
+        try:
+            self.send("TPLAY\n", sleep_time=0)
+            deadline = time.perf_counter() + timeout
+            while True:
+                line = self._wait_reply(self._is_playback_reply, self.TRAJ_POLL_INTERVAL, abort)
+                if line is not None:
+                    deadline = time.perf_counter() + timeout
+                    if line.startswith("TD,"):
+                        return started, started == len(waypoints)
+                    if line == "TS,0" or line.startswith("QF,"):
+                        return started, False
+                    if line.startswith("TI,"):
+                        index = int(line[3:])
+                        started = index + 1
+                        if on_progress is not None:
+                            on_progress(index, waypoints[index])
+
+                if abort.done():
+                    return started, False
+                if is_paused is not None and is_paused() != paused:
+                    paused = not paused
+                    self.send("TPAUSE\n" if paused else "TRESUME\n", sleep_time=0)
+                    deadline = time.perf_counter() + timeout
+                if should_continue is not None and not should_continue():
+                    # 固件会继续回放，必须让它停下
+                    self.stop()
+                    return started, False
+                if time.perf_counter() > deadline and not paused:
+                    # 单个路径点的运动可能超过timeout，固件仍有应答就继续等待
+                    if self.query_queue() is None:
+                        return started, False
+                    deadline = time.perf_counter() + timeout
+        except Exception as e:
+            print(f"Serial trajectory playback error: {e}")
+            return started, False
+
+    @connection_method
+    def execute_trajectory(self, waypoints, timeout=5, should_continue=None, on_progress=None, is_paused=None):
+        """执行整条轨迹: 固件支持时上传到固件内存后本地回放，否则用stream_exec流式发送
+
+        参数和返回值与stream_exec相同，on_progress在路径点开始执行(回放)或被固件队列接收(流式)时调用；
+        is_paused只在本地回放时使用，流式发送时由should_continue阻塞实现暂停。
+        """
+        waypoints = list(waypoints)
+        abort = self._abort_future
+        if self.trajectory_upload and len(waypoints) >= self.TRAJ_MIN_POINTS:
+            if self.upload_trajectory(waypoints, should_continue=should_continue):
+                return self.play_trajectory(timeout=timeout, should_continue=should_continue,
+                                            on_progress=on_progress, is_paused=is_paused)
+            if abort.done():
+                return 0, False
+        return self.stream_exec(waypoints, timeout=timeout, should_continue=should_continue, on_progress=on_progress)
+
+    @connection_method
+    def clear_serial_buffer(self):
+        """清空串口缓冲区"""
+        if self._serial and self._serial.is_open:
+            self._serial.reset_input_buffer()
+            self._serial.reset_output_buffer()
+            if self._reader is not None:
+                self._reader.clear()
+
+    @connection_method
+    def is_connected(self) -> bool:
+        return self._serial is not None and self._serial.is_open
+
+    @connection_method
+    def execute_command(self, command: Enum, *args, **kwargs) -> Any:
+        if not self.is_connected():
             raise ConnectionError("Serial port not connected")
             
-        if command not in cls._COMMAND_MAP:
+        if command not in self._COMMAND_MAP:
             raise ValueError(f"Command {command.value} not supported")
             
-        cmd_str = f"{cls._COMMAND_MAP[command]}"
+        cmd_str = f"{self._COMMAND_MAP[command]}"
         if args:
             cmd_str += "," + ",".join(map(str, args))
         cmd_str += "\n"
         
         try:
-            cls._serial.write(cmd_str.encode())
-            response = cls._serial.readline().decode().strip()
-            return response
+            future = self.expect(lambda line: True)
+            self._write(cmd_str.encode())
+            try:
+                lines, _ = future.result(timeout=self.timeout)
+                return lines[-1]
+            except FutureTimeoutError:
+                self.cancel_expect(future)
+                return ""
         except Exception as e:
             raise RuntimeError(f"Serial communication error: {e}") 
\ No newline at end of file
@@ -0,0 +1,156 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+
+class _Waiter:
+    """等待某个信号的调用者，收集从注册到信号出现之间的所有行"""
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.future = Future()
+        self.lines = []
+
+    def matches(self, line: str) -> bool:
+        if self.expected is None:
+            return False
+        if callable(self.expected):
+            return self.expected(line)
+        if isinstance(self.expected, (tuple, list, set, frozenset)):
+            return line in self.expected
+        return line == self.expected
+
+    def feed(self, line: str) -> bool:
+        """收到一行，匹配时完成future并返回True"""
+        if self.future.done():
+            # 调用者已取消等待
+            return True
+        self.lines.append(line)
+        if self.matches(line):
+            self.future.set_result((self.lines, True))
+            return True
+        return False
+
+
+class SerialLineReader:
+    """串口后台读取线程
+
+    每个串口只有一个读取线程，按行分帧一次后分发给订阅者，并完成等待中的future。
+    没有调用者等待时到达的行暂存在积压队列中，避免在两次调用之间丢失应答。
+    """
+
+    BACKLOG_SIZE = 1000     # 积压队列最大行数
+    BACKLOG_MAX_AGE = 1.0   # 积压行的有效期(秒)，超时的旧应答不会被新的等待误匹配
+
+    def __init__(self, serial_port, name="serial-reader"):
+        self._serial = serial_port
+        self._cond = threading.Condition()
+        self._backlog = deque(maxlen=self.BACKLOG_SIZE)
+        self._waiters = []
+        self._subscribers = []
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """停止读取线程，并让所有等待中的future超时返回"""
+        self._stop_event.set()
+        try:
+            self._serial.cancel_read()
+        except Exception:
+            pass
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def subscribe(self, callback):
+        """订阅所有收到的行，callback(line)在读取线程中调用"""
+        with self._cond:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._cond:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def expect(self, expected=None) -> Future:
+        """返回等待指定信号的future
+
+        Args:
+            expected: 期望的行，可以是字符串、字符串集合或判断函数；None表示只收集不匹配
+
+        Returns:
+            Future，结果为(收到的行列表, True)
+        """
+        waiter = _Waiter(expected)
+        with self._cond:
+            self._expire_backlog()
+            while self._backlog:
+                _, line = self._backlog.popleft()
+                if waiter.feed(line):
+                    return waiter.future
+            self._waiters.append(waiter)
+        return waiter.future
+
+    def cancel(self, future: Future) -> list:
+        """取消等待，返回已收集的行"""
+        with self._cond:
+            for waiter in self._waiters:
+                if waiter.future is future:
+                    self._waiters.remove(waiter)
+                    future.cancel()
+                    return waiter.lines
+        return []
+
+    def clear(self):
+        """清空积压队列"""
+        with self._cond:
+            self._backlog.clear()
+
+    def _expire_backlog(self):
+        deadline = time.monotonic() - self.BACKLOG_MAX_AGE
+        while self._backlog and self._backlog[0][0] < deadline:
+            self._backlog.popleft()
+
+    def _dispatch(self, line: str):
+        with self._cond:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(line)
+            except Exception as e:
+                print(f"Serial subscriber error: {e}")
+
+        with self._cond:
+            if self._waiters:
+                self._waiters = [waiter for waiter in self._waiters if not waiter.feed(line)]
+            else:
+                self._backlog.append((time.monotonic(), line))
+
+    def _run(self):
+        buffer = bytearray()
+        while not self._stop_event.is_set():
+            try:
+                # 阻塞读取，超时由串口timeout决定，不再忙等in_waiting
+                data = self._serial.read(self._serial.in_waiting or 1)
+            except Exception as e:
+                if not self._stop_event.is_set():
+                    print(f"Serial read error: {e}")
+                break
+            if not data:
+                continue
+
+            buffer += data
+            index = buffer.find(b'\n')
+            while index != -1:
+                line = buffer[:index].decode(errors='ignore').strip()
+                del buffer[:index + 1]
+                if line:
+                    self._dispatch(line)
+                index = buffer.find(b'\n')
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+串口收发记录与回放
+
+SerialCapture包装串口对象，把每次写入(TX)和读取(RX)的数据块连同单调时钟时间戳写入二进制记录文件；
+SerialReplay把记录文件作为串口回放给SerialProtocol，用于离线复现现场问题。
+
+用法(在src目录下): python -m protocol.serial_trace 记录文件.strc   打印记录内容
+"""
+
+import os
+import sys
+import time
+import struct
+import threading
+from collections import deque
+from urllib.parse import parse_qs
+
+
+class TraceWriter:
+    """串口记录文件写入
+
+    文件格式:
+        HEADER(magic, 版本, 保留, 开始时的墙上时间, 波特率) + 端口名(HEADER中给出长度)
+        之后是连续的记录: RECORD(方向, 距开始的微秒数, 长度) + 数据
+    """
+
+    MAGIC = b"STRC"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHdIH")     # magic, version, 保留, wall time, baudrate, 端口名长度
+    RECORD = struct.Struct("<BQH")          # direction, 微秒, length
+    TX = 0
+    RX = 1
+    MAX_CHUNK = 0xFFFF
+    FLUSH_INTERVAL = 1.0                    # 最长缓存时间(秒)，崩溃时最多丢失这段时间的记录
+    FILE_EXTENSION = ".strc"
+
+    def __init__(self, path, port="", baudrate=0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'wb')
+        self._start = time.perf_counter()
+        self._last_flush = self._start
+        port_name = str(port).encode()
+        self._file.write(self.HEADER.pack(self.MAGIC, self.VERSION, 0, time.time(), int(baudrate or 0), len(port_name)))
+        self._file.write(port_name)
+        self._file.flush()
+
+    @classmethod
+    def create(cls, target, port="", baudrate=0):
+        """target为目录时在其中按时间自动命名"""
+        if os.path.isdir(target):
+            name = time.strftime("serial_%Y%m%d_%H%M%S") + cls.FILE_EXTENSION
+            target = os.path.join(target, name)
+        return cls(target, port, baudrate)
+
+    def write(self, direction, data):
+        """记录一个数据块"""
+        if not data:
+            return
+        now = time.perf_counter()
+        timestamp = int((now - self._start) * 1e6)
+        with self._lock:
+            if self._file is None:
+                return
+            view = memoryview(bytes(data))
+            for offset in range(0, len(view), self.MAX_CHUNK):
+                chunk = view[offset:offset + self.MAX_CHUNK]
+                self._file.write(self.RECORD.pack(direction, timestamp, len(chunk)))
+                self._file.write(chunk)
+            if now - self._last_flush >= self.FLUSH_INTERVAL:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    @classmethod
+    def read(cls, path):
+        """读取记录文件，返回(头信息字典, [(方向, 秒, 数据)])；文件末尾不完整的记录被忽略"""
+        with open(path, 'rb') as f:
+            header = f.read(cls.HEADER.size)
+            if len(header) < cls.HEADER.size:
+                raise ValueError(f"Invalid serial trace: {path}")
+            magic, version, _, wall_time, baudrate, port_length = cls.HEADER.unpack(header)
+            if magic != cls.MAGIC or version != cls.VERSION:
+                raise ValueError(f"Unsupported serial trace: {path}")
+            info = {'start_time': wall_time, 'baudrate': baudrate, 'port': f.read(port_length).decode(errors='ignore')}
+            records = []
+            while True:
+                record = f.read(cls.RECORD.size)
+                if len(record) < cls.RECORD.size:
+                    break
+                direction, timestamp, length = cls.RECORD.unpack(record)
+                data = f.read(length)
+                if len(data) < length:
+                    break
+                records.append((direction, timestamp / 1e6, data))
+        return info, records
+
+
+class SerialCapture:
+    """记录收发数据的串口包装，其余属性和方法直接转发给被包装的串口"""
+
+    def __init__(self, serial_port, writer: TraceWriter):
+        self._serial = serial_port
+        self.writer = writer
+
+    def write(self, data):
+        result = self._serial.write(data)
+        self.writer.write(TraceWriter.TX, data)
+        return result
+
+    def read(self, size=1):
+        data = self._serial.read(size)
+        self.writer.write(TraceWriter.RX, data)
+        return data
+
+    def close(self):
+        try:
+            self._serial.close()
+        finally:
+            self.writer.close()
+
+    def __getattr__(self, name):
+        return getattr(self._serial, name)
+
+
+class SerialReplay:
+    """把记录文件当作串口回放
+
+    每个RX数据块都锚定在记录中它前面的那条记录上: 前一条是TX时，要等主机写入的字节数达到
+    记录中的位置才开始计时，前一条是RX时从上一块交付时开始计时，间隔按speed缩放。
+    因此应答不会早于引起它的命令，回放结果与主机线程的调度无关。speed为0时不等待，全速回放。
+
+    主机写入的数据与记录中的TX比较，第一处不一致的位置记录在divergence中。
+    """
+
+    URL_PREFIX = "replay://"
+
+    def __init__(self, path, speed=1.0, timeout=1.0):
+        info, records = TraceWriter.read(path)
+        self.path = path
+        self.port = info['port']
+        self.baudrate = info['baudrate']
+        self.timeout = timeout
+        self.speed = speed
+        self.is_open = True
+
+        self._expected_tx = bytearray()
+        self._tx_ends = []              # 每条TX记录结束时的累计字节数
+        self._rx_chunks = []            # (数据, 锚点TX记录下标或None, 距锚点的秒数)
+        last_time = 0.0
+        last_tx = None
+        previous_is_tx = False
+        for direction, timestamp, data in records:
+            if direction == TraceWriter.TX:
+                self._expected_tx += data
+                self._tx_ends.append(len(self._expected_tx))
+                last_tx = len(self._tx_ends) - 1
+                previous_is_tx = True
+            else:
+                anchor = last_tx if previous_is_tx else None
+                if anchor is None and not self._rx_chunks:
+                    anchor = last_tx
+                self._rx_chunks.append((data, anchor, timestamp - last_time))
+                previous_is_tx = False
+            last_time = timestamp
+
+        self._cond = threading.Condition()
+        self._start = time.perf_counter()
+        self._tx_written = 0
+        self._tx_done_times = []        # 每条TX记录被主机写完的时间
+        self._next_rx = 0
+        self._last_rx_time = self._start
+        self._pending = deque()
+        self._cancelled = False
+        self.divergence = None          # 主机写入与记录第一次不一致的字节位置
+
+    @classmethod
+    def from_url(cls, url, timeout=1.0):
+        """解析replay://路径[?speed=倍数]"""
+        path, _, query = url[len(cls.URL_PREFIX):].partition('?')
+        speed = float(parse_qs(query).get('speed', ['1'])[0])
+        return cls(path, speed=speed, timeout=timeout)
+
+    @property
+    def finished(self) -> bool:
+        """记录中的数据是否已全部交付"""
+        return self._next_rx >= len(self._rx_chunks) and not self._pending
+
+    def write(self, data):
+        data = bytes(data)
+        now = time.perf_counter()
+        with self._cond:
+            start = self._tx_written
+            if self.divergence is None and self._expected_tx[start:start + len(data)] != data:
+                expected = self._expected_tx[start:start + len(data)]
+                mismatch = next((i for i, (a, b) in enumerate(zip(data, expected)) if a != b), len(expected))
+                self.divergence = start + mismatch
+            self._tx_written += len(data)
+            while (len(self._tx_done_times) < len(self._tx_ends) and
+                   self._tx_ends[len(self._tx_done_times)] <= self._tx_written):
+                self._tx_done_times.append(now)
+            self._cond.notify_all()
+        return len(data)
+
+    def _release(self, now):
+        """把到期的RX数据块放入接收缓冲区，返回下一块的到期时间(None表示在等待主机写入或已结束)"""
+        while self._next_rx < len(self._rx_chunks):
+            data, anchor, gap = self._rx_chunks[self._next_rx]
+            if anchor is None:
+                anchor_time = self._last_rx_time
+            elif anchor < len(self._tx_done_times):
+                anchor_time = max(self._tx_done_times[anchor], self._last_rx_time)
+            else:
+                return None
+            due = anchor_time + (gap / self.speed if self.speed else 0.0)
+            if due > now:
+                return due
+            self._pending.extend(data)
+            self._last_rx_time = due
+            self._next_rx += 1
+        return None
+
+    @property
+    def in_waiting(self) -> int:
+        with self._cond:
+            self._release(time.perf_counter())
+            return len(self._pending)
+
+    def read(self, size=1):
+        deadline = None if self.timeout is None else time.perf_counter() + self.timeout
+        with self._cond:
+            while True:
+                now = time.perf_counter()
+                due = self._release(now)
+                if self._pending or self._cancelled or not self.is_open:
+                    break
+                wait = None if deadline is None else deadline - now
+                if wait is not None and wait <= 0:
+                    break
+                if due is not None:
+                    wait = due - now if wait is None else min(wait, due - now)
+                self._cond.wait(wait)
+            self._cancelled = False
+            count = min(size, len(self._pending))
+            return bytes(self._pending.popleft() for _ in range(count))
+
+    def cancel_read(self):
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.is_open = False
+            self._cond.notify_all()
+
+    def reset_input_buffer(self):
+        # 记录中只有被主机读到的数据，清空会让回放与现场不一致，因此忽略
+        pass
+
+    def reset_output_buffer(self):
+        pass
+
+    def setDTR(self, value=True):
+        pass
+
+    def setRTS(self, value=True):
+        pass
+
+
+def dump(path):
+    """打印记录文件内容"""
+    info, records = TraceWriter.read(path)
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(info['start_time']))
+    print(f"port {info['port']} baudrate {info['baudrate']} started {started}, {len(records)} records")
+    for direction, timestamp, data in records:
+        arrow = "->" if direction == TraceWriter.TX else "<-"
+        print(f"{timestamp:12.6f} {arrow} {data!r}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python -m protocol.serial_trace <trace.strc>")
+        sys.exit(1)
+    dump(sys.argv[1])
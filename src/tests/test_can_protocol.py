@@ -0,0 +1,131 @@
+"""CanProtocol在python-can virtual接口上的测试，覆盖can_example中的帧格式、周期发送和反馈分发"""
+
+import struct
+import threading
+import time
+
+import can
+import pytest
+
+from protocol.can_protocol import CanProtocol
+
+
+@pytest.fixture
+def channel(request):
+    """每个测试独立的virtual通道"""
+    return f"test_{request.node.name}"
+
+
+@pytest.fixture
+def connection(channel):
+    protocol = CanProtocol()
+    assert protocol.connect(channel, interface="virtual")
+    yield protocol
+    protocol.disconnect()
+
+
+@pytest.fixture
+def controller(channel):
+    """模拟关节控制器一侧的总线"""
+    bus = can.interface.Bus(channel=channel, interface="virtual")
+    yield bus
+    bus.shutdown()
+
+
+def test_setpoint_frames(connection, controller):
+    angles = [1.5, -2.25, 90.0]
+    assert connection.send_setpoints(angles)
+
+    for joint, angle in enumerate(angles):
+        msg = controller.recv(timeout=1.0)
+        assert msg is not None
+        assert msg.arbitration_id == CanProtocol.SETPOINT_BASE_ID + joint
+        assert not msg.is_extended_id
+        assert bytes(msg.data) == struct.pack("<f", angle)
+        assert CanProtocol.JOINT_FRAME.unpack(msg.data)[0] == angle
+    assert controller.recv(timeout=0.05) is None
+
+
+def test_stream_trajectory_periodic_rate(connection, controller):
+    rate = 100
+    trajectory = [[float(i), -float(i)] for i in range(30)]
+    received = []
+
+    def collect(stop):
+        while not stop.is_set():
+            msg = controller.recv(timeout=0.05)
+            if msg is not None and msg.arbitration_id == CanProtocol.SETPOINT_BASE_ID:
+                received.append((msg.timestamp, CanProtocol.JOINT_FRAME.unpack(msg.data)[0]))
+
+    stop = threading.Event()
+    collector = threading.Thread(target=collect, args=(stop,), daemon=True)
+    collector.start()
+    try:
+        sent, success = connection.stream_trajectory(trajectory, rate=rate)
+        time.sleep(0.05)
+    finally:
+        stop.set()
+        collector.join()
+
+    assert (sent, success) == (len(trajectory), True)
+    # 周期任务停止后不再发送
+    assert controller.recv(timeout=3.0 / rate) is None
+
+    # 每个周期发送一帧，发送间隔接近1/rate
+    timestamps = [timestamp for timestamp, _ in received]
+    intervals = [b - a for a, b in zip(timestamps, timestamps[1:])]
+    assert len(received) >= len(trajectory)
+    assert sum(intervals) / len(intervals) == pytest.approx(1.0 / rate, rel=0.3)
+
+    # 设定值按轨迹顺序更新，最后一帧为轨迹终点
+    values = [value for _, value in received]
+    assert values == sorted(values)
+    assert values[0] == trajectory[0][0]
+    assert values[-1] == trajectory[-1][0]
+
+
+def test_feedback_dispatch_through_notifier(connection, controller):
+    assert connection.start_feedback()
+    feedback = threading.Event()
+    messages = []
+
+    def on_message(msg):
+        messages.append(msg)
+        if msg.arbitration_id == CanProtocol.FEEDBACK_BASE_ID + 1:
+            feedback.set()
+
+    connection.subscribe(on_message)
+    controller.send(can.Message(arbitration_id=CanProtocol.FEEDBACK_BASE_ID + 1,
+                                data=CanProtocol.JOINT_FRAME.pack(12.5), is_extended_id=False))
+    assert feedback.wait(1.0)
+    assert connection.joint_feedback == {1: 12.5}
+
+    # 非反馈帧不更新关节反馈，由receive从缓冲读取器取得
+    controller.send(can.Message(arbitration_id=0x123, data=[1, 2, 3], is_extended_id=False))
+    assert bytes(connection.receive(timeout=1.0)) == b"\x01\x02\x03"
+    assert connection.joint_feedback == {1: 12.5}
+    assert [msg.arbitration_id for msg in messages] == [CanProtocol.FEEDBACK_BASE_ID + 1, 0x123]
+
+    connection.unsubscribe(on_message)
+    connection.stop_feedback()
+
+
+def test_execute_trajectory_pause(connection, controller):
+    trajectory = [[float(i)] for i in range(10)]
+    paused = threading.Event()
+    progress = []
+
+    def on_progress(index, point):
+        progress.append(index)
+        if index == 2:
+            paused.set()
+            threading.Timer(0.2, paused.clear).start()
+
+    start = time.perf_counter()
+    sent, success = connection.execute_trajectory(trajectory, on_progress=on_progress, is_paused=paused.is_set)
+    elapsed = time.perf_counter() - start
+
+    assert (sent, success) == (len(trajectory), True)
+    assert progress == list(range(len(trajectory)))
+    # 暂停期间不发送新点，恢复后不追发
+    assert elapsed >= 0.2 + (len(trajectory) - 1) / CanProtocol.STREAM_RATE
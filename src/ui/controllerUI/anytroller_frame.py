@@ -1,14 +1,16 @@
 import os
-import json
 import time
 import tkinter as tk
 from PIL import Image
 import customtkinter as ctk
 from tkinter import messagebox, filedialog
 from tkinter.scrolledtext import ScrolledText
-from threading import Thread, Event
+from threading import Thread
 
 from utils.config import Config
+from utils.teach_recorder import TeachRecorder
+from utils.trajectory_file import TrajectoryFile
+from utils.replay_scheduler import ReplayScheduler
 from utils.resource_loader import ResourceLoader
 from utils.tooltip import ToolTip
 from protocol.serial_protocol import SerialProtocol, SerialCommands
@@ -18,6 +20,9 @@ from ui.controllerUI.command_info_dialog import CommandInfoDialog
 from ui.controllerUI.script_generator import ScriptGenerator
 
 class AnytrollerFrame(ctk.CTkFrame):
+    RECORD_LOG_INTERVAL = 0.5  # 录制数据日志最小间隔(秒)
+    PROGRESS_POLL_MS = 50      # 回放进度条刷新间隔(毫秒)
+
     def __init__(self, master, robot_state):
         super().__init__(master)
         self.current_profile = ProfileManager.current_profile
@@ -49,17 +54,18 @@ class AnytrollerFrame(ctk.CTkFrame):
         self.protocol_class = SerialProtocol if self.current_profile["robot_type"] == "PWM/I2C" else CanProtocol
 
         self.robot_state = robot_state
-        self.robot_state.add_observer(self)
+        self.robot_state.add_observer(self, keys=('joint_angles',))
         
         self.operating_system = Config.operating_system
 
-        self.stop_event = Event()
-        self.read_thread = None
         self.recording = False
         self.replaying = False
+        self.replay_scheduler = None  # 回放调度器，回放期间有效
         self.gripper_open = False
         self.paused = False
-        self.data = []
+        self.recorder = None  # 示教录制器，录制期间有效
+        self._last_record_log = 0
+        self._record_once_active = False  # record once期间收到的行由on_record_once记录，订阅回调不重复记录
         self.command_history = []
         
         # 存储当前关节角度
@@ -367,6 +373,13 @@ class AnytrollerFrame(ctk.CTkFrame):
         self.repeat_spinbox.grid(row=0, column=1, padx=5, pady=2, sticky="e")
         self.repeat_spinbox.insert(0, "1")
 
+        self.speed_label = ctk.CTkLabel(self.repeat_frame, text=Config.current_lang["speed"], anchor='w')
+        self.speed_label.grid(row=1, column=0, padx=(0, 5), pady=2, sticky="w")
+
+        self.speed_entry = ctk.CTkEntry(self.repeat_frame, width=50)
+        self.speed_entry.grid(row=1, column=1, padx=5, pady=2, sticky="e")
+        self.speed_entry.insert(0, "1.0")
+
          # 添加进度条
         self.progress_frame = ctk.CTkFrame(self.program_frame, fg_color="#B3B3B3")
         self.progress_frame.grid(row=3, column=0, columnspan=3, padx=10, pady=10, sticky="ew")
@@ -374,9 +387,6 @@ class AnytrollerFrame(ctk.CTkFrame):
         self.progress_bar = ctk.CTkProgressBar(self.progress_frame)
         self.progress_bar.pack(fill="x", padx=10, pady=5)
         self.progress_bar.set(0)
-        
-        # 添加进度更新事件
-        self.progress_update_event = Event()
 
         self.estop_button = ctk.CTkButton(self.program_frame, text=Config.current_lang["stop"], command=self.on_emergency_pause_resume, width=80, height=80, hover_color="#d64141")
         self.estop_button.grid(row=1, column=2, rowspan=2, padx=20, pady=10)
@@ -434,7 +444,7 @@ class AnytrollerFrame(ctk.CTkFrame):
         """更新连接状态"""
         if self.protocol_class.is_connected():
             self.status_indicator.configure(fg_color="#41d054")
-            self.connection_status_label.configure(text=f"{self.protocol_class.port}")
+            self.connection_status_label.configure(text=f"{self.protocol_class.default().port}")
         else:
             self.status_indicator.configure(fg_color="red")
             self.connection_status_label.configure(text=Config.current_lang["disconnected"])
@@ -581,6 +591,7 @@ class AnytrollerFrame(ctk.CTkFrame):
             elif cmd == 'M280':
                 last_m280_idx = i
         
+        self._record_once_active = True
         try:
             # 根据存在性和顺序决定发送什么
             if last_exec_idx == -1 and last_m280_idx == -1:
@@ -594,7 +605,7 @@ class AnytrollerFrame(ctk.CTkFrame):
                 if success:
                     for response in all_responses:
                         if response.startswith("M280,"):
-                            self.data.append(response)
+                            self.record_line(response)
                             self.log_message(f"Recorded tool data: {response}")
                 else:
                     self.log_message("Timeout waiting for TP0 signal")
@@ -605,7 +616,7 @@ class AnytrollerFrame(ctk.CTkFrame):
                 if success:
                     for response in all_responses:
                         if response.startswith("REC,"):
-                            self.data.append(response)
+                            self.record_line(response)
                             self.log_message(f"Recorded joint data: {response}")
                 else:
                     self.log_message("Timeout waiting for CP0 signal")
@@ -618,7 +629,7 @@ class AnytrollerFrame(ctk.CTkFrame):
                     if success:
                         for response in all_responses:
                             if response.startswith("M280,"):
-                                self.data.append(response)
+                                self.record_line(response)
                                 self.log_message(f"Recorded tool data: {response}")
                     else:
                         self.log_message("Timeout waiting for TP0 signal")
@@ -629,7 +640,7 @@ class AnytrollerFrame(ctk.CTkFrame):
                     if success:
                         for response in all_responses:
                             if response.startswith("REC,"):
-                                self.data.append(response)
+                                self.record_line(response)
                                 self.log_message(f"Recorded joint data: {response}")
                     else:
                         self.log_message("Timeout waiting for CP0 signal")
@@ -640,7 +651,7 @@ class AnytrollerFrame(ctk.CTkFrame):
                     if success:
                         for response in all_responses:
                             if response.startswith("REC,"):
-                                self.data.append(response)
+                                self.record_line(response)
                                 self.log_message(f"Recorded joint data: {response}")
                     else:
                         self.log_message("Timeout waiting for CP0 signal")
@@ -651,13 +662,13 @@ class AnytrollerFrame(ctk.CTkFrame):
                     if success:
                         for response in all_responses:
                             if response.startswith("M280,"):
-                                self.data.append(response)
+                                self.record_line(response)
                                 self.log_message(f"Recorded tool data: {response}")
                     else:
                         self.log_message("Timeout waiting for TP0 signal")
             
             # 添加延迟到数据中
-            self.data.append(f"DELAY,S{loop_delay}")
+            self.record_line(f"DELAY,S{loop_delay}")
             
             # 清空命令历史，为下一次记录做准备
             self.command_history.clear()
@@ -666,139 +677,119 @@ class AnytrollerFrame(ctk.CTkFrame):
             self.log_message(f"Error sending data: {e}")
             # 即使出错也要清空命令历史
             self.command_history.clear()
+        finally:
+            self._record_once_active = False
+
+    def record_line(self, line):
+        """把一行录制数据写入示教录制器"""
+        recorder = self.recorder
+        return recorder is not None and recorder.add_line(line)
 
-    def read_serial(self):
-        """read data from serial"""
-        buffer = ""
-        while self.recording and not self.stop_event.is_set():
-            try:
-                serial_conn = self.protocol_class._serial
-                if serial_conn and serial_conn.in_waiting:
-                    buffer += serial_conn.read(serial_conn.in_waiting).decode()
-                    lines = buffer.split('\n')
-                    buffer = lines.pop()  # leave incomplete lines in buffer
-                    for line in lines:
-                        line = line.strip()
-                        if line.startswith("REC,"):
-                            self.data.append(line)
-                            self.log_message(f"received data: {line}")
-                            
-            except Exception as e:
-                self.log_message(f"从串口读取时出错：{e}")
-            time.sleep(0.005)
-        self.log_message(f"停止读取串口数据。总数据点：{len(self.data)}")
+    def on_serial_line(self, line):
+        """serial line callback from the protocol reader thread"""
+        recorder = self.recorder
+        if not self.recording or recorder is None or self._record_once_active:
+            return
+        if line.startswith("REC,") and recorder.add_line(line):
+            # 限制日志频率，避免高频采样拖慢界面
+            now = time.time()
+            if now - self._last_record_log >= self.RECORD_LOG_INTERVAL:
+                self._last_record_log = now
+                self.log_message(f"received data ({recorder.count}): {line}")
 
     def start_recording(self):
         """start recording"""
         self.recording = True
-        self.data.clear()
+        self.recorder = TeachRecorder.create_session()
         self.command_history.clear()  # 清空命令历史
         self.protocol_class.send("RECSTART\n")  # send start command to ESP32
-        self.stop_event.clear()  # reset stop event
-        if self.read_thread is None or not self.read_thread.is_alive():
-            self.read_thread = Thread(target=self.read_serial)
-            self.read_thread.start()
+        try:
+            self.protocol_class.subscribe(self.on_serial_line)
+        except Exception as e:
+            self.log_message(f"从串口读取时出错：{e}")
         self.log_message("Recording started.")
 
+    def discard_recording(self):
+        """用户取消保存时关闭录制器，会话文件保留在应用数据目录中"""
+        recorder, self.recorder = self.recorder, None
+        if recorder is None:
+            return
+        recorder.close()
+        if recorder.count:
+            self.log_message(f"Recording stopped. No file saved, session log kept at {recorder.path}")
+        else:
+            os.remove(recorder.path)
+            self.log_message("Recording stopped. No file saved.")
+
     def stop_recording(self, filename):
         """stop recording"""
         self.recording = False
         self.protocol_class.send("RECSTOP\n", sleep_time=0.1)  # send stop command to ESP32
         
-        if not self.data:
+        recorder, self.recorder = self.recorder, None
+        if recorder is None:
+            return
+        recorder.close()
+        
+        if recorder.count == 0:
+            os.remove(recorder.path)
             self.log_message("No data recorded.")
             messagebox.showwarning("No Data", "No data was recorded.")
             return
         
         try:
-            with open(filename, 'w') as f:
-                json.dump(self.data, f, indent=4)
+            if filename.lower().endswith(TrajectoryFile.FILE_EXTENSION):
+                TrajectoryFile.from_teach_log(recorder.path).save(filename)
+            else:
+                TeachRecorder.export_json(recorder.path, filename)
+            os.remove(recorder.path)
             messagebox.showinfo("Saved", f"Data saved to {filename}")
             self.log_message(f"Recording stopped and data saved to {filename}.")
         except Exception as e:
-            error_msg = f"Error saving data to file: {str(e)}"
+            error_msg = f"Error saving data to file: {str(e)}. Session log kept at {recorder.path}"
             self.log_message(error_msg)
             messagebox.showerror("Save Error", error_msg)
         
-        self.data.clear()  # clear data for next recording
         self.command_history.clear()  # clear command history
 
-    def update_progress(self, total_steps):
-        """更新进度条的线程函数"""
-        current_step = 0
-        self.progress_bar.set(0)
-        
-        while current_step < total_steps and self.replaying:
-            if self.progress_update_event.is_set():
-                current_step += 1
-                # 使用after来确保在主线程中更新UI
-                self.after(0, lambda v=current_step/total_steps: self.progress_bar.set(v))
-                self.progress_update_event.clear()
-            time.sleep(0.001)  # 短暂休眠避免CPU占用过高
-        
-        self.after(0, lambda: self.progress_bar.set(0))
+    def poll_replay_progress(self):
+        """在界面线程中定时读取回放调度器的进度计数"""
+        scheduler = self.replay_scheduler
+        if scheduler is not None and scheduler.total:
+            self.progress_bar.set(scheduler.progress / scheduler.total)
+        if self.replaying:
+            self.after(self.PROGRESS_POLL_MS, self.poll_replay_progress)
+        else:
+            self.progress_bar.set(0)
 
-    def replay_trajectory(self, json_file, repeat_count):
+    def replay_trajectory(self, json_file, repeat_count, speed=1.0):
         """
         Replay trajectory from file with pause/resume support
         Args:
             json_file: trajectory file
             repeat_count: repeat count
+            speed: playback speed factor against the recorded timing
         """
         self.replaying = True
         try:
-            with open(json_file, 'r') as f:
-                trajectory = json.load(f)
-
-            total_steps = len(trajectory) * repeat_count
-            
-            # 启动进度条更新线程
-            progress_thread = Thread(target=self.update_progress, args=(total_steps,))
-            progress_thread.daemon = True  # 设置为守护线程
-            progress_thread.start()
+            trajectory = TrajectoryFile.load(json_file)
+            scheduler = ReplayScheduler(self.protocol_class, trajectory, repeat_count, speed)
+            self.replay_scheduler = scheduler
+            completed = scheduler.run(
+                should_continue=lambda: self.replaying,
+                is_paused=lambda: self.paused,
+                on_timeout=lambda command: self.log_message(f"replay {command.split(',')[0]} timeout"))
             
-            for repeat in range(repeat_count):
-                for data in trajectory:
-                    # 暂停时等待
-                    while self.paused and self.replaying:
-                        time.sleep(0.01)
-                    
-                    if not self.replaying:
-                        break
-                    
-                    # 检查是否是延迟命令
-                    if isinstance(data, str) and data.startswith("DELAY,"):
-                        command = data if data.endswith("\n") else data + "\n"
-                        self.protocol_class.send(command)
-                        continue
-                    elif isinstance(data, str) and data.startswith("REC,"):
-                        # 新格式的REC数据
-                        joint_values = data[4:].split(',')
-                        command = "REP," + ",".join(joint_values) + "\n"
-                    else:
-                        # 兼容旧格式的数组数据
-                        command = "REP," + ",".join(map(str, data)) + "\n"
-                    
-                    self.protocol_class.send(command, sleep_time=0.001)
-                    
-                    if not self.protocol_class.receive(timeout=5, expected_signal="CP1"):
-                        self.log_message("replay timeout")
-                        
-                    # 触发进度更新事件
-                    self.progress_update_event.set()
-                
-                if not self.replaying:
-                    break
-                
-            self.log_message(f"Replaying trajectory from {json_file} for {repeat_count} times.")
+            if completed:
+                self.log_message(f"Replaying trajectory from {json_file} for {repeat_count} times.")
+            else:
+                self.log_message(f"Replay stopped after {scheduler.progress}/{scheduler.total} steps.")
             self.update_callback_status(Config.current_lang["idle"], "grey")
         except Exception as e:
             self.log_message(f"Error replaying trajectory: {e}")
         finally:
             self.replaying = False
-            # 等待进度条线程结束
-            if progress_thread.is_alive():
-                progress_thread.join(timeout=1.0)
+            self.replay_scheduler = None
 
     def on_start_recording(self):
         """start recording button callback"""
@@ -813,15 +804,14 @@ class AnytrollerFrame(ctk.CTkFrame):
     def on_stop_recording(self):
         """stop recording button callback"""
         if self.recording:
-            self.stop_event.set()  # set stop event to end read thread
-            if self.read_thread and self.read_thread.is_alive():
-                self.read_thread.join(timeout=1.0)  # wait for thread to finish, max wait 1 second
-            filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")])
+            self.protocol_class.unsubscribe(self.on_serial_line)
+            self.log_message(f"停止读取串口数据。总数据点：{self.recorder.count if self.recorder else 0}")
+            filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json"), ("Trajectory files", "*" + TrajectoryFile.FILE_EXTENSION)])
             if filename:
                 self.stop_recording(filename)
             else:
-                self.log_message("Recording stopped. No file saved.")
                 self.recording = False
+                self.discard_recording()
                 self.protocol_class.send("RECSTOP\n")  # send stop command even if user cancels save
                 
             # Configure control states
@@ -831,15 +821,21 @@ class AnytrollerFrame(ctk.CTkFrame):
             self.execute_button.configure(state=ctk.NORMAL)
 
     def on_replay_file(self):
-        serial_conn = self.protocol_class._serial
-        if serial_conn and serial_conn.is_open and not self.recording and not self.replaying:
-            json_file = filedialog.askopenfilename(filetypes=[("JSON files", ".json")])
+        if self.protocol_class.is_connected() and not self.recording and not self.replaying:
+            json_file = filedialog.askopenfilename(filetypes=[("Trajectory files", "*.json *" + TrajectoryFile.FILE_EXTENSION), ("JSON files", "*.json"), ("Teach logs", "*" + TeachRecorder.FILE_EXTENSION)])
             if json_file:
                 repeat_count = int(self.repeat_spinbox.get()) if self.repeat_spinbox.get().isdigit() else 1
                 self.update_callback_status("Replaying trajectory...", "purple")
                 self.replaying = True
                 self.paused = False 
-                Thread(target=self.replay_trajectory, args=(json_file, repeat_count)).start()
+                try:
+                    speed = float(self.speed_entry.get())
+                except ValueError:
+                    speed = 1.0
+                if speed <= 0:
+                    speed = 1.0
+                Thread(target=self.replay_trajectory, args=(json_file, repeat_count, speed), daemon=True).start()
+                self.poll_replay_progress()
 
     def on_emergency_pause_resume(self):
         if self.replaying:
@@ -851,6 +847,11 @@ class AnytrollerFrame(ctk.CTkFrame):
                 self.log_message("Resuming replay.")
             else:
                 self.paused = True
+                # 通过优先通道立即停止当前运动
+                if hasattr(self.protocol_class, 'stop'):
+                    latency, confirmed = self.protocol_class.stop()
+                    if confirmed:
+                        self.log_message(f"Robot stopped in {latency * 1000:.1f} ms")
                 self.estop_button.configure(text=Config.current_lang["resume"])
                 self.update_callback_status("Paused", "red")
                 self.log_message("Paused replay.")
@@ -911,6 +912,7 @@ class AnytrollerFrame(ctk.CTkFrame):
         self.stop_button.configure(text=Config.current_lang["stop_recording"])
         self.replay_button.configure(text=Config.current_lang["replay_trajectory"])
         self.repeat_label.configure(text=Config.current_lang["repeat"])
+        self.speed_label.configure(text=Config.current_lang["speed"])
         self.estop_button.configure(text=Config.current_lang["stop"] if not getattr(self, 'paused', False) else Config.current_lang["resume"])
         self.gripper_label.configure(text=Config.current_lang["tool"])
         self.loop_delay_label.configure(text=Config.current_lang["loop_delay"])
@@ -942,10 +944,11 @@ class AnytrollerFrame(ctk.CTkFrame):
         if self.script_generator is not None:
             self.script_generator.update_texts()
 
-    def update(self, state):
+    def update(self, state, changed_keys=None):
         """根据状态更新UI
         Args:
             state: 状态字典
+            changed_keys: 变化的键
         """
         joint_angles = state['joint_angles']
         
@@ -961,9 +964,13 @@ class AnytrollerFrame(ctk.CTkFrame):
         """销毁anytroller frame并清理所有资源"""
         try:
             # 停止所有线程
-            self.stop_event.set()
-            if self.read_thread and self.read_thread.is_alive():
-                self.read_thread.join(timeout=1.0)
+            if hasattr(self.protocol_class, 'unsubscribe'):
+                self.protocol_class.unsubscribe(self.on_serial_line)
+            
+            # 关闭录制器，未保存的会话文件保留在应用数据目录中
+            if self.recorder is not None:
+                self.recorder.close()
+                self.recorder = None
             
             # 移除robot_state观察者
             if hasattr(self, 'robot_state') and self.robot_state:
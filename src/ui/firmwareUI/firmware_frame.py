@@ -363,7 +363,7 @@ class FirmwareFrame(ctk.CTkFrame):
         self.progress_circle.set(0)
         self.update_custom_firmware_button.configure(state=ctk.DISABLED)
 
-        Thread(target=self._update_custom_firmware, args=(self.protocol_class.port, self.selected_file)).start()
+        Thread(target=self._update_custom_firmware, args=(self.protocol_class.default().port, self.selected_file)).start()
 
     def _update_custom_firmware(self, port, firmware_file):
         """使用FirmwareHelper更新自定义固件"""
@@ -413,7 +413,7 @@ class FirmwareFrame(ctk.CTkFrame):
         self.progress_circle.set(0)
         self.update_firmware_button.configure(state=ctk.DISABLED)
 
-        Thread(target=self._update_firmware, args=(self.protocol_class.port,)).start()
+        Thread(target=self._update_firmware, args=(self.protocol_class.default().port,)).start()
 
     def _update_firmware(self, port):
         """使用FirmwareHelper更新官方固件"""
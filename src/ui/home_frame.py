@@ -66,7 +66,8 @@ class HomeFrame(ctk.CTkFrame):
 
         ProfileManager.initialize()
         
-        self.robot_state = RobotState()
+        # 其他线程更新状态时，在界面线程中通知观察者
+        self.robot_state = RobotState(dispatch=lambda callback: self.after(0, callback))
 
         # initialize physics engine
         self.physics_engine = PhysicsEngine.get_instance()
@@ -13,6 +13,7 @@ from PIL import Image
 
 from utils.config import Config
 from utils.resource_loader import ResourceLoader
+from utils.path_simplifier import PathSimplifier
 from ui.kinematicsUI.gcodeUI.text2gcode import Text2GCode
 from noman.gcode_controller import GCodeController
 
@@ -29,6 +30,7 @@ class GCodeUI:
         self.gcode_terminal = None
         self.is_executing = False
         self.pause_execution = False
+        self.connection = None          # 正在执行的程序的目标机械臂
         self.is_compiled = False
 
         self.compiled_commands = []
@@ -496,6 +498,13 @@ HOME; 回到原点
         """Stop G-code execution"""
         self.is_executing = False
         self.pause_execution = False
+        
+        # 通过优先通道立即停止，不等待已排队的路径点
+        connection = self.connection or self.kinematics_frame.connection
+        if connection is not None and hasattr(connection, 'stop') and connection.is_connected():
+            latency, confirmed = connection.stop()
+            if confirmed:
+                self.update_gcode_terminal(f"Robot stopped in {latency * 1000:.1f} ms")
         self.status_label.configure(text=Config.current_lang["status_stopped"])
         self.pause_button.configure(image=self.pause_icon)
         self.update_gcode_terminal("Execution stopped")
@@ -566,6 +575,9 @@ HOME; 回到原点
         if not success:
             self.update_gcode_terminal(error_msg)
             return
+
+        if Config.simplify_paths:
+            self.compiled_commands = self.simplify_commands(self.compiled_commands)
         
         # record commands in cartesian space for visualisation
         self.cartesian_commands = self.gcode_controller.interpret2cartesian(self.compiled_commands)
@@ -583,6 +595,22 @@ HOME; 回到原点
         
         self.update_gcode_terminal(f"G代码编译完成")
                 
+    def simplify_commands(self, commands):
+        """删除连续EXEC指令中近似共线的路径点，其它指令原样保留"""
+        is_exec = np.array([cmd.strip().startswith('EXEC,') for cmd in commands], dtype=bool)
+        if is_exec.sum() < 3:
+            return commands
+        
+        exec_angles = {i: np.degrees([float(angle) for angle in commands[i].strip().split(',')[1:]])
+                       for i in np.flatnonzero(is_exec)}
+        points = np.zeros((len(commands), max(len(angles) for angles in exec_angles.values())))
+        for i, angles in exec_angles.items():
+            points[i, :len(angles)] = angles
+        
+        result = PathSimplifier(fk=self.kinematics_frame.simplifier_fk()).simplify_runs(points, is_exec)
+        self.update_gcode_terminal(f"路径简化: {result.summary()}")
+        return [commands[i] for i in result.indices]
+
     def execute_gcode(self, simulate=False):
         """Execute G-code command
         
@@ -600,6 +628,8 @@ HOME; 回到原点
         try:
             self.is_executing = True
             self.pause_execution = False
+            # 执行期间固定目标机械臂，切换选择不影响正在执行的程序
+            self.connection = self.kinematics_frame.connection
             
             execution_thread = Thread(target=self._execute_gcode_thread, 
                                 args=(simulate,))
@@ -627,7 +657,10 @@ HOME; 回到原点
             self.current_cline = 0
             
             # 执行主要部分
-            for command in self.compiled_commands:
+            index = 0
+            while index < len(self.compiled_commands):
+                command = self.compiled_commands[index]
+                index += 1
                 if not self.is_executing:
                     break
                     
@@ -687,38 +720,42 @@ HOME; 回到原点
                         
                     else:
                         if cmd_type == 'EXEC':
-                            joint_angles = np.degrees([float(angle) for angle in parts[1:]])
-                            joint_angles = [angle for angle in joint_angles]
-                            if self.kinematics_frame.protocol_class.is_connected():
-                                command = ",".join(f"{angle:.2f}" for angle in joint_angles)+'\n'
-                                
-                                # 重试机制：如果队列满，等待并重试
-                                max_retries = 2
-                                retry_count = 0
+                            if self.connection.is_connected():
+                                # 连续的EXEC指令合并为一批，上传到固件本地回放或按固件队列信用流水线发送
+                                batch_cline = self.current_cline
+                                batch = [command]
+                                while index < len(self.compiled_commands) and self.compiled_commands[index].strip().startswith('EXEC,'):
+                                    batch.append(self.compiled_commands[index].strip())
+                                    index += 1
+                                waypoints = [np.degrees([float(angle) for angle in cmd.split(',')[1:]]) for cmd in batch]
+
+                                def should_continue():
+                                    while self.pause_execution and self.is_executing:
+                                        time.sleep(0.1)
+                                    return self.is_executing
+
+                                def on_progress(i, _):
+                                    self.current_cline = batch_cline + i
+                                    self.current_command = batch[i]
+
                                 start_time = time.time()
-                                
-                                while retry_count < max_retries:
-                                    self.kinematics_frame.protocol_class.send(b"EXEC\n")
-                                    self.kinematics_frame.protocol_class.send(command)
-                                    response, isReplied = self.kinematics_frame.protocol_class.receive(timeout=5, expected_signal="CP0")
-                                    
-                                    if isReplied:
-                                        # 命令成功进入队列
+                                acked, isReplied = self.connection.execute_trajectory(
+                                    waypoints, timeout=5, should_continue=should_continue, on_progress=on_progress,
+                                    is_paused=lambda: self.pause_execution)
+
+                                if not isReplied:
+                                    if not self.is_executing:
                                         break
-                                    elif response and any("QFULL" in str(r) for r in response):
-                                        # 队列满，等待后重试
-                                        retry_count += 1
-                                        time.sleep(0.05)  # 等待50ms让队列有机会处理
-                                    else:
-                                        # 其他错误，抛出异常
-                                        raise Exception(f"执行超时 - 第{self.current_cline}行: {self.current_command}")
-                                
-                                if retry_count >= max_retries:
-                                    raise Exception(f"队列持续满载，无法执行 - 第{self.current_cline}行: {self.current_command}")
-                                
+                                    # 全部入队后才超时时acked等于len(batch)，报告最后一个路径点
+                                    failed = min(acked, len(batch) - 1)
+                                    # 与on_progress相同的行号，高亮、恢复和日志指向同一行
+                                    self.current_cline = batch_cline + failed
+                                    self.current_command = batch[failed]
+                                    raise Exception(f"执行超时 - 第{self.current_cline}行: {self.current_command}")
+
                                 end_time = time.time()
                                 execution_time = end_time - start_time
-                                self.update_gcode_terminal(f"  ** 耗时: {execution_time:.4f} s")
+                                self.update_gcode_terminal(f"  ** {len(batch)}个路径点耗时: {execution_time:.4f} s")
                         elif cmd_type == 'DELAY':
                             delay = 0
                             param = parts[1].strip().upper()
@@ -729,21 +766,21 @@ HOME; 回到原点
                             elif param.startswith('S'):
                                 delay = float(param[1:])
                                 command = f"DELAY,S{delay}\n"
-                            self.kinematics_frame.protocol_class.send(command)
+                            self.connection.send(command)
                         elif cmd_type == 'SPD':
                             # Handle velocity command for real robot
-                            if self.kinematics_frame.protocol_class.is_connected():
+                            if self.connection.is_connected():
                                 spd_command = command if command.endswith('\n') else command + '\n'
-                                self.kinematics_frame.protocol_class.send(spd_command)
+                                self.connection.send(spd_command)
                                 self.update_gcode_terminal(f"  ** 设置关节速度: {','.join(parts[1:])}")
                                 
                         elif cmd_type.startswith('TOOL['):  # 添加对TOOL命令的实际处理
-                            if self.kinematics_frame.protocol_class.is_connected():
+                            if self.connection.is_connected():
                                 # 确保命令以换行符结尾
                                 tool_command = command if command.endswith('\n') else command + '\n'
-                                self.kinematics_frame.protocol_class.send(tool_command)
+                                self.connection.send(tool_command)
                                 # 等待确认信号
-                                _, isReplied = self.kinematics_frame.protocol_class.receive(timeout=5, expected_signal="CP2")
+                                _, isReplied = self.connection.receive(timeout=5, expected_signal="CP2")
                                 if not isReplied:
                                     raise Exception(f"工具切换超时 - 第{self.current_cline}行: {self.current_command}")
                         elif cmd_type == 'M280':
@@ -751,12 +788,12 @@ HOME; 回到原点
                             if len(parts) > 1:
                                 # 支持多个值，parts[1:]包含所有状态值
                                 state_values = [float(val) for val in parts[1:]]
-                                if self.kinematics_frame.protocol_class.is_connected():
+                                if self.connection.is_connected():
                                     # Send M280 command to robot
                                     m280_command = command if command.endswith('\n') else command + '\n'
-                                    self.kinematics_frame.protocol_class.send(m280_command)
+                                    self.connection.send(m280_command)
 
-                                    _, isReplied = self.kinematics_frame.protocol_class.receive(timeout=5, expected_signal="TP0")
+                                    _, isReplied = self.connection.receive(timeout=5, expected_signal="TP0")
                                     if not isReplied:
                                         self.update_gcode_terminal("M280 timeout")
                                     else:
@@ -1,18 +1,25 @@
 import os
-import time
+import threading
+from collections import deque
 import numpy as np
 import pybullet as p
 import tkinter as tk
 from tkinter import messagebox
 from tkinter.scrolledtext import ScrolledText
 import customtkinter as ctk
+import serial.tools.list_ports
 from PIL import Image
 
 from ui.kinematicsUI.gcodeUI.gcode_ui import GCodeUI
 from ui.kinematicsUI.visionUI.vision_frame import VisionFrame
 from utils.resource_loader import ResourceLoader
 from utils.config import Config
+from utils.path_simplifier import PathSimplifier
+from utils.latest_wins_worker import LatestWinsWorker
+from utils.ik_cache import CachedPlanner
+from utils.batch_fk import BatchFK
 from ui.kinematicsUI.task_board import TaskBoard
+from ui.kinematicsUI.preview_animator import PreviewAnimator
 from ui.kinematicsUI.solver_manager import SolverManager
 from ui.kinematicsUI.workspaceUI.workspace_frame import WorkspaceFrame
 from noman.motion_planner.planner import Planner
@@ -21,11 +28,15 @@ from noman.profile_manager import ProfileManager
 from noman.TrajOptimiser import TrajOptimiser, TrajConstraints
 from protocol.serial_protocol import SerialProtocol, SerialCommands
 from protocol.can_protocol import CanProtocol, CANCommands
+from protocol.connection_registry import ConnectionRegistry
 
 class KinematicsFrame(ctk.CTkFrame):
+    DEFAULT_ARM = "Default"    # 机械臂选择中表示协议默认连接(配置页中连接的机械臂)
+
     def __init__(self, master, robot_state):
         super().__init__(master)
         self.protocol_class = None
+        self.connection = None     # 发送目标机械臂的连接，G代码和任务板开始执行时读取
         self.operating_system = Config.operating_system
 
         self.grid_columnconfigure(0, weight=1)
@@ -34,6 +45,19 @@ class KinematicsFrame(ctk.CTkFrame):
         self.current_solver = "LevenbergMarquardt"
         self.planner_method = "Direct"
 
+        # update_p的规划在后台线程中执行，连续修改目标时只规划最新的目标；planner不是线程安全的，用planner_lock保护
+        self.planner_lock = threading.Lock()
+        self.plan_worker = LatestWinsWorker(lambda callback: self.after(0, callback), name="kinematics-planner")
+        # 脚本(Blockly、任务板、语音助手)的目标按顺序逐个规划，每个都会应用并调用on_done
+        self.plan_queue = deque()   # [(基坐标系目标位置, 目标姿态, on_done)]
+        self.queue_worker = LatestWinsWorker(lambda callback: self.after(0, callback), name="kinematics-plan-queue")
+        self.queue_busy = False
+        # 规划结果按固定帧率预览，开销与轨迹点数无关
+        self.preview_animator = PreviewAnimator(
+            self, lambda solution: self.robot_state.update_state('joint_angles', np.degrees(solution), sender=self))
+        # 批量正向运动学与planner.getPoseGlobal的比较结果 {(BatchFK, 基座变换, TCP变换): 是否一致}
+        self.batch_fk_checked = {}
+
         self.main_group = None
         self.tool_group = None
         self.actuation = None
@@ -77,7 +101,7 @@ class KinematicsFrame(ctk.CTkFrame):
         )
 
         self.robot_state = robot_state
-        self.robot_state.add_observer(self)
+        self.robot_state.add_observer(self, keys=('joint_angles', 'tcp_offset', 'base_position', 'base_orientation'))
 
         try:
             self.load_robot_profile(init=True)
@@ -115,8 +139,26 @@ class KinematicsFrame(ctk.CTkFrame):
         self.upper_right_frame = ctk.CTkFrame(self.banner_frame, fg_color="transparent")
         self.upper_right_frame.grid(row=0, column=1, sticky="e")
 
+        # 目标机械臂选择
+        self.arm_frame = ctk.CTkFrame(self.upper_right_frame, fg_color="transparent")
+        self.arm_frame.grid(row=0, column=0, padx=(0, 20), sticky="e")
+        self.arm_label = ctk.CTkLabel(self.arm_frame, text="Arm")
+        self.arm_label.grid(row=0, column=0, sticky="w")
+        self.arm_var = tk.StringVar(value=self.DEFAULT_ARM)
+        self.arm_dropdown = ctk.CTkComboBox(
+            self.arm_frame,
+            variable=self.arm_var,
+            values=[self.DEFAULT_ARM],
+            command=self.on_arm_change,
+            state="readonly",
+            width=160
+        )
+        self.arm_dropdown.grid(row=0, column=1, padx=(10, 0), sticky="e")
+        self.refresh_arm_targets()
+        ConnectionRegistry.add_listener(lambda: self.after(0, self.refresh_arm_targets))
+
         self.taskboard_frame = ctk.CTkFrame(self.upper_right_frame, fg_color="transparent")
-        self.taskboard_frame.grid(row=0, column=0, sticky="e")
+        self.taskboard_frame.grid(row=0, column=1, sticky="e")
         self.taskboard_label = ctk.CTkLabel(self.taskboard_frame, text="Task Board")
         self.taskboard_label.grid(row=0, column=0, sticky="w")
         
@@ -455,6 +497,50 @@ class KinematicsFrame(ctk.CTkFrame):
                                      width=50, height=10)
         self.log_text.pack(fill="both", expand=True)
 
+    def refresh_arm_targets(self):
+        """刷新可选机械臂: 已建立的连接和本机串口"""
+        targets = set(ConnectionRegistry.keys())
+        if self.protocol_class is SerialProtocol:
+            targets.update(port.device for port in serial.tools.list_ports.comports())
+        self.arm_dropdown.configure(values=[self.DEFAULT_ARM] + sorted(targets))
+
+    def on_arm_change(self, choice):
+        """切换发送目标机械臂，选择尚未连接的端口时为它建立新连接"""
+        if choice == self.DEFAULT_ARM:
+            self.connection = self.protocol_class.default()
+            self.update_terminal(f"Target arm: {choice}")
+            return
+        # 新建连接需要等待控制器就绪和协商，放到后台线程避免阻塞界面
+        self.arm_dropdown.configure(state="disabled")
+        self.update_terminal(f"Connecting to {choice}...")
+        threading.Thread(target=self._open_arm, args=(self.protocol_class, choice), daemon=True).start()
+
+    def _open_arm(self, protocol_class, choice):
+        """在后台线程中打开目标机械臂的连接"""
+        error = None
+        try:
+            connection = ConnectionRegistry.open(protocol_class, choice)
+        except ValueError as e:
+            connection = None
+            error = str(e)
+        self.after(0, lambda: self._on_arm_opened(choice, connection, error))
+
+    def _on_arm_opened(self, choice, connection, error):
+        """在界面线程中应用后台连接的结果"""
+        self.arm_dropdown.configure(state="readonly")
+        if error:
+            self.update_terminal(error)
+        if connection is None:
+            self.update_terminal(f"Failed to connect to {choice}")
+            self.arm_var.set(self.DEFAULT_ARM)
+            self.connection = self.protocol_class.default()
+            return
+        if self.arm_var.get() != choice:
+            # 连接期间目标已被切换，保留连接但不再使用它
+            return
+        self.connection = connection
+        self.update_terminal(f"Target arm: {choice}")
+
     def on_task_toggle(self):
         """处理Task Board开关状态改变"""
         if self.task_var.get():
@@ -867,6 +953,10 @@ class KinematicsFrame(ctk.CTkFrame):
         """加载指定配置文件中的URDF"""
         try:
             self.protocol_class = SerialProtocol if ProfileManager.current_profile["robot_type"] == "PWM/I2C" else CanProtocol
+            self.connection = self.protocol_class.default()
+            if hasattr(self, 'arm_var'):
+                self.arm_var.set(self.DEFAULT_ARM)
+                self.refresh_arm_targets()
                 
             # 重置工作空间分析状态
             self.workspace_analyzed = False
@@ -921,12 +1011,22 @@ class KinematicsFrame(ctk.CTkFrame):
             )
             self.traj_constraints.set_vel(np.array(ProfileManager.current_profile["joint_speeds"]))
             
-            if init:
-                self.planner = Planner(init_planner="Direct", init_solver="LevenbergMarquardt")
-            else:
-                self.planner.load_profile()
+            # 旧机械臂的规划结果不再适用
+            self.plan_worker.cancel()
+            self.plan_queue.clear()
+            self.queue_worker.cancel()
+            self.queue_busy = False
+            with self.planner_lock:
+                if init:
+                    # 重复的目标位姿直接使用缓存的解，机械臂/求解器/偏移变化时缓存自动清空
+                    self.planner = CachedPlanner(Planner(init_planner="Direct", init_solver="LevenbergMarquardt"),
+                                                 solver_name="LevenbergMarquardt")
+                else:
+                    self.planner.load_profile()
 
             self.init_robot_state()
+            # 提前核对批量正向运动学，规划期间界面线程的正向运动学不用等待planner
+            self._batch_fk(blocking=False)
             
             # 初始化坐标系（在robot state之后）
             self.init_coordinate_systems()
@@ -992,16 +1092,17 @@ class KinematicsFrame(ctk.CTkFrame):
         self.planner_method = self.planner_var.get()
         self.num_pathpoints = int(self.num_pathpoints_entry.get())
                 
-        self.planner.set_solver(self.current_solver, solver_params)
-        self.planner.set_planner(self.planner_method)
+        with self.planner_lock:
+            self.planner.set_solver(self.current_solver, solver_params)
+            self.planner.set_planner(self.planner_method)
 
-        self.planner.setNumPathpoints(self.num_pathpoints)
+            self.planner.setNumPathpoints(self.num_pathpoints)
 
     def init_robot_state(self):
         """初始化机器人状态，计算正向运动学并更新UI"""
 
         current_angles = np.radians(self.joint_angles)
-        current_position, current_orientation, _ = self.planner.getPoseGlobal(current_angles, self.end_effector_link)
+        current_position, current_orientation, _ = self._pose_global(current_angles, self.end_effector_link)
         
         if current_position is not None and current_orientation is not None:
             self.target_position = current_position
@@ -1014,13 +1115,15 @@ class KinematicsFrame(ctk.CTkFrame):
             for joint in self.tool_group:
                 tool_home_values.append(joint.get("home", 0.0))
         
-        self.robot_state.update_state('joint_angles', self.joint_angles, sender=self)
-        self.robot_state.update_state('home_values', self.home_values, sender=self)
-        self.robot_state.update_state('tool_state', tool_home_values, sender=self)
-        self.robot_state.update_state('end_effector_link', self.end_effector_link, sender=self)
-        self.robot_state.update_state('target_position', self.target_position, sender=self)
-        self.robot_state.update_state('target_orientation', np.array(p.getQuaternionFromEuler(current_orientation)), sender=self)
-        self.robot_state.update_state('tcp_offset', self.planner.ee_offset, sender=self)
+        self.robot_state.update_many({
+            'joint_angles': self.joint_angles,
+            'home_values': self.home_values,
+            'tool_state': tool_home_values,
+            'end_effector_link': self.end_effector_link,
+            'target_position': self.target_position,
+            'target_orientation': np.array(p.getQuaternionFromEuler(current_orientation)),
+            'tcp_offset': self.planner.ee_offset
+        }, sender=self)
                 
         self.update_terminal("robot state initialisation successful.")
 
@@ -1061,39 +1164,35 @@ class KinematicsFrame(ctk.CTkFrame):
         """发送关节角度到机器人"""
 
         tool_values = self.tool_command
+        connection = self.connection
 
         if use_traj and self.last_planner_result is not None:
             # Execute trajectory from saved planner result
             trajectory = self.last_planner_result.trajectory
             
-            if not self.protocol_class.is_connected():
+            if not connection.is_connected():
                 self.update_terminal(f"No protocol connection. fake executing trajectory with {len(trajectory)} waypoints and tool: {tool_values}")
                 return
             else:
                 self.update_terminal(f"Executing trajectory with {len(trajectory)} waypoints...")
                 
-                for i, waypoint in enumerate(trajectory):
-                    # Convert from radians to degrees
-                    joint_angles_deg = np.degrees(waypoint)
-                    
-                    # Joint motion execution
-                    self.protocol_class.send("EXEC\n")
-                    joint_command = ",".join(f"{angle:.2f}" for angle in joint_angles_deg) + "\n"
-                    self.protocol_class.send(joint_command)
-
-                    # wait for joint execution completion
-                    _, isReplied = self.protocol_class.receive(timeout=5, expected_signal="CP0")
-                    if not isReplied:
-                        self.update_terminal(f"joint execution timeout at waypoint {i+1}")
-                        return
-                    
-                    self.update_terminal(f"Waypoint {i+1}/{len(trajectory)}: {[f'{angle:.2f}°' for angle in joint_angles_deg]}")
+                # Convert from radians to degrees
+                waypoints_deg = self.simplify_waypoints([np.degrees(waypoint) for waypoint in trajectory])
+
+                def on_progress(i, joint_angles_deg):
+                    self.update_terminal(f"Waypoint {i+1}/{len(waypoints_deg)}: {[f'{angle:.2f}°' for angle in joint_angles_deg]}")
+
+                # upload to controller memory for local playback, or pipeline within the controller queue
+                acked, isReplied = connection.execute_trajectory(waypoints_deg, timeout=5, on_progress=on_progress)
+                if not isReplied:
+                    self.update_terminal(f"joint execution timeout at waypoint {acked+1}")
+                    return
                 
                 # Tool motion execution after trajectory completion
                 tool_command = f"M280,{','.join(str(v) for v in tool_values)}\n"
-                self.protocol_class.send(tool_command)
+                connection.send(tool_command)
 
-                _, isReplied = self.protocol_class.receive(timeout=5, expected_signal="TP0")
+                _, isReplied = connection.receive(timeout=5, expected_signal="TP0")
                 if not isReplied:
                     self.update_terminal("M280 timeout")
                 else:
@@ -1102,19 +1201,19 @@ class KinematicsFrame(ctk.CTkFrame):
             # Execute single motion
             joint_angles = [angle for angle in self.joint_angles]
 
-            if not self.protocol_class.is_connected():
+            if not connection.is_connected():
                 self.update_terminal(f"No protocol connection. fake executing single motion: {[f'{angle:.2f}°' for angle in joint_angles]} and tool: {tool_values}")
                 return
             else:
                 self.update_terminal(f"Executing single motion...")
 
                 # Joint motion execution
-                self.protocol_class.send("EXEC\n")
+                connection.send("EXEC\n")
                 joint_command = ",".join(f"{angle:.2f}" for angle in joint_angles) + "\n"
-                self.protocol_class.send(joint_command)
+                connection.send(joint_command)
 
                 # wait for joint execution completion
-                _, isReplied = self.protocol_class.receive(timeout=5, expected_signal="CP0")
+                _, isReplied = connection.receive(timeout=5, expected_signal="CP0")
                 if not isReplied:
                     self.update_terminal("joint execution timeout")
                 else:
@@ -1122,9 +1221,9 @@ class KinematicsFrame(ctk.CTkFrame):
                 
                 # Tool motion execution
                 tool_command = f"M280,{','.join(str(v) for v in tool_values)}\n"
-                self.protocol_class.send(tool_command)
+                connection.send(tool_command)
 
-                _, isReplied = self.protocol_class.receive(timeout=5, expected_signal="TP0")
+                _, isReplied = connection.receive(timeout=5, expected_signal="TP0")
                 if not isReplied:
                     self.update_terminal("M280 timeout")
                 else:  
@@ -1161,6 +1260,102 @@ class KinematicsFrame(ctk.CTkFrame):
             self.log_text.delete(1.0, tk.END)
             self.log_text.configure(state=tk.DISABLED)
 
+    def fk_batch(self, q):
+        """当前机械臂末端的批量正向运动学
+
+        Args:
+            q: 关节角度数组[N, 关节数](弧度)
+
+        Returns:
+            (positions[N, 3], rotations[N, 3, 3])，与planner.getPoseGlobal的结果不一致时返回None
+        """
+        batch = self._batch_fk()
+        if batch is None:
+            return None
+        fk, base_transform, tool_transform = batch
+        return fk.fk_batch(q, base_transform, tool_transform)
+
+    def _batch_fk(self, blocking=True):
+        """当前机械臂的BatchFK和基座/TCP变换，首次使用时抽样与planner.getPoseGlobal比较
+
+        Args:
+            blocking: 比较需要planner_lock，为False时planner正在使用则不比较，返回None
+        """
+        try:
+            fk = BatchFK.for_profile(ProfileManager.current_profile["urdf_path"], self.end_effector_link)
+            state = self.robot_state.snapshot()
+            base_transform = BatchFK.pose_transform(state['base_position'], BatchFK.quaternion_matrix(state['base_orientation']))
+            tcp_offset = np.asarray(state['tcp_offset'], dtype=np.float64)
+            tool_transform = BatchFK.pose_transform(tcp_offset[:3], BatchFK.rpy_matrix(np.radians(tcp_offset[3:6])))
+        except Exception as e:
+            print(f"Batch FK error: {e}")
+            return None
+
+        key = (fk, base_transform.tobytes(), tool_transform.tobytes())
+        if key not in self.batch_fk_checked:
+            limits = np.radians(np.array(self.joint_limits[:fk.dof], dtype=np.float64).reshape(-1, 2))
+            lower = np.pad(limits[:, 0], (0, fk.dof - len(limits)))
+            upper = np.pad(limits[:, 1], (0, fk.dof - len(limits)))
+            samples = np.random.default_rng(0).uniform(lower, upper, size=(8, fk.dof))
+
+            if not self.planner_lock.acquire(blocking=blocking):
+                return None
+            try:
+                position_error, rotation_error = fk.compare(
+                    lambda joints: self.planner.getPoseGlobal(joints, self.end_effector_link)[:2],
+                    samples, base_transform, tool_transform)
+                self.batch_fk_checked[key] = position_error < 1e-5 and rotation_error < 1e-4
+            except Exception as e:
+                print(f"Batch FK check error: {e}")
+                self.batch_fk_checked[key] = False
+            finally:
+                self.planner_lock.release()
+            if not self.batch_fk_checked[key]:
+                print("Batch FK does not match planner.getPoseGlobal, falling back to per-point FK")
+        return (fk, base_transform, tool_transform) if self.batch_fk_checked[key] else None
+
+    def _pose_global(self, joints, link=None):
+        """界面线程中的正向运动学，不等待后台规划
+
+        planner空闲时调用planner.getPoseGlobal；后台规划占用planner时改用已核对的批量正向运动学，
+        此时没有碰撞信息。批量正向运动学尚未核对时才等待规划完成。
+
+        Returns:
+            (位置, 姿态(RPY弧度), collision_stats)，使用批量正向运动学时collision_stats为None
+        """
+        args = () if link is None else (link,)
+        if self.planner_lock.acquire(blocking=False):
+            try:
+                return self.planner.getPoseGlobal(joints, *args)
+            finally:
+                self.planner_lock.release()
+
+        batch = self._batch_fk(blocking=False)
+        if batch is not None:
+            fk, base_transform, tool_transform = batch
+            positions, rotations = fk.fk_batch(joints, base_transform, tool_transform)
+            return positions[0], BatchFK.matrix_rpy(rotations[0]), None
+
+        with self.planner_lock:
+            return self.planner.getPoseGlobal(joints, *args)
+
+    def simplifier_fk(self):
+        """路径简化使用的正向运动学(度 -> 末端位置米)，优先使用已核对的批量正向运动学，
+        否则逐点调用planner.getPoseGlobal并持有planner_lock"""
+        batch = self._batch_fk()
+        if batch is not None:
+            fk, base_transform, tool_transform = batch
+            return lambda points: fk.fk_batch(np.radians(points), base_transform, tool_transform)[0]
+        return PathSimplifier.planner_fk(self.planner, self.end_effector_link, lock=self.planner_lock)
+
+    def simplify_waypoints(self, waypoints_deg):
+        """按Config中的容差删除近似共线的路径点(度)，末端偏差由正向运动学检查"""
+        if not Config.simplify_paths or len(waypoints_deg) < 3 or self.planner is None:
+            return waypoints_deg
+        result = PathSimplifier(fk=self.simplifier_fk()).simplify(waypoints_deg)
+        self.update_terminal(result.summary())
+        return [waypoints_deg[i] for i in result.indices]
+
     def update_terminal(self, message):
         """更新终端显示"""
         if hasattr(self, 'log_text') and self.log_text.winfo_exists():
@@ -1220,12 +1415,18 @@ class KinematicsFrame(ctk.CTkFrame):
             self.solver_manager = SolverManager(self)
             self.solver_manager.grab_set()  # 模态窗口
 
-    def update_p(self, target_position, target_orientation):
+    def update_p(self, target_position, target_orientation, on_done=None, queued=False):
         """更新关节角度（从笛卡尔空间到关节空间）
+
+        规划在后台线程中执行，本方法立即返回。默认用于交互输入: 尚未开始的旧目标被新目标取代，
+        过期的规划结果被丢弃，最新的结果通过after()回到界面线程应用。queued为True时目标排队，
+        按提交顺序逐个规划和应用，每个目标都从上一个目标的结果开始规划。
         
         Args:
             target_position: 目标位置 [x, y, z]
             target_orientation: 目标姿态(RPY弧度)，未约束的轴为nan
+            on_done: 可选回调on_done(result)，结果应用后在界面线程中调用，交互目标被取代时不调用
+            queued: 是否排队执行，脚本连续发出的移动使用
         """
         try:  
             # 如果当前坐标系不是base，需要先将目标位置和姿态变换到基坐标系
@@ -1243,36 +1444,69 @@ class KinematicsFrame(ctk.CTkFrame):
                 solver_position = target_position
                 solver_orientation = target_orientation if not np.isnan(target_orientation).all() else None
             
-            # 计算IK解（使用基坐标系的位置和姿态）
-            result = self.planner.plan(np.radians(self.joint_angles), 
-                                                 solver_position, 
-                                                 solver_orientation,
-                                                 interpolation_method=Config.interpolation_method)
-            
+            # 计算IK解（使用基坐标系的位置和姿态），复制目标以免调用方在规划期间修改
+            solver_position = np.array(solver_position, dtype=np.float64)
+            if solver_orientation is not None:
+                solver_orientation = np.array(solver_orientation, dtype=np.float64)
+            if queued:
+                # 可能在脚本线程中调用，在界面线程中开始规划
+                self.plan_queue.append((solver_position, solver_orientation, on_done))
+                self.after(0, self._plan_next_queued)
+                return
+            self.plan_worker.submit(
+                self._plan, np.radians(self.joint_angles), solver_position, solver_orientation, Config.interpolation_method,
+                on_result=lambda result: self._apply_plan_result(result, solver_position, on_done),
+                on_error=lambda e: self.update_terminal(f"更新关节角度时出错: {str(e)}"))
+        
+        except Exception as e:
+            self.update_terminal(f"更新关节角度时出错: {str(e)}")
+
+    def _plan_next_queued(self):
+        """在界面线程中规划队列中的下一个目标，上一个目标应用后才开始，起点为当前关节角度"""
+        if self.queue_busy or not self.plan_queue:
+            return
+        solver_position, solver_orientation, on_done = self.plan_queue.popleft()
+        self.queue_busy = True
+
+        def on_result(result):
+            try:
+                self._apply_plan_result(result, solver_position, on_done)
+            finally:
+                self.queue_busy = False
+                self._plan_next_queued()
+
+        def on_error(e):
+            self.update_terminal(f"更新关节角度时出错: {str(e)}")
+            self.queue_busy = False
+            self._plan_next_queued()
+
+        self.queue_worker.submit(
+            self._plan, np.radians(self.joint_angles), solver_position, solver_orientation, Config.interpolation_method,
+            on_result=on_result, on_error=on_error)
+
+    def _plan(self, start_joints, position, orientation, interpolation_method):
+        """在规划线程中执行"""
+        with self.planner_lock:
+            return self.planner.plan(start_joints, position, orientation, interpolation_method=interpolation_method)
+
+    def _apply_plan_result(self, result, solver_position, on_done=None):
+        """在界面线程中应用update_p的规划结果
+
+        Args:
+            result: 规划结果
+            solver_position: 基坐标系中的目标位置
+            on_done: 可选回调on_done(result)
+        """
+        try:
             # Save the result for potential trajectory execution
             self.last_planner_result = result
             
-            j = 0
-            self_collision = result.collision_stats["self_collide"]
-            self_collision_info = result.collision_stats["self_collision_info"]
-            collision = result.collision_stats["collision"]
-            collision_info = result.collision_stats["collision_info"]
-
             self.update_terminal(f">> final error: {result.error:.4f}, planning time: {result.planning_time:.4f}秒")
+            for message in self._collision_summary(result):
+                self.update_terminal(message)
 
-            for i, solution in enumerate(result.trajectory):
-                if self_collision[i]:
-                    for j, collision_point in enumerate(self_collision_info[i]):
-                        self.update_terminal(f"self collide: {collision_point['link_names'][0]} <-> {collision_point['link_names'][1]} {collision_point['distance']:.4f}m")
-                if collision[i]:
-                    for j, collision_point in enumerate(collision_info[i]):
-                        self.update_terminal(f"collide: {collision_point['robot_link_name']} <-> {collision_point['object_name']} {collision_point['distance']:.4f}m")
-
-                time.sleep(0.002)
-                
-                self.robot_state.update_state('joint_angles', np.degrees(solution), sender=self)
-                j += 1
-            
+            # 预览在后续的after()回调中播放，界面状态立即更新为终点
+            self.preview_animator.start(result.trajectory)
             self.joint_angles = np.degrees(result.trajectory[-1])
 
             # 更新关节滑块
@@ -1309,16 +1543,44 @@ class KinematicsFrame(ctk.CTkFrame):
                         entry.insert(0, f"{self.target_orientation[i]:.1f}")
             
             # robot_state始终使用基坐标系的值
-            if self.current_coordinate != "Base":
-                self.robot_state.update_state('target_position', solver_position, sender=self)
-            else:
-                self.robot_state.update_state('target_position', self.target_position, sender=self)
+            target_state = {'target_position': solver_position}
             if result.final_orientation is not None:
-                self.robot_state.update_state('target_orientation', np.array(p.getQuaternionFromEuler(result.final_orientation)), sender=self)
+                target_state['target_orientation'] = np.array(p.getQuaternionFromEuler(result.final_orientation))
+            self.robot_state.update_many(target_state, sender=self)
+
+            if on_done is not None:
+                on_done(result)
         
         except Exception as e:
             self.update_terminal(f"更新关节角度时出错: {str(e)}")
 
+    def _collision_summary(self, result, max_pairs=5):
+        """把规划结果中每个路径点的碰撞汇总为每类一条消息，每对连杆只报告最小距离"""
+        messages = []
+        total = len(result.trajectory)
+        for label, flags_key, info_key, names in (
+                ("self collide", "self_collide", "self_collision_info", lambda point: point['link_names'][:2]),
+                ("collide", "collision", "collision_info", lambda point: (point['robot_link_name'], point['object_name']))):
+            flags = result.collision_stats[flags_key]
+            infos = result.collision_stats[info_key]
+            count = 0
+            distances = {}
+            for i in range(total):
+                if not flags[i]:
+                    continue
+                count += 1
+                for collision_point in infos[i]:
+                    pair = tuple(names(collision_point))
+                    distances[pair] = min(distances.get(pair, np.inf), collision_point['distance'])
+            if count == 0:
+                continue
+            pairs = sorted(distances.items(), key=lambda item: item[1])
+            text = ", ".join(f"{a} <-> {b} {distance:.4f}m" for (a, b), distance in pairs[:max_pairs])
+            if len(pairs) > max_pairs:
+                text += f", +{len(pairs) - max_pairs} more"
+            messages.append(f"{label} at {count}/{total} waypoints: {text}")
+        return messages
+
     def update_q(self, joint_angles, no_state_update=False):
         """更新笛卡尔空间位置和姿态（从关节空间到笛卡尔空间）
         
@@ -1326,9 +1588,13 @@ class KinematicsFrame(ctk.CTkFrame):
             joint_angles: 关节角度列表
         """
         try:
+            if not no_state_update:
+                # 手动设置的关节角度优先于正在播放的预览
+                self.preview_animator.cancel()
+
             # 将角度转换为弧度并计算正向运动学
             current_joints = np.radians(joint_angles)
-            current_position, current_orientation, collision_stats = self.planner.getPoseGlobal(current_joints)
+            current_position, current_orientation, collision_stats = self._pose_global(current_joints)
             
             if current_position is not None and current_orientation is not None:
                 # 如果当前坐标系不是base，需要进行坐标变换
@@ -1358,7 +1624,7 @@ class KinematicsFrame(ctk.CTkFrame):
                     entry.insert(0, f"{display_orientation[i]:.1f}")
 
                 # 处理自碰撞信息（现在是列表字典格式）
-                if collision_stats["self_collide"] and collision_stats["self_collision_info"]:
+                if collision_stats and collision_stats["self_collide"] and collision_stats["self_collision_info"]:
                     for collision_point in collision_stats["self_collision_info"]:
                         link_names = collision_point["link_names"]
                         distance = collision_point["distance"]
@@ -1368,7 +1634,7 @@ class KinematicsFrame(ctk.CTkFrame):
                         )
                 
                 # 处理环境碰撞信息（现在是列表字典格式）
-                if collision_stats["collision"] and collision_stats["collision_info"]:
+                if collision_stats and collision_stats["collision"] and collision_stats["collision_info"]:
                     for collision_point in collision_stats["collision_info"]:
                         robot_link = collision_point["robot_link_name"]
                         object_name = collision_point["object_name"]
@@ -1379,15 +1645,17 @@ class KinematicsFrame(ctk.CTkFrame):
                         )
                 
                 if not no_state_update:
-                    self.robot_state.update_state('joint_angles', joint_angles, sender=self)
                     # 注意：robot_state始终使用基坐标系的值
-                    self.robot_state.update_state('target_position', current_position, sender=self)
-                    self.robot_state.update_state('target_orientation', np.array(p.getQuaternionFromEuler(current_orientation)), sender=self)
+                    self.robot_state.update_many({
+                        'joint_angles': joint_angles,
+                        'target_position': current_position,
+                        'target_orientation': np.array(p.getQuaternionFromEuler(current_orientation))
+                    }, sender=self)
                 
         except Exception as e:
             self.update_terminal(f"更新笛卡尔空间位置时出错: {str(e)}")
 
-    def update(self, state):
+    def update(self, state, changed_keys=None):
         joint_angles = state['joint_angles']
         tcp_offset = state['tcp_offset']
         base_position = state.get('base_position')
@@ -1405,16 +1673,21 @@ class KinematicsFrame(ctk.CTkFrame):
         # 使用新的关节角度更新笛卡尔空间位置和姿态
         self.update_q(self.joint_angles, no_state_update=True)
 
-        self.planner.set_ee_offset(tcp_offset)
-        
-        # 如果基座位置或姿态有更新，设置基座偏移
-        if base_position is not None and base_orientation is not None:
-            self.planner.set_base_offset(base_position, base_orientation)
+        # 只有偏移变化时才重新设置
+        if changed_keys is None or not changed_keys.isdisjoint(('tcp_offset', 'base_position', 'base_orientation')):
+            with self.planner_lock:
+                self.planner.set_ee_offset(tcp_offset)
+                
+                # 如果基座位置或姿态有更新，设置基座偏移
+                if base_position is not None and base_orientation is not None:
+                    self.planner.set_base_offset(base_position, base_orientation)
+            # 偏移变化后重新核对批量正向运动学
+            self._batch_fk(blocking=False)
         
         # 更新Tool0坐标系以反映新的TCP位置和姿态
         # 获取当前关节角度下的实际TCP位置和姿态
         current_joints = np.radians(self.joint_angles)
-        tcp_position, tcp_orientation, _ = self.planner.getPoseGlobal(current_joints, self.end_effector_link)
+        tcp_position, tcp_orientation, _ = self._pose_global(current_joints, self.end_effector_link)
         
         if tcp_position is not None and tcp_orientation is not None:
             tcp_pose = np.concatenate([tcp_position, tcp_orientation])
@@ -1518,4 +1791,5 @@ class KinematicsFrame(ctk.CTkFrame):
     def on_interpolation_method_changed(self):
         """callback when interpolation method change"""
         self.update_terminal(f"Interpolation method updated to: {Config.interpolation_method}")
-        self.planner.set_interpolation_method(Config.interpolation_method)
+        with self.planner_lock:
+            self.planner.set_interpolation_method(Config.interpolation_method)
@@ -0,0 +1,98 @@
+import time
+
+
+class PreviewAnimator:
+    """按固定帧率播放轨迹预览
+
+    由Tk的after()驱动，每帧按经过的时间在轨迹上取样，落后时直接跳到当前时间对应的点，
+    因此预览的开销只取决于帧率和时长，与轨迹点数无关。开始新的预览会取消正在播放的预览。
+    """
+
+    FRAME_RATE = 30             # 每秒帧数
+    SECONDS_PER_POINT = 0.002   # 短轨迹按点数计算时长，与逐点播放时的速度一致
+    MIN_DURATION = 0.1          # 预览时长范围(秒)
+    MAX_DURATION = 1.0
+
+    def __init__(self, widget, on_frame, frame_rate=None):
+        """
+        Args:
+            widget: 提供after()/after_cancel()的Tk控件
+            on_frame: 每帧调用on_frame(point)，point为取样得到的轨迹点
+            frame_rate: 帧率，默认FRAME_RATE
+        """
+        self.widget = widget
+        self.on_frame = on_frame
+        self.frame_rate = frame_rate or self.FRAME_RATE
+        self._trajectory = None
+        self._on_finish = None
+        self._after_id = None
+        self._start = 0.0
+        self._duration = 0.0
+        self._last_index = -1
+        self.frames = 0             # 最近一次预览调用on_frame的次数
+
+    @classmethod
+    def preview_duration(cls, count) -> float:
+        """count个点的轨迹的预览时长(秒)"""
+        return min(max(count * cls.SECONDS_PER_POINT, cls.MIN_DURATION), cls.MAX_DURATION)
+
+    @property
+    def running(self) -> bool:
+        return self._trajectory is not None
+
+    def start(self, trajectory, duration=None, on_finish=None):
+        """开始预览，最后一帧总是轨迹的终点
+
+        Args:
+            trajectory: 轨迹点序列
+            duration: 预览时长(秒)，默认按点数由preview_duration计算
+            on_finish: 可选回调，播放完最后一帧后调用，被取消时不调用
+        """
+        self.cancel()
+        if len(trajectory) == 0:
+            return
+        self._trajectory = trajectory
+        self._on_finish = on_finish
+        self._duration = self.preview_duration(len(trajectory)) if duration is None else duration
+        self._start = time.perf_counter()
+        self._last_index = -1
+        self.frames = 0
+        self._tick()
+
+    def cancel(self):
+        """停止预览，停在当前帧"""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        self._trajectory = None
+        self._on_finish = None
+
+    def _tick(self):
+        self._after_id = None
+        trajectory = self._trajectory
+        if trajectory is None:
+            return
+
+        elapsed = time.perf_counter() - self._start
+        progress = 1.0 if self._duration <= 0 else min(elapsed / self._duration, 1.0)
+        index = int(round(progress * (len(trajectory) - 1)))
+        if index != self._last_index:
+            self._last_index = index
+            self.frames += 1
+            try:
+                self.on_frame(trajectory[index])
+            except Exception as e:
+                print(f"Preview frame error: {e}")
+
+        if progress >= 1.0:
+            on_finish = self._on_finish
+            self._trajectory = None
+            self._on_finish = None
+            if on_finish is not None:
+                on_finish()
+            return
+
+        # 按绝对时间表安排下一帧，回调耗时不会累积成漂移；落后时下一帧直接取样当前时间
+        period = 1.0 / self.frame_rate
+        next_frame = (int(elapsed / period) + 1) * period
+        self._after_id = self.widget.after(max(1, int((next_frame - elapsed) * 1000)), self._tick)
@@ -301,6 +301,7 @@ class TaskBoard:
         self.kinematics_frame = kinematics_frame
         self.task_sequence = []
         self.dialog = None
+        self.connection = None      # 正在执行的任务序列的目标机械臂
         self.create_window()
         
     def create_window(self):
@@ -526,8 +527,8 @@ class TaskBoard:
             self.kinematics_frame.target_position = position
             self.kinematics_frame.target_orientation = orientation
             
-            # 调用update_p方法更新关节角度（传入弧度制姿态）
-            self.kinematics_frame.update_p(position, np.radians(orientation))
+            # 调用update_p方法更新关节角度（传入弧度制姿态），排队规划，连续的任务不会互相取代
+            self.kinematics_frame.update_p(position, np.radians(orientation), queued=True)
             
             # 更新工具角度
             if 'tool' in task_data:
@@ -848,12 +849,13 @@ class TaskBoard:
                         target_orn = np.array(waypoints[-1][1])
                         middle_waypoints = waypoints[1:-1] if len(waypoints) > 2 else None
                         
-                        result = self.kinematics_frame.planner.plan(
-                            init_solution=current_solution,
-                            target_position=target_pos,
-                            target_orientation=target_orn,
-                            waypoints=middle_waypoints
-                        )
+                        with self.kinematics_frame.planner_lock:
+                            result = self.kinematics_frame.planner.plan(
+                                init_solution=current_solution,
+                                target_position=target_pos,
+                                target_orientation=target_orn,
+                                waypoints=middle_waypoints
+                            )
                         
                         if result.success:
                             plan_worker = Worker(work_type="plan", data=result.trajectory)
@@ -865,11 +867,12 @@ class TaskBoard:
                         target_pos = np.array(waypoints[0][0])
                         target_orn = np.radians(waypoints[0][1])
                         
-                        result = self.kinematics_frame.planner.solve(
-                            init_solution=current_solution,
-                            target_position=target_pos,
-                            target_orientation=target_orn
-                        )
+                        with self.kinematics_frame.planner_lock:
+                            result = self.kinematics_frame.planner.solve(
+                                init_solution=current_solution,
+                                target_position=target_pos,
+                                target_orientation=target_orn
+                            )
                         
                         if result.success:
                             plan_worker = Worker(work_type="plan", data=result.trajectory)
@@ -890,6 +893,9 @@ class TaskBoard:
                 self.kinematics_frame.update_terminal("没有可执行的任务")
                 return
 
+            # 整个任务序列发送到开始时选择的机械臂
+            self.connection = self.kinematics_frame.connection
+
             # 获取当前关节角度作为初始解
             init_solution = np.radians(self.kinematics_frame.joint_angles)
             
@@ -933,54 +939,27 @@ class TaskBoard:
             self.kinematics_frame.update_terminal(f"执行轨迹，包含 {len(trajectory)} 个路径点")
             
             # 检查协议连接状态（只检查一次）
-            is_connected = self.kinematics_frame.protocol_class.is_connected()
+            is_connected = self.connection.is_connected()
             
-            # 执行轨迹中的每个路径点
-            for i, waypoint in enumerate(trajectory):
-                # 转换为度数
-                joint_angles_deg = np.degrees(waypoint)
-                
-                if is_connected:
-                    # 准备命令
-                    joint_command = ",".join(f"{angle:.2f}" for angle in joint_angles_deg) + "\n"
-                    
-                    # 重试机制：如果队列满，等待并重试
-                    max_retries = 2  # 最多重试100次
-                    retry_count = 0
-                    command_sent = False
-                    
-                    while retry_count < max_retries:
-                        # 发送关节运动命令
-                        self.kinematics_frame.protocol_class.send("EXEC\n")
-                        self.kinematics_frame.protocol_class.send(joint_command)
-                        
-                        # 等待执行完成
-                        response, isReplied = self.kinematics_frame.protocol_class.receive(timeout=5, expected_signal="CP0")
-                        
-                        if isReplied:
-                            # 命令成功进入队列
-                            command_sent = True
-                            break
-                        elif response and any("QFULL" in str(r) for r in response):
-                            # 队列满，等待后重试
-                            retry_count += 1
-                            time.sleep(0.05)  # 等待50ms让队列有机会处理
-                        else:
-                            # 其他错误
-                            self.kinematics_frame.update_terminal(f"关节执行超时，路径点 {i+1}")
-                            return
-                    
-                    if not command_sent:
-                        self.kinematics_frame.update_terminal(f"队列持续满载，无法执行路径点 {i+1}")
-                        return
-                else:
+            waypoints_deg = self.kinematics_frame.simplify_waypoints([np.degrees(waypoint) for waypoint in trajectory])
+
+            def on_progress(i, joint_angles_deg):
+                # 更新关节滑块显示当前位置
+                self._update_joint_sliders(joint_angles_deg)
+                self.kinematics_frame.update_terminal(f"路径点 {i+1}/{len(waypoints_deg)}: {[f'{angle:.2f}°' for angle in joint_angles_deg]}")
+
+            if is_connected:
+                # 整条轨迹上传到固件本地回放，不支持时流水线发送
+                acked, isReplied = self.connection.execute_trajectory(
+                    waypoints_deg, timeout=5, on_progress=on_progress)
+                if not isReplied:
+                    self.kinematics_frame.update_terminal(f"关节执行超时，路径点 {acked+1}")
+                    return
+            else:
+                for i, joint_angles_deg in enumerate(waypoints_deg):
                     # 模拟执行延时
                     time.sleep(0.1)  # 模拟执行时间
-                
-                # 更新关节滑块显示当前位置（无论是否连接协议都需要更新）
-                self._update_joint_sliders(joint_angles_deg)
-                
-                self.kinematics_frame.update_terminal(f"路径点 {i+1}/{len(trajectory)}: {[f'{angle:.2f}°' for angle in joint_angles_deg]}")
+                    on_progress(i, joint_angles_deg)
                 
         except Exception as e:
             self.kinematics_frame.update_terminal(f"执行轨迹时出错: {str(e)}")
@@ -1001,7 +980,7 @@ class TaskBoard:
             self.set_tool_value(tool_value)
             
             # 检查协议连接状态
-            is_connected = self.kinematics_frame.protocol_class.is_connected()
+            is_connected = self.connection.is_connected()
             
             if not is_connected:
                 self.kinematics_frame.update_terminal("未连接协议，模拟设置工具状态")
@@ -1017,9 +996,9 @@ class TaskBoard:
                 # 信号控制型或统一可移动型：发送单个值
                 tool_command = f"M280,{tool_value}\n"
             
-            self.kinematics_frame.protocol_class.send(tool_command)
+            self.connection.send(tool_command)
 
-            _, isReplied = self.kinematics_frame.protocol_class.receive(timeout=5, expected_signal="TP0")
+            _, isReplied = self.connection.receive(timeout=5, expected_signal="TP0")
             if not isReplied:
                 self.kinematics_frame.update_terminal("工具命令执行超时")
             else:
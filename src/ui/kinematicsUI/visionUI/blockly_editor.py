@@ -14,6 +14,8 @@ from utils.resource_loader import ResourceLoader
 from utils.ctkAdvancedTextBox import CTkAdvancedTextBox
 
 class BlocklyEditor:
+    MOVE_TIMEOUT = 30   # 等待一次移动规划和发送完成的最长时间(秒)
+
     def __init__(self, parent_frame, vision_frame):
         """
         初始化Blockly编辑器
@@ -911,7 +913,18 @@ print("所有循环完成")"""
                 target_position = np.array([x/1000, y/1000, z/1000])
                 self.vision_frame.kinematics_frame.target_position = target_position
                 
+                # 规划并发送完成后再继续执行后面的积木
+                done = threading.Event()
+
+                def on_done(_):
+                    try:
+                        kinematics_frame.send_to_robot()
+                    finally:
+                        done.set()
+
                 # 使用after方法在主线程中更新UI
+                kinematics_frame = self.vision_frame.kinematics_frame
+
                 def update_ui():
                     try:
                         # 更新UI中的位置输入框
@@ -925,17 +938,29 @@ print("所有循环完成")"""
                         mask = ~np.isnan(orientation_rad)
                         orientation_rad[mask] = np.radians(orientation_rad[mask])
                         
-                        # 调用update_p方法
-                        self.vision_frame.kinematics_frame.update_p(
+                        # 排队规划，连续的移动不会互相取代，规划完成后再发送到机器人
+                        kinematics_frame.update_p(
                             target_position, 
-                            orientation_rad
+                            orientation_rad,
+                            on_done=on_done,
+                            queued=True
                         )
-                        self.vision_frame.kinematics_frame.send_to_robot()
                     except Exception as e:
                         self.queue_log(f"UI更新失败: {str(e)}")
+                        done.set()
                 
                 self.parent_frame.after(0, update_ui)
                 
+                # 等待规划和发送完成，可被停止执行打断
+                deadline = time.time() + self.MOVE_TIMEOUT
+                while not done.wait(0.05):
+                    if self.stop_execution:
+                        self.queue_log("移动操作被中断")
+                        return False
+                    if time.time() > deadline:
+                        self.queue_log("移动操作超时")
+                        return False
+                
                 self.queue_log("移动操作完成")
                 return True
             else:
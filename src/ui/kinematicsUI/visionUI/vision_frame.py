@@ -1728,18 +1728,18 @@ class VisionFrame:
                 joint_angles = [angle for angle in self.kinematics_frame.joint_angles]
             
             # 检查协议连接
-            if not self.kinematics_frame.protocol_class.is_connected():
+            if not self.kinematics_frame.connection.is_connected():
                 return False, "机器人未连接"
             
             # 发送执行命令
-            self.kinematics_frame.protocol_class.send("EXEC\n")
+            self.kinematics_frame.connection.send("EXEC\n")
             
             # 发送关节角度命令
             joint_command = ",".join(f"{angle:.2f}" for angle in joint_angles) + "\n"
-            self.kinematics_frame.protocol_class.send(joint_command)
+            self.kinematics_frame.connection.send(joint_command)
             
             # 等待关节运动完成 - 等待 CP0 信号
-            _, isReplied = self.kinematics_frame.protocol_class.receive(timeout=5, expected_signal="CP0")
+            _, isReplied = self.kinematics_frame.connection.receive(timeout=5, expected_signal="CP0")
             if not isReplied:
                 return False, "关节运动执行超时"
             
@@ -938,7 +938,8 @@ class MajordomoDialog(ctk.CTkToplevel):
                 # 使用update_p方法进行逆运动学计算
                 target_position = np.array([x, y, z])
                 target_orientation = np.radians(self.parent.kinematics_frame.target_orientation.copy())
-                self.parent.kinematics_frame.update_p(target_position, target_orientation)
+                # 排队规划，连续的MOVE_TO不会互相取代
+                self.parent.kinematics_frame.update_p(target_position, target_orientation, queued=True)
                 return f"移动到位置 (x={x}, y={y}, z={z})"
                 
             # ROS相关命令
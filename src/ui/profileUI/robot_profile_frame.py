@@ -1,5 +1,6 @@
 import os
 import time
+import threading
 import tkinter as tk
 import customtkinter as ctk
 from tkinter import messagebox, filedialog
@@ -33,7 +34,7 @@ class RobotProfileFrame(ctk.CTkFrame):
         
         # 将自身注册为robot_state的观察者
         if self.robot_state:
-            self.robot_state.add_observer(self)
+            self.robot_state.add_observer(self, keys=('tcp_offset',))
         
         # 初始化专用的物理引擎客户端
         self.physics_engine = PhysicsEngine.get_instance()
@@ -954,14 +955,25 @@ class RobotProfileFrame(ctk.CTkFrame):
         # 根据机器人类型选择协议类
         protocol_class = SerialProtocol if robot_type == "PWM/I2C" else CanProtocol
 
-        if protocol_class.connect(selected_port):
-            if robot_type == "PWM/I2C":
-                time.sleep(0.1)  # 等待设备完全启动
-            self.connect_button.configure(state=ctk.DISABLED)
+        # 等待控制器就绪和协商最多需要数秒，放到后台线程避免阻塞界面，期间禁用连接按钮
+        self.connect_button.configure(state=ctk.DISABLED)
+        threading.Thread(target=self._connect_worker, args=(protocol_class, selected_port, robot_type), daemon=True).start()
+
+    def _connect_worker(self, protocol_class, selected_port, robot_type):
+        """在后台线程中建立连接，结果交回界面线程处理"""
+        connected = protocol_class.connect(selected_port)
+        if connected and robot_type == "PWM/I2C":
+            time.sleep(0.1)  # 等待设备完全启动
+        self.after(0, lambda: self._on_connect_result(connected, selected_port))
+
+    def _on_connect_result(self, connected, selected_port):
+        """在界面线程中更新连接结果"""
+        if connected:
             self.disconnect_button.configure(state=ctk.NORMAL)
             # 更新连接状态
             self.app.controller_frame.update_connection_status()
         else:
+            self.connect_button.configure(state=ctk.NORMAL)
             messagebox.showerror("Connection Error", f"Failed to connect to {selected_port}")
 
     def on_disconnect(self):
@@ -1899,19 +1911,20 @@ class RobotProfileFrame(ctk.CTkFrame):
             self.update_group_buttons()
             self.update_updown_buttons_visibility(None)
 
-    def update(self, state):
+    def update(self, state, changed_keys=None):
         """
         更新机器人状态
         
         Args:
             state: 机器人状态字典
+            changed_keys: 变化的键
         """
         # 如果有末端执行器偏移量更新，则更新界面
         if self.tools:
             for tool in self.tools:
                 if "ee_offset" in tool:
                     # 更新工具的偏移量
-                    tool["ee_offset"] = state["tcp_offset"].tolist()
+                    tool["ee_offset"] = np.asarray(state["tcp_offset"]).tolist()
 
     def update_texts(self):
         self.frame_label.configure(text=Config.current_lang["robot_profile"])
@@ -8,8 +8,9 @@ from utils.tooltip import ToolTip
 from utils.range_slider import RangeSlider
 from noman.profile_manager import ProfileManager
 from noman.activation_core import ActivationManager, HardwareInfo
-from protocol.serial_protocol import SerialProtocol
+from protocol.serial_protocol import SerialProtocol, SerialCommands
 from protocol.can_protocol import CanProtocol
+from protocol.async_protocol import AsyncSerialProtocol, submit
 
 # Settings Frame
 class SettingsFrame(ctk.CTkFrame):
@@ -393,6 +394,15 @@ class SettingsFrame(ctk.CTkFrame):
                                       font=("Arial", 10))
         baud_unit_label.pack(side="left", padx=(10, 0))
 
+        self.serial_negotiate_var = ctk.BooleanVar(value=Config.serial_negotiate_baud)
+        self.serial_negotiate_switch = ctk.CTkSwitch(
+            serial_frame,
+            text=Config.current_lang["baud_negotiation"],
+            variable=self.serial_negotiate_var,
+            command=self.on_serial_negotiate_change
+        )
+        self.serial_negotiate_switch.pack(side="left", padx=(20, 0))
+
         # CAN Protocol 比特率设置
         can_frame = ctk.CTkFrame(self.protocol_content_frame, fg_color="transparent")
         can_frame.pack(fill="x", padx=0, pady=8)
@@ -419,7 +429,9 @@ class SettingsFrame(ctk.CTkFrame):
             'serial_baud_menu': self.serial_baud_menu,
             'can_bitrate_menu': self.can_bitrate_menu,
             'serial_baud_var': self.serial_baud_var,
-            'can_bitrate_var': self.can_bitrate_var
+            'can_bitrate_var': self.can_bitrate_var,
+            'serial_negotiate_switch': self.serial_negotiate_switch,
+            'serial_negotiate_var': self.serial_negotiate_var
         }
 
     def setup_advanced_tab(self):
@@ -479,6 +491,15 @@ class SettingsFrame(ctk.CTkFrame):
             width=150
         )
         self.trajectory_method_menu.pack(side="left", padx=(0, 10))
+
+        self.simplify_paths_var = ctk.BooleanVar(value=Config.simplify_paths)
+        self.simplify_paths_switch = ctk.CTkSwitch(
+            trajectory_method_frame,
+            text=Config.current_lang["path_simplification"],
+            variable=self.simplify_paths_var,
+            command=self.on_simplify_paths_change
+        )
+        self.simplify_paths_switch.pack(side="left", padx=(20, 0))
         
         # 存储轨迹方法控件引用
         self.trajectory_controls['trajectory_method'] = {
@@ -1039,6 +1060,16 @@ class SettingsFrame(ctk.CTkFrame):
         """获取当前关节的脉冲值"""
         command = f"GPULSE,J{joint_id + 1}\n"
         try:
+            if self.protocol_class is SerialProtocol:
+                # 在共享事件循环中等待PULSE应答，不阻塞界面线程
+                prefix = f"PULSE,J{joint_id + 1},"
+                future = submit(AsyncSerialProtocol.execute_command(
+                    SerialCommands.GPULSE, f"J{joint_id + 1}",
+                    expected_signal=lambda line: line.startswith(prefix), timeout=1))
+                future.add_done_callback(lambda f: self.after(0, self.on_pulse_response, joint_id, f))
+                self.log_message(f"Requesting current pulse for Joint {joint_id + 1}")
+                return
+
             # 发送获取脉冲命令
             self.protocol_class.send(command)
             self.log_message(f"Requesting current pulse for Joint {joint_id + 1}")
@@ -1048,6 +1079,16 @@ class SettingsFrame(ctk.CTkFrame):
         except Exception as e:
             self.log_message(f"Error requesting pulse for Joint {joint_id + 1}: {e}", "error")
 
+    def on_pulse_response(self, joint_id, future):
+        """异步GPULSE请求完成后在界面线程中处理应答"""
+        try:
+            line = future.result()
+        except Exception as e:
+            self.log_message(f"Error reading pulse response: {e}", "error")
+            return
+        if not self.apply_pulse_response(joint_id, line):
+            self.log_message(f"No pulse response received for Joint {joint_id + 1}", "warning")
+
     def check_pulse_response(self, joint_id):
         """检查脉冲响应"""
         try:
@@ -1055,35 +1096,8 @@ class SettingsFrame(ctk.CTkFrame):
             received_lines, success = self.protocol_class.receive(timeout=1)
             
             for line in received_lines:
-                if line.startswith("PULSE,J"):
-                    # 解析响应: PULSE,J1,1500
-                    parts = line.split(',')
-                    if len(parts) == 3:
-                        joint_str = parts[1]
-                        pulse_value = int(parts[2])
-                        
-                        if joint_str == f"J{joint_id + 1}":
-                            # 更新RangeSlider的home位置
-                            self.current_pulses[joint_id] = pulse_value
-                            
-                            # 获取当前的上下限值
-                            current_values = self.range_sliders[joint_id].get_values()
-                            
-                            # 临时禁用回调，避免触发不必要的命令
-                            old_callback = self.range_sliders[joint_id].callback
-                            self.range_sliders[joint_id].callback = None
-                            
-                            self.range_sliders[joint_id].set_values(
-                                current_values["lower"], 
-                                current_values["upper"], 
-                                pulse_value
-                            )
-                            
-                            # 恢复回调
-                            self.range_sliders[joint_id].callback = old_callback
-                            
-                            self.log_message(f"Joint {joint_id + 1} current pulse: {pulse_value}", "success")
-                            return
+                if self.apply_pulse_response(joint_id, line):
+                    return
             
             # 如果没有找到对应的响应，显示警告
             if not any(line.startswith("PULSE,J") for line in received_lines):
@@ -1092,6 +1106,37 @@ class SettingsFrame(ctk.CTkFrame):
         except Exception as e:
             self.log_message(f"Error reading pulse response: {e}", "error")
 
+    def apply_pulse_response(self, joint_id, line) -> bool:
+        """解析PULSE应答(PULSE,J1,1500)并更新RangeSlider的home位置，返回是否为该关节的应答"""
+        if not line.startswith("PULSE,J"):
+            return False
+        parts = line.split(',')
+        if len(parts) != 3 or parts[1] != f"J{joint_id + 1}":
+            return False
+        pulse_value = int(parts[2])
+        
+        # 更新RangeSlider的home位置
+        self.current_pulses[joint_id] = pulse_value
+        
+        # 获取当前的上下限值
+        current_values = self.range_sliders[joint_id].get_values()
+        
+        # 临时禁用回调，避免触发不必要的命令
+        old_callback = self.range_sliders[joint_id].callback
+        self.range_sliders[joint_id].callback = None
+        
+        self.range_sliders[joint_id].set_values(
+            current_values["lower"], 
+            current_values["upper"], 
+            pulse_value
+        )
+        
+        # 恢复回调
+        self.range_sliders[joint_id].callback = old_callback
+        
+        self.log_message(f"Joint {joint_id + 1} current pulse: {pulse_value}", "success")
+        return True
+
     def send_calibration_offset(self, joint, min_offset, max_offset):
         """send calibration offset (both min and max)"""
         command = f"CALIBRATE,{joint},{min_offset},{max_offset}\n"
@@ -1292,6 +1337,19 @@ class SettingsFrame(ctk.CTkFrame):
         SerialProtocol.SERIAL_BAUDRATE = new_baud
         self.log_message(f"Serial baud rate set to: {new_baud} bps")
 
+    def on_serial_negotiate_change(self):
+        """Handle serial baud rate negotiation switch"""
+        enabled = self.serial_negotiate_var.get()
+        Config.serial_negotiate_baud = enabled
+        SerialProtocol.baud_negotiation = enabled
+        self.log_message(f"Serial baud rate negotiation {'enabled' if enabled else 'disabled'}")
+
+    def on_simplify_paths_change(self):
+        """Handle path simplification switch"""
+        enabled = self.simplify_paths_var.get()
+        Config.simplify_paths = enabled
+        self.log_message(f"Path simplification {'enabled' if enabled else 'disabled'}")
+
     def on_can_bitrate_change(self, choice):
         """Handle CAN bitrate change"""
         new_bitrate = int(choice)
@@ -1422,14 +1480,19 @@ class SettingsFrame(ctk.CTkFrame):
         # 更新协议类的值
         SerialProtocol.SERIAL_BAUDRATE = default_serial_baud
         CanProtocol.bitrate = default_can_bitrate
+        SerialProtocol.baud_negotiation = True
         
         # 更新UI控件
         self.serial_baud_var.set(str(default_serial_baud))
         self.can_bitrate_var.set(str(default_can_bitrate))
+        self.serial_negotiate_var.set(True)
         
         # 更新Config值
         Config.serial_baudrate = default_serial_baud
         Config.can_bitrate = default_can_bitrate
+        Config.serial_negotiate_baud = True
+        # 清除记住的协商结果，下次连接重新协商
+        Config.serial_port_baudrates.clear()
         
         self.log_message("Protocol settings reset to default", "success") 
 
@@ -1452,6 +1515,11 @@ class SettingsFrame(ctk.CTkFrame):
         if 'trajectory_method' in self.trajectory_controls:
             self.trajectory_method_var.set(default_trajectory_method)
             Config.trajectory_method = default_trajectory_method
+
+        # 关闭路径简化
+        if hasattr(self, 'simplify_paths_var'):
+            self.simplify_paths_var.set(False)
+        Config.simplify_paths = False
         
         # 重置关节参数
         self.reset_joint_params()
@@ -1734,6 +1802,12 @@ class SettingsFrame(ctk.CTkFrame):
             except (IndexError, AttributeError):
                 pass
 
+        if hasattr(self, 'serial_negotiate_switch'):
+            self.serial_negotiate_switch.configure(text=Config.current_lang["baud_negotiation"])
+
+        if hasattr(self, 'simplify_paths_switch'):
+            self.simplify_paths_switch.configure(text=Config.current_lang["path_simplification"])
+
         # 更新关节标签
         if hasattr(self, 'calibration_content_frame'):
             num_calibratable = len(ProfileManager.get_main_joints())
@@ -39,7 +39,8 @@ class SimulatorFrame(ctk.CTkFrame):
         self.is_simulating = False
 
         self.robot_state = robot_state
-        self.robot_state.add_observer(self)
+        self.robot_state.add_observer(self, keys=('joint_angles', 'target_position', 'target_orientation',
+                                                  'end_effector_link', 'tool_state', 'tcp_offset'))
 
         self.marker_ids = []
         
@@ -47,6 +48,7 @@ class SimulatorFrame(ctk.CTkFrame):
         self.robot_state_queue = None
         self.offline_params_queue = None
         self.shutdown_event = None
+        self.sent_state_version = None  # 最近发送到队列的robot_state版本
         self.gui_process = None
 
         self.grid(row=0, column=0, sticky="nsew")
@@ -262,8 +264,8 @@ class SimulatorFrame(ctk.CTkFrame):
             # 更新self变量和robot_state
             self.base_position = np.array([x, y, z])
             self.base_orientation = np.array(orientation)
-            self.robot_state.update_state("base_position", self.base_position, sender=self)
-            self.robot_state.update_state("base_orientation", self.base_orientation, sender=self)
+            self.robot_state.update_many({"base_position": self.base_position,
+                                          "base_orientation": self.base_orientation}, sender=self)
 
             self.log_message(f"基座位姿已设置 - 位置: ({x}, {y}, {z}), 姿态: ({np.degrees(rpy[0]):.2f}, {np.degrees(rpy[1]):.2f}, {np.degrees(rpy[2]):.2f})")
         except ValueError:
@@ -584,8 +586,8 @@ class SimulatorFrame(ctk.CTkFrame):
             base_pos_meters = np.array(base_pos) / 1000.0
             self.base_position = base_pos_meters
             self.base_orientation = np.array(base_orn)
-            self.robot_state.update_state("base_position", self.base_position, sender=self)
-            self.robot_state.update_state("base_orientation", self.base_orientation, sender=self)
+            self.robot_state.update_many({"base_position": self.base_position,
+                                          "base_orientation": self.base_orientation}, sender=self)
 
             # 更新末端执行器偏移输入框
             self.ee_x_pos.delete(0, 'end')
@@ -1460,7 +1462,7 @@ class SimulatorFrame(ctk.CTkFrame):
             self.send_offline_params()
             
             # 发送初始的机器人状态
-            self.send_robot_state()
+            self.send_robot_state(force=True)
             
             # 启动更新线程来定期发送状态更新
             self.update_thread = threading.Thread(target=self.update_robot_state_multiprocess)
@@ -1483,9 +1485,18 @@ class SimulatorFrame(ctk.CTkFrame):
             self.log_message(f"启动PyBullet仿真失败: {str(e)}")
             self.log_message(traceback.format_exc())
 
-    def send_robot_state(self):
-        """发送机器人状态到队列"""
+    def send_robot_state(self, force=False):
+        """发送机器人状态到队列，状态版本没有变化时跳过
+
+        Args:
+            force: 即使状态没有变化也发送
+        """
         try:
+            # 读取同一版本的快照，避免关节角度和目标位姿来自不同的更新
+            snapshot = self.robot_state.snapshot()
+            if not force and snapshot.version == self.sent_state_version:
+                return
+
             # 辅助函数，处理不同类型的数据结构
             def safe_convert_to_list(value):
                 if value is None:
@@ -1499,10 +1510,10 @@ class SimulatorFrame(ctk.CTkFrame):
             
             # 创建状态数据
             robot_state = {
-                'joint_angles': safe_convert_to_list(self.joint_angles),
-                'tool_state': safe_convert_to_list(self.tool_state),
-                'target_position': safe_convert_to_list(self.target_position) or [0, 0, 0],
-                'target_orientation': safe_convert_to_list(self.target_orientation) or [0, 0, 0, 1]
+                'joint_angles': safe_convert_to_list(snapshot['joint_angles']),
+                'tool_state': safe_convert_to_list(snapshot['tool_state']),
+                'target_position': safe_convert_to_list(snapshot['target_position']) or [0, 0, 0],
+                'target_orientation': safe_convert_to_list(snapshot['target_orientation']) or [0, 0, 0, 1]
             }
             
             # 发送到队列（非阻塞）
@@ -1516,6 +1527,7 @@ class SimulatorFrame(ctk.CTkFrame):
                             break
                     
                     self.robot_state_queue.put_nowait(robot_state)
+                    self.sent_state_version = snapshot.version
                 except queue.Full:
                     pass  # 如果队列满了，丢弃这次更新
             
@@ -1714,7 +1726,7 @@ class SimulatorFrame(ctk.CTkFrame):
             self.log_message(traceback.format_exc())
 
 
-    def update(self, state):
+    def update(self, state, changed_keys=None):
         self.joint_angles = state["joint_angles"]
         self.target_position = state["target_position"]
         self.target_orientation = state["target_orientation"]
@@ -0,0 +1,190 @@
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+
+class BatchFK:
+    """按URDF运动链批量计算正向运动学
+
+    解析一次URDF，把固定关节和各关节的origin合并为常量变换，计算时对N组关节角度同时做
+    广播矩阵乘法，不逐点调用planner.getPoseGlobal。link与pybullet的连杆序号一致(URDF中的
+    关节顺序)，关节角度的列对应URDF中可动关节的顺序。
+    """
+
+    MOVABLE_TYPES = ('revolute', 'continuous', 'prismatic')
+
+    _cache = {}     # {(URDF路径, 修改时间, link): BatchFK}
+
+    def __init__(self, urdf_path, link=None):
+        """
+        Args:
+            urdf_path: URDF文件路径
+            link: 末端连杆序号(pybullet连杆序号)，默认最后一个可动关节的子连杆
+        """
+        self.urdf_path = urdf_path
+        joints = self._parse_joints(urdf_path)
+        movable = [joint for joint in joints if joint['type'] in self.MOVABLE_TYPES]
+        if not movable:
+            raise ValueError(f"No movable joints in {urdf_path}")
+        columns = {joint['name']: i for i, joint in enumerate(movable)}
+
+        tip = movable[-1]['child'] if link is None else joints[link]['child']
+        by_child = {joint['child']: joint for joint in joints}
+        chain = []
+        while tip in by_child:
+            chain.append(by_child[tip])
+            tip = by_child[tip]['parent']
+        chain.reverse()
+
+        # 相邻可动关节之间的常量变换合并为一个，每个可动关节一段
+        self._segments = []     # [(常量变换4x4, 关节类型, 轴, 列)]
+        transform = np.eye(4)
+        for joint in chain:
+            transform = transform @ self.pose_transform(joint['xyz'], self.rpy_matrix(joint['rpy']))
+            if joint['type'] in self.MOVABLE_TYPES:
+                self._segments.append((transform, joint['type'], joint['axis'], columns[joint['name']]))
+                transform = np.eye(4)
+        self._tail = transform
+
+        self.link = link
+        self.joint_names = [joint['name'] for joint in chain if joint['type'] in self.MOVABLE_TYPES]
+        self.dof = max((segment[3] for segment in self._segments), default=-1) + 1  # q至少需要的列数
+
+    @classmethod
+    def for_profile(cls, urdf_path, link=None):
+        """获取URDF对应的实例，文件没有变化时复用已解析的运动链"""
+        path = os.path.abspath(urdf_path)
+        key = (path, os.path.getmtime(path), link)
+        instance = cls._cache.get(key)
+        if instance is None:
+            instance = cls._cache[key] = cls(path, link)
+        return instance
+
+    def fk_batch(self, q, base_transform=None, tool_transform=None):
+        """批量正向运动学
+
+        Args:
+            q: 关节角度数组[N, dof](弧度，移动关节为米)，单组关节角度也可以
+            base_transform: 可选，基座在世界坐标系中的4x4变换
+            tool_transform: 可选，末端连杆到TCP的4x4变换
+
+        Returns:
+            (positions[N, 3], rotations[N, 3, 3])
+        """
+        q = np.atleast_2d(np.asarray(q, dtype=np.float64))
+        n = len(q)
+        base = np.eye(4) if base_transform is None else np.asarray(base_transform, dtype=np.float64)
+        rotations = np.broadcast_to(base[:3, :3], (n, 3, 3)).copy()
+        positions = np.broadcast_to(base[:3, 3], (n, 3)).copy()
+
+        for transform, joint_type, axis, column in self._segments:
+            positions += self._rotate(rotations, transform[:3, 3])
+            rotations = self._rmul(rotations, transform[:3, :3])
+            angle = q[:, column]
+            if joint_type == 'prismatic':
+                positions += self._rotate(rotations, axis) * angle[:, None]
+            else:
+                # Rodrigues: R @ (I + sinθ·K + (1-cosθ)·K²)
+                k = np.array([[0.0, -axis[2], axis[1]],
+                              [axis[2], 0.0, -axis[0]],
+                              [-axis[1], axis[0], 0.0]])
+                rotations = (rotations
+                             + np.sin(angle)[:, None, None] * self._rmul(rotations, k)
+                             + (1.0 - np.cos(angle))[:, None, None] * self._rmul(rotations, k @ k))
+
+        tail = self._tail if tool_transform is None else self._tail @ np.asarray(tool_transform, dtype=np.float64)
+        positions += self._rotate(rotations, tail[:3, 3])
+        rotations = self._rmul(rotations, tail[:3, :3])
+        return positions, rotations
+
+    def compare(self, reference, q, base_transform=None, tool_transform=None):
+        """与逐点的参考正向运动学比较
+
+        Args:
+            reference: reference(关节角度) -> (位置, 姿态)，姿态为欧拉角(roll, pitch, yaw)或四元数(x, y, z, w)，
+                       例如lambda joints: planner.getPoseGlobal(joints, link)[:2]
+            q: 关节角度数组[N, dof](弧度)
+
+        Returns:
+            (最大位置偏差(米), 最大旋转矩阵元素偏差)
+        """
+        q = np.atleast_2d(np.asarray(q, dtype=np.float64))
+        positions, rotations = self.fk_batch(q, base_transform, tool_transform)
+        max_position, max_rotation = 0.0, 0.0
+        for i, joints in enumerate(q):
+            position, orientation = reference(joints)
+            orientation = np.asarray(orientation, dtype=np.float64)
+            rotation = self.quaternion_matrix(orientation) if len(orientation) == 4 else self.rpy_matrix(orientation)
+            max_position = max(max_position, float(np.max(np.abs(positions[i] - np.asarray(position)))))
+            max_rotation = max(max_rotation, float(np.max(np.abs(rotations[i] - rotation))))
+        return max_position, max_rotation
+
+    @staticmethod
+    def rpy_matrix(rpy):
+        """URDF/pybullet的roll-pitch-yaw欧拉角转旋转矩阵 Rz(yaw)·Ry(pitch)·Rx(roll)"""
+        roll, pitch, yaw = rpy
+        cr, sr = np.cos(roll), np.sin(roll)
+        cp, sp = np.cos(pitch), np.sin(pitch)
+        cy, sy = np.cos(yaw), np.sin(yaw)
+        return np.array([
+            [cy * cp, cy * sp * sr - sy * cr, cy * sp * cr + sy * sr],
+            [sy * cp, sy * sp * sr + cy * cr, sy * sp * cr - cy * sr],
+            [-sp, cp * sr, cp * cr]
+        ])
+
+    @staticmethod
+    def matrix_rpy(rotation):
+        """旋转矩阵转roll-pitch-yaw欧拉角，rpy_matrix的逆运算"""
+        pitch = np.arcsin(np.clip(-rotation[2, 0], -1.0, 1.0))
+        roll = np.arctan2(rotation[2, 1], rotation[2, 2])
+        yaw = np.arctan2(rotation[1, 0], rotation[0, 0])
+        return np.array([roll, pitch, yaw])
+
+    @staticmethod
+    def quaternion_matrix(quaternion):
+        """四元数(x, y, z, w)转旋转矩阵"""
+        x, y, z, w = np.asarray(quaternion, dtype=np.float64) / np.linalg.norm(quaternion)
+        return np.array([
+            [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+            [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+            [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]
+        ])
+
+    @staticmethod
+    def pose_transform(position, rotation):
+        """位置和旋转矩阵组成4x4变换"""
+        transform = np.eye(4)
+        transform[:3, :3] = rotation
+        transform[:3, 3] = position
+        return transform
+
+    @staticmethod
+    def _rmul(rotations, matrix):
+        """rotations[N, 3, 3]逐个右乘3x3矩阵，合并为一次矩阵乘法"""
+        return (rotations.reshape(-1, 3) @ matrix).reshape(rotations.shape)
+
+    @staticmethod
+    def _rotate(rotations, vector):
+        """rotations[N, 3, 3]逐个乘以向量，返回[N, 3]"""
+        return (rotations.reshape(-1, 3) @ vector).reshape(-1, 3)
+
+    @staticmethod
+    def _parse_joints(urdf_path):
+        """按文件顺序读取URDF中的关节"""
+        root = ET.parse(urdf_path).getroot()
+        joints = []
+        for element in root.findall('joint'):
+            origin = element.find('origin')
+            axis = element.find('axis')
+            axis_vector = np.array([float(v) for v in axis.get('xyz', '1 0 0').split()]) if axis is not None else np.array([1.0, 0.0, 0.0])
+            joints.append({
+                'name': element.get('name'),
+                'type': element.get('type'),
+                'parent': element.find('parent').get('link'),
+                'child': element.find('child').get('link'),
+                'xyz': np.array([float(v) for v in origin.get('xyz', '0 0 0').split()]) if origin is not None else np.zeros(3),
+                'rpy': np.array([float(v) for v in origin.get('rpy', '0 0 0').split()]) if origin is not None else np.zeros(3),
+                'axis': axis_vector / np.linalg.norm(axis_vector)
+            })
+        return joints
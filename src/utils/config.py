@@ -62,12 +62,21 @@ class Config:
     joint_accelerations = []  # 每个关节的加速度百分比
     joint_jerks = []  # 每个关节的急动度百分比
 
+    ''' Trajectory Simplification Config '''
+    simplify_paths = False  # 执行前删除近似共线的路径点(设置中开启)
+    simplify_joint_tolerance = 0.5  # 关节角度容差(度)
+    simplify_cartesian_tolerance = 0.001  # 末端位置容差(米)
+
     ''' Interpolation Config '''
     interpolation_method = "linear"  # 默认使用线性插值
 
     ''' Protocol Config '''
     serial_baudrate = 115200
     can_bitrate = 500000
+    serial_capture = False      # 把串口收发数据记录到traces目录，用于离线复现现场问题
+    serial_negotiate_baud = True    # 连接后与固件协商更高的波特率
+    serial_port_baudrates = {}      # {串口: 上次协商得到的波特率}，下次连接时优先提出
+    trajectory_upload = True        # 轨迹上传到控制器内存后本地回放，固件不支持时流式发送
 
     @classmethod
     def initialize_path(cls):
@@ -176,12 +185,12 @@ class Config:
                     if hasattr(cls, param_name):
                         setattr(cls, param_name, value)
                         
-                # 同步协议类配置
-                cls._sync_protocol_classes()
-                        
             except Exception as e:
                 print(f"Error loading global config: {e}")
 
+        # 同步协议类配置(没有保存的配置时使用默认值)
+        cls._sync_protocol_classes()
+
     @classmethod
     def _sync_protocol_classes(cls):
         """同步协议类的配置值"""
@@ -192,10 +201,25 @@ class Config:
             
             SerialProtocol.SERIAL_BAUDRATE = cls.serial_baudrate
             CanProtocol.bitrate = cls.can_bitrate
+            SerialProtocol.capture_dir = os.path.join(cls.get_path(), 'traces') if cls.serial_capture else None
+            SerialProtocol.baud_negotiation = cls.serial_negotiate_baud
+            SerialProtocol.port_baudrates = cls.serial_port_baudrates
+            SerialProtocol.on_baudrate_negotiated = cls.remember_serial_baudrate
+            SerialProtocol.trajectory_upload = cls.trajectory_upload
         except ImportError:
             # 如果协议类尚未加载，忽略错误
             pass
 
+    @classmethod
+    def remember_serial_baudrate(cls, port, baudrate):
+        """记录串口协商得到的更高波特率，有变化时保存配置"""
+        if baudrate <= cls.serial_baudrate:
+            # 没有协商到更高速率(例如固件还在启动)，下次连接仍然协商
+            return
+        if cls.serial_port_baudrates.get(port) != baudrate:
+            cls.serial_port_baudrates[port] = baudrate
+            cls.save_global_config()
+
     @classmethod
     def save_global_config(cls):
         """保存全局配置到文件"""
@@ -225,14 +249,21 @@ class Config:
                 'trajectory_method': cls.trajectory_method,
                 'joint_speeds': cls.joint_speeds,
                 'joint_accelerations': cls.joint_accelerations,
-                'joint_jerks': cls.joint_jerks
+                'joint_jerks': cls.joint_jerks,
+                'simplify_paths': cls.simplify_paths,
+                'simplify_joint_tolerance': cls.simplify_joint_tolerance,
+                'simplify_cartesian_tolerance': cls.simplify_cartesian_tolerance
             },
             'interpolation': {
                 'interpolation_method': cls.interpolation_method
             },
             'protocol': {
                 'serial_baudrate': cls.serial_baudrate,
-                'can_bitrate': cls.can_bitrate
+                'can_bitrate': cls.can_bitrate,
+                'serial_capture': cls.serial_capture,
+                'serial_negotiate_baud': cls.serial_negotiate_baud,
+                'serial_port_baudrates': cls.serial_port_baudrates,
+                'trajectory_upload': cls.trajectory_upload
             }
         }
         
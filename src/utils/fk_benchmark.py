@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量正向运动学性能测试
+比较BatchFK.fk_batch与逐点计算的结果和吞吐量。安装了noman时同时与planner.getPoseGlobal比较
+(需要URDF为当前机械臂配置的URDF)
+
+用法(在src目录下): python -m utils.fk_benchmark [URDF路径]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from utils.batch_fk import BatchFK
+
+NUM_POINTS = 100000
+NUM_REFERENCE = 2000    # 逐点计算的点数，吞吐量按此估算
+
+# 没有指定URDF时使用的示例4自由度机械臂
+SAMPLE_URDF = """<?xml version="1.0"?>
+<robot name="sample_arm">
+  <link name="base_link"/>
+  <link name="link1"/>
+  <link name="link2"/>
+  <link name="link3"/>
+  <link name="link4"/>
+  <link name="tool0"/>
+  <joint name="joint1" type="revolute">
+    <parent link="base_link"/><child link="link1"/>
+    <origin xyz="0 0 0.065" rpy="0 0 0"/><axis xyz="0 0 1"/>
+    <limit lower="-3.14" upper="3.14" effort="1" velocity="1"/>
+  </joint>
+  <joint name="joint2" type="revolute">
+    <parent link="link1"/><child link="link2"/>
+    <origin xyz="0 0 0.035" rpy="1.5708 0 0"/><axis xyz="0 0 1"/>
+    <limit lower="-1.57" upper="1.57" effort="1" velocity="1"/>
+  </joint>
+  <joint name="joint3" type="revolute">
+    <parent link="link2"/><child link="link3"/>
+    <origin xyz="0 0.12 0" rpy="0 0 0"/><axis xyz="0 0 1"/>
+    <limit lower="-2.6" upper="2.6" effort="1" velocity="1"/>
+  </joint>
+  <joint name="joint4" type="revolute">
+    <parent link="link3"/><child link="link4"/>
+    <origin xyz="0.12 0 0" rpy="0 0 0.3"/><axis xyz="0 0.6 0.8"/>
+    <limit lower="-1.57" upper="1.57" effort="1" velocity="1"/>
+  </joint>
+  <joint name="tool_joint" type="fixed">
+    <parent link="link4"/><child link="tool0"/>
+    <origin xyz="0.05 0 0.01" rpy="0 1.5708 0"/>
+  </joint>
+</robot>
+"""
+
+
+def reference_fk(chain, joints):
+    """按文件顺序逐个关节用4x4齐次变换计算到最后一个关节，作为参考结果(只适用于串联机械臂)"""
+    transform = np.eye(4)
+    column = 0
+    for joint in chain:
+        transform = transform @ BatchFK.pose_transform(joint['xyz'], BatchFK.rpy_matrix(joint['rpy']))
+        if joint['type'] in BatchFK.MOVABLE_TYPES:
+            angle = joints[column]
+            column += 1
+            axis = joint['axis']
+            if joint['type'] == 'prismatic':
+                transform = transform @ BatchFK.pose_transform(axis * angle, np.eye(3))
+            else:
+                k = np.array([[0.0, -axis[2], axis[1]], [axis[2], 0.0, -axis[0]], [-axis[1], axis[0], 0.0]])
+                transform = transform @ BatchFK.pose_transform(np.zeros(3), np.eye(3) + np.sin(angle) * k + (1 - np.cos(angle)) * k @ k)
+    return transform[:3, 3], transform[:3, :3]
+
+
+def planner_reference(fk):
+    """noman规划器的getPoseGlobal，不可用时返回None"""
+    try:
+        from noman.motion_planner.planner import Planner
+    except ImportError:
+        return None
+    planner = Planner(init_planner="Direct", init_solver="LevenbergMarquardt")
+    return lambda joints: planner.getPoseGlobal(joints, fk.link)[:2] if fk.link is not None else planner.getPoseGlobal(joints)[:2]
+
+
+def main():
+    """主函数 - 验证并测量fk_batch吞吐量"""
+    if len(sys.argv) > 1:
+        urdf_path = sys.argv[1]
+    else:
+        handle, urdf_path = tempfile.mkstemp(suffix=".urdf")
+        with os.fdopen(handle, 'w') as f:
+            f.write(SAMPLE_URDF)
+
+    # 末端为URDF中最后一个关节的子连杆，与参考计算一致
+    chain = BatchFK._parse_joints(urdf_path)
+    fk = BatchFK.for_profile(urdf_path, len(chain) - 1)
+    if len(sys.argv) <= 1:
+        os.remove(urdf_path)
+    rng = np.random.default_rng(0)
+    q = rng.uniform(-np.pi, np.pi, size=(NUM_POINTS, fk.dof))
+    print(f"URDF: {urdf_path}, chain: {' -> '.join(fk.joint_names)}")
+
+    # 正确性: 与逐点的齐次变换比较
+    positions, rotations = fk.fk_batch(q[:NUM_REFERENCE])
+    start = time.perf_counter()
+    reference = [reference_fk(chain, joints) for joints in q[:NUM_REFERENCE]]
+    reference_time = time.perf_counter() - start
+    position_error = max(np.max(np.abs(positions[i] - p)) for i, (p, _) in enumerate(reference))
+    rotation_error = max(np.max(np.abs(rotations[i] - r)) for i, (_, r) in enumerate(reference))
+    print(f"vs per-point 4x4: max position error {position_error:.2e} m, max rotation error {rotation_error:.2e}")
+
+    # 规划器使用当前机械臂配置，只在指定了URDF时比较
+    planner_fk = planner_reference(fk) if len(sys.argv) > 1 else None
+    if planner_fk is not None:
+        position_error, rotation_error = fk.compare(planner_fk, q[:200])
+        print(f"vs planner.getPoseGlobal: max position error {position_error:.2e} m, max rotation error {rotation_error:.2e}")
+    else:
+        print("vs planner.getPoseGlobal: skipped (no URDF given or noman not installed)")
+
+    # 吞吐量
+    fk.fk_batch(q[:1000])
+    start = time.perf_counter()
+    fk.fk_batch(q)
+    batch_time = time.perf_counter() - start
+    print(f"{'method':<20}{'points':>10}{'time (s)':>12}{'points/s':>14}")
+    print(f"{'fk_batch':<20}{NUM_POINTS:>10}{batch_time:>12.4f}{NUM_POINTS / batch_time:>14.0f}")
+    print(f"{'per-point 4x4':<20}{NUM_REFERENCE:>10}{reference_time:>12.4f}{NUM_REFERENCE / reference_time:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+class CachedPlanner:
+    """在规划器的solve()/plan()前加一层LRU缓存
+
+    缓存键由量化后的目标位置/姿态、量化后的初始关节角度、求解器名称、TCP/基座偏移以及其他参数组成，
+    只缓存成功的结果。load_profile()、set_solver()、set_ee_offset()、set_base_offset()等会改变
+    求解结果的调用经过本类时清空缓存。命中时用一次正向运动学确认缓存的关节解在当前模型下的位姿
+    与写入缓存时一致，不一致时丢弃该项并重新求解。其他属性和方法直接转发给规划器。
+    """
+
+    MAX_ENTRIES = 256
+    POSITION_QUANTUM = 1e-5     # 目标位置量化步长(米)
+    ORIENTATION_QUANTUM = 1e-4  # 目标姿态量化步长(弧度或四元数分量)
+    SEED_QUANTUM = 1e-4         # 初始关节角度量化步长(弧度)
+    VERIFY_TOLERANCE = 1e-6     # 命中时正向运动学位姿允许的偏差
+
+    # 调用后清空缓存的规划器方法
+    INVALIDATING_METHODS = frozenset((
+        'load_profile', 'set_solver', 'set_planner', 'set_ee_offset', 'set_base_offset',
+        'setNumPathpoints', 'set_interpolation_method', 'generate_collision_matrix'
+    ))
+
+    def __init__(self, planner, solver_name=None, max_entries=None):
+        """
+        Args:
+            planner: 被缓存的规划器
+            solver_name: 规划器当前使用的求解器名称，之后由set_solver()更新
+            max_entries: 缓存项数上限，默认MAX_ENTRIES
+        """
+        self._planner = planner
+        self._entries = OrderedDict()   # {键: (结果, 关节解, 写入时的末端位姿)}
+        self._max_entries = max_entries or self.MAX_ENTRIES
+        self._solver_name = solver_name
+        self._base_offset = None
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0                  # 命中但正向运动学校验失败的次数
+        self.invalidations = 0
+
+    @property
+    def planner(self):
+        """被缓存的规划器"""
+        return self._planner
+
+    def __getattr__(self, name):
+        attr = getattr(self._planner, name)
+        if name in self.INVALIDATING_METHODS and callable(attr):
+            def invalidating(*args, **kwargs):
+                self.invalidate()
+                if name == 'set_solver' and args:
+                    self._solver_name = args[0]
+                elif name == 'set_base_offset':
+                    self._base_offset = self._quantize(args, self.POSITION_QUANTUM)
+                return attr(*args, **kwargs)
+            return invalidating
+        return attr
+
+    def invalidate(self):
+        """清空缓存"""
+        if self._entries:
+            self._entries.clear()
+        self.invalidations += 1
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"ik cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), {self.stale} stale, {len(self._entries)} entries"
+
+    def solve(self, init_solution, target_position, target_orientation=None, **kwargs):
+        """带缓存的planner.solve()"""
+        return self._cached('solve', init_solution, target_position, target_orientation, kwargs)
+
+    def plan(self, init_solution, target_position, target_orientation=None, **kwargs):
+        """带缓存的planner.plan()"""
+        return self._cached('plan', init_solution, target_position, target_orientation, kwargs)
+
+    def _cached(self, method, init_solution, target_position, target_orientation, kwargs):
+        key = self._key(method, init_solution, target_position, target_orientation, kwargs)
+        entry = self._entries.get(key)
+        if entry is not None:
+            result, solution, pose = entry
+            if self._verify(solution, pose):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            # 模型在缓存不知情的情况下发生了变化
+            del self._entries[key]
+            self.stale += 1
+
+        self.misses += 1
+        result = getattr(self._planner, method)(init_solution=init_solution, target_position=target_position,
+                                                target_orientation=target_orientation, **kwargs)
+        if getattr(result, 'success', False) and result.trajectory is not None and len(result.trajectory) > 0:
+            solution = np.array(result.trajectory[-1], dtype=np.float64)
+            pose = self._pose(solution)
+            if pose is not None:
+                self._entries[key] = (result, solution, pose)
+                if len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def _key(self, method, init_solution, target_position, target_orientation, kwargs):
+        return (
+            method,
+            self._solver_name,
+            self._quantize(getattr(self._planner, 'ee_offset', None), self.POSITION_QUANTUM),
+            self._base_offset,
+            self._quantize(target_position, self.POSITION_QUANTUM),
+            self._quantize(target_orientation, self.ORIENTATION_QUANTUM),
+            self._quantize(init_solution, self.SEED_QUANTUM),
+            tuple(sorted((name, self._quantize(value, self.POSITION_QUANTUM)) for name, value in kwargs.items()))
+        )
+
+    @classmethod
+    def _quantize(cls, value, quantum):
+        """把数值(包括嵌套序列)量化为可哈希的整数元组"""
+        if value is None or isinstance(value, str):
+            return value
+        if isinstance(value, (list, tuple)) and any(isinstance(item, (list, tuple, np.ndarray)) or item is None for item in value):
+            return tuple(cls._quantize(item, quantum) for item in value)
+        try:
+            array = np.asarray(value, dtype=np.float64)
+        except (TypeError, ValueError):
+            # 非数值参数按原值参与比较
+            return value if isinstance(value, (bool, int, float, tuple, frozenset)) else repr(value)
+        return tuple(np.round(array.ravel() / quantum).astype(np.int64).tolist())
+
+    def _pose(self, solution):
+        """正向运动学得到的末端位姿，失败时返回None"""
+        try:
+            position, orientation = self._planner.getPoseGlobal(solution)[:2]
+        except Exception as e:
+            print(f"IK cache FK error: {e}")
+            return None
+        if position is None or orientation is None:
+            return None
+        return np.concatenate([np.asarray(position, dtype=np.float64), np.asarray(orientation, dtype=np.float64)])
+
+    def _verify(self, solution, pose) -> bool:
+        """一次正向运动学确认缓存的关节解仍然到达写入时的位姿"""
+        current = self._pose(solution)
+        return current is not None and np.allclose(current, pose, rtol=0.0, atol=self.VERIFY_TOLERANCE)
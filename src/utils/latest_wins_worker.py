@@ -0,0 +1,122 @@
+import threading
+
+
+class LatestWinsWorker:
+    """只执行最新请求的后台工作线程
+
+    请求槽位只有一个: submit()时尚未开始的旧请求被新请求取代，正在执行的请求完成后
+    如果已经有更新的请求提交，其结果作为过期结果丢弃。结果通过dispatch交给界面线程，
+    例如dispatch=lambda callback: widget.after(0, callback)，回调在界面线程中再检查一次是否过期。
+    """
+
+    def __init__(self, dispatch, name="latest-wins-worker"):
+        self._dispatch = dispatch
+        self._name = name
+        self._cond = threading.Condition()
+        self._pending = None            # (序号, func, args, on_result, on_error)
+        self._generation = 0            # 最新请求的序号，旧序号的结果都已过期
+        self._running = False
+        self._thread = None
+        self._closed = False
+
+        # 统计
+        self.submitted = 0
+        self.superseded = 0             # 开始执行前被取代的请求
+        self.dropped = 0                # 执行完但已过期的结果
+        self.delivered = 0
+
+    def submit(self, func, *args, on_result=None, on_error=None) -> int:
+        """提交请求func(*args)，取代尚未开始的请求
+
+        Args:
+            on_result: 可选回调on_result(result)，在界面线程中调用
+            on_error: 可选回调on_error(exception)，在界面线程中调用
+
+        Returns:
+            请求序号
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self._name} is closed")
+            self._generation += 1
+            self.submitted += 1
+            if self._pending is not None:
+                self.superseded += 1
+            self._pending = (self._generation, func, args, on_result, on_error)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+            return self._generation
+
+    def cancel(self):
+        """丢弃尚未开始的请求和正在执行的请求的结果"""
+        with self._cond:
+            self._generation += 1
+            if self._pending is not None:
+                self.superseded += 1
+                self._pending = None
+
+    @property
+    def busy(self) -> bool:
+        """是否有请求正在执行或等待执行"""
+        with self._cond:
+            return self._running or self._pending is not None
+
+    def close(self):
+        """停止工作线程，正在执行的请求完成后退出"""
+        with self._cond:
+            self._closed = True
+            self._pending = None
+            self._generation += 1
+            self._cond.notify()
+
+    def _is_current(self, generation) -> bool:
+        with self._cond:
+            return generation == self._generation
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                generation, func, args, on_result, on_error = self._pending
+                self._pending = None
+                self._running = True
+
+            result, error = None, None
+            try:
+                result = func(*args)
+            except Exception as e:
+                error = e
+            finally:
+                with self._cond:
+                    self._running = False
+
+            if not self._is_current(generation):
+                with self._cond:
+                    self.dropped += 1
+                continue
+            try:
+                self._dispatch(lambda: self._deliver(generation, result, error, on_result, on_error))
+            except Exception as e:
+                # 界面已经关闭
+                print(f"{self._name} dispatch error: {e}")
+
+    def _deliver(self, generation, result, error, on_result, on_error):
+        """在界面线程中调用回调，期间又有新请求提交时丢弃结果"""
+        if not self._is_current(generation):
+            with self._cond:
+                self.dropped += 1
+            return
+        with self._cond:
+            self.delivered += 1
+        if error is not None:
+            if on_error is not None:
+                on_error(error)
+            else:
+                print(f"{self._name} error: {error}")
+        elif on_result is not None:
+            on_result(result)
@@ -0,0 +1,154 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from .config import Config
+
+
+@dataclass
+class SimplifyResult:
+    """轨迹简化结果"""
+    indices: np.ndarray                 # 保留的行在输入中的下标
+    total: int                          # 输入路径点数量
+    removed: int                        # 删除的路径点数量
+    max_joint_deviation: float = 0.0    # 被删除的点到简化路径的最大关节偏差(度)
+    max_cartesian_deviation: float = float('nan')  # 被删除的点的最大末端位置偏差(米)，未检查时为NaN
+
+    def summary(self) -> str:
+        text = f"simplified {self.total} -> {self.total - self.removed} waypoints (removed {self.removed}), max joint deviation {self.max_joint_deviation:.3f}°"
+        if not np.isnan(self.max_cartesian_deviation):
+            text += f", max cartesian deviation {self.max_cartesian_deviation * 1000:.3f} mm"
+        return text
+
+
+class PathSimplifier:
+    """关节空间轨迹简化
+
+    使用Ramer-Douglas-Peucker算法删除近似共线的路径点: 每个被删除的点到保留路径点之间
+    关节空间线段的偏差在每个关节上都不超过对应的角度容差。提供正向运动学时，同时要求
+    被删除的点与线段上对应点的末端位置偏差不超过笛卡尔容差。
+    """
+
+    def __init__(self, joint_tolerance=None, cartesian_tolerance=None, fk=None):
+        """
+        Args:
+            joint_tolerance: 关节角度容差(度)，可以是标量或每个关节一个值，默认Config.simplify_joint_tolerance
+            cartesian_tolerance: 末端位置容差(米)，默认Config.simplify_cartesian_tolerance，只在提供fk时使用
+            fk: 批量正向运动学fk(关节角度数组[m, n](度)) -> 末端位置数组[m, 3](米)
+        """
+        if joint_tolerance is None:
+            joint_tolerance = Config.simplify_joint_tolerance
+        if cartesian_tolerance is None:
+            cartesian_tolerance = Config.simplify_cartesian_tolerance
+        self.joint_tolerance = np.asarray(joint_tolerance, dtype=np.float64)
+        if np.any(self.joint_tolerance <= 0):
+            raise ValueError("Joint tolerance must be positive")
+        self.cartesian_tolerance = cartesian_tolerance
+        self.fk = fk
+
+    @staticmethod
+    def planner_fk(planner, link=None, lock=None):
+        """把planner.getPoseGlobal包装为批量正向运动学(度 -> 米)
+
+        Args:
+            lock: 可选，调用planner期间持有的锁(例如KinematicsFrame.planner_lock)
+        """
+        def fk(points):
+            args = () if link is None else (link,)
+            if lock is None:
+                return np.array([planner.getPoseGlobal(np.radians(point), *args)[0] for point in points], dtype=np.float64)
+            with lock:
+                return np.array([planner.getPoseGlobal(np.radians(point), *args)[0] for point in points], dtype=np.float64)
+        return fk
+
+    def simplify(self, points) -> SimplifyResult:
+        """简化一段连续的关节轨迹(度)，首尾两点总是保留"""
+        points = np.asarray(points, dtype=np.float64)
+        return self.simplify_runs(points, np.ones(len(points), dtype=bool))
+
+    def simplify_runs(self, points, mask) -> SimplifyResult:
+        """简化mask为True的连续路径点段，mask为False的行(延时、工具等命令)原样保留并分隔各段
+
+        Args:
+            points: 关节角度数组[n, 关节数](度)，mask为False的行不读取
+            mask: 每行是否为路径点
+
+        Returns:
+            SimplifyResult，indices为所有保留行(包括非路径点行)的下标
+        """
+        points = np.asarray(points, dtype=np.float64)
+        mask = np.asarray(mask, dtype=bool)
+        keep = ~mask
+        max_joint = 0.0
+        max_cartesian = 0.0 if self.fk is not None else float('nan')
+
+        # 找出连续路径点段[start, end)
+        edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+        for start, end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+            run_keep, run_joint, run_cartesian = self._simplify_run(points[start:end])
+            keep[start:end] = run_keep
+            max_joint = max(max_joint, run_joint)
+            if self.fk is not None:
+                max_cartesian = max(max_cartesian, run_cartesian)
+
+        indices = np.flatnonzero(keep)
+        total = int(mask.sum())
+        return SimplifyResult(indices, total, total - int(mask[indices].sum()), max_joint, max_cartesian)
+
+    def _simplify_run(self, points):
+        """对一段路径点执行RDP，返回(保留标记, 最大关节偏差, 最大末端偏差)"""
+        count = len(points)
+        keep = np.zeros(count, dtype=bool)
+        keep[0] = keep[-1] = True
+        max_joint = 0.0
+        max_cartesian = 0.0
+        if count < 3:
+            return keep, max_joint, max_cartesian
+
+        tolerance = np.broadcast_to(self.joint_tolerance, points.shape[1:])
+        positions = self.fk(points) if self.fk is not None else None
+
+        # 用栈代替递归，长录制不会超过递归深度
+        stack = [(0, count - 1)]
+        while stack:
+            first, last = stack.pop()
+            if last - first < 2:
+                continue
+
+            start = points[first]
+            segment = points[last] - start
+            inner = points[first + 1:last]
+            # 在按容差归一化的空间中把中间点投影到线段上
+            scaled_segment = segment / tolerance
+            length_sq = float(scaled_segment @ scaled_segment)
+            if length_sq > 0:
+                t = np.clip(((inner - start) / tolerance) @ scaled_segment / length_sq, 0.0, 1.0)
+            else:
+                t = np.zeros(len(inner))
+            nearest = start + t[:, None] * segment
+            deviation = np.abs(inner - nearest)
+
+            errors = (deviation / tolerance).max(axis=1)
+            split = int(np.argmax(errors))
+            if errors[split] <= 1.0:
+                split = None
+                if positions is not None:
+                    # 关节偏差满足时再用正向运动学检查末端偏差
+                    cartesian = np.linalg.norm(self.fk(nearest) - positions[first + 1:last], axis=1)
+                    worst = int(np.argmax(cartesian))
+                    if cartesian[worst] > self.cartesian_tolerance:
+                        split = worst
+                    else:
+                        max_cartesian = max(max_cartesian, float(cartesian[worst]))
+
+            if split is None:
+                # 整段可以用一条线段代替
+                max_joint = max(max_joint, float(deviation.max()))
+                continue
+
+            index = first + 1 + split
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+        return keep, max_joint, max_cartesian
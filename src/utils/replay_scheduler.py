@@ -0,0 +1,201 @@
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+from .trajectory_file import TrajectoryFile
+
+
+class ReplayScheduler:
+    """按录制时间戳回放轨迹
+
+    每一步按录制时的时间间隔(除以速度系数)在绝对时间表上发送，不再逐条等待CP1往返。
+    最多保持window条REP未确认，超前发送的命令在固件串口接收缓冲区中排队；按CP1往返时间
+    估计单程延迟并提前发送，使命令到达固件的时间与录制时间一致。
+    DELAY在固件中阻塞执行，其后的步骤按延迟时间顺延，不使用录制时点击按钮之间的间隔。
+    没有时间戳的轨迹(旧JSON文件)退化为逐条确认回放。
+
+    进度通过progress计数器共享，由界面线程定时读取，不需要额外的线程。
+    """
+
+    WINDOW = 4                  # 未确认REP数量上限，受固件串口接收缓冲区限制
+    ACK_TIMEOUT = 5.0           # 等待确认的超时时间(秒)
+    MAX_LEAD = 0.05             # 提前发送时间上限(秒)
+    LATENCY_SMOOTHING = 0.2     # 往返时间指数平滑系数
+    POLL_INTERVAL = 0.01        # 暂停/等待时检查停止的间隔(秒)
+
+    def __init__(self, protocol_class, trajectory, repeat_count=1, speed=1.0, window=None, send_sleep=0.001):
+        if speed <= 0:
+            raise ValueError("Replay speed must be positive")
+        self.protocol_class = protocol_class
+        self.trajectory = trajectory
+        self.repeat_count = max(1, repeat_count)
+        self.speed = speed
+        self.send_sleep = send_sleep
+        self.offsets, self.period = self.build_schedule(trajectory, speed)
+        self.timed = self.offsets is not None
+        self.window = max(1, window or self.WINDOW) if self.timed else 1
+
+        # 共享进度: 由回放线程写入，界面线程读取
+        self.progress = 0
+        self.total = len(trajectory) * self.repeat_count
+        self.latency = 0.0
+
+        self._cond = threading.Condition()
+        self._acks = {"CP1": 0, "TP0": 0}
+        self._rep_sent_times = deque()
+
+    @classmethod
+    def build_schedule(cls, trajectory, speed=1.0):
+        """计算每一步相对一遍回放开始的发送时间(秒)
+
+        Returns:
+            (时间偏移数组, 一遍回放的时长)，轨迹没有完整时间戳时返回(None, 0)
+        """
+        steps = len(trajectory)
+        timestamps = np.asarray(trajectory.timestamps, dtype=np.float64)
+        if steps == 0 or np.isnan(timestamps).any():
+            return None, 0.0
+
+        gaps = np.empty(steps, dtype=np.float64)
+        gaps[:-1] = np.clip(np.diff(timestamps), 0.0, None) / speed
+        # 最后一步之后留出一个典型间隔再开始下一遍
+        positive = gaps[:-1][gaps[:-1] > 0]
+        gaps[-1] = float(np.median(positive)) if len(positive) else 0.0
+        # DELAY之后的间隔由固件延迟决定
+        delay_steps = np.asarray(trajectory.kinds) == TrajectoryFile.KIND_DELAY
+        gaps[delay_steps] = np.asarray(trajectory.params, dtype=np.float64)[delay_steps]
+
+        offsets = np.concatenate(([0.0], np.cumsum(gaps[:-1])))
+        return offsets, float(gaps.sum())
+
+    @property
+    def duration(self) -> float:
+        """按时间表回放的总时长(秒)，逐条确认回放时返回0"""
+        return self.period * self.repeat_count if self.timed else 0.0
+
+    def _on_line(self, line):
+        if line not in self._acks:
+            return
+        with self._cond:
+            self._acks[line] += 1
+            if line == "CP1" and self._rep_sent_times:
+                rtt = time.perf_counter() - self._rep_sent_times.popleft()
+                self.latency += self.LATENCY_SMOOTHING * (rtt - self.latency)
+            self._cond.notify_all()
+
+    def _wait_acks(self, signal, count, should_continue) -> bool:
+        """等待signal累计确认数达到count"""
+        deadline = time.perf_counter() + self.ACK_TIMEOUT
+        with self._cond:
+            while self._acks[signal] < count:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or not should_continue():
+                    return False
+                self._cond.wait(min(remaining, self.POLL_INTERVAL))
+        return True
+
+    def _wait_until(self, target, should_continue, is_paused):
+        """等待到target时刻，返回暂停的总时长；停止时返回None"""
+        paused_time = 0.0
+        while True:
+            if not should_continue():
+                return None
+            if is_paused():
+                pause_start = time.perf_counter()
+                while is_paused():
+                    if not should_continue():
+                        return None
+                    time.sleep(self.POLL_INTERVAL)
+                pause_duration = time.perf_counter() - pause_start
+                paused_time += pause_duration
+                target += pause_duration
+                continue
+            remaining = target - time.perf_counter()
+            if remaining <= 0:
+                return paused_time
+            time.sleep(min(remaining, self.POLL_INTERVAL))
+
+    def run(self, should_continue=None, is_paused=None, on_timeout=None) -> bool:
+        """执行回放，在调用线程中阻塞直到完成或停止
+
+        Args:
+            should_continue: 可选回调，返回False时停止回放
+            is_paused: 可选回调，返回True时暂停，恢复后时间表整体顺延
+            on_timeout: 可选回调on_timeout(command)，命令确认超时时调用
+
+        Returns:
+            是否完整回放
+        """
+        should_continue = should_continue or (lambda: True)
+        is_paused = is_paused or (lambda: False)
+        protocol = self.protocol_class
+        trajectory = self.trajectory
+        kinds = trajectory.kinds
+        steps = len(trajectory)
+
+        # 只有按行读取的串口协议能统计CP1/TP0确认
+        line_acks = hasattr(protocol, "expect")
+        if line_acks:
+            protocol.subscribe(self._on_line)
+        rep_sent = 0
+        tool_sent = 0
+        self.progress = 0
+        try:
+            start = time.perf_counter()
+            for step in range(self.total):
+                index = step % steps
+                kind = kinds[index]
+                command = trajectory.command(index)
+
+                if self.timed:
+                    due = start + self.period * (step // steps) + self.offsets[index]
+                    lead = min(self.MAX_LEAD, self.latency / 2)
+                    paused_time = self._wait_until(due - lead, should_continue, is_paused)
+                    if paused_time is None:
+                        return False
+                    start += paused_time
+                else:
+                    paused_time = self._wait_until(0, should_continue, is_paused)
+                    if paused_time is None:
+                        return False
+
+                if kind == TrajectoryFile.KIND_JOINTS and line_acks:
+                    # 保持固件接收缓冲区中最多window条未确认的REP
+                    if not self._wait_acks("CP1", rep_sent - self.window + 1, should_continue):
+                        if not should_continue():
+                            return False
+                        if on_timeout is not None:
+                            on_timeout(command)
+                        with self._cond:
+                            # 丢失的确认不再占用窗口
+                            self._acks["CP1"] = rep_sent
+                            self._rep_sent_times.clear()
+                    with self._cond:
+                        self._rep_sent_times.append(time.perf_counter())
+                    rep_sent += 1
+                elif kind == TrajectoryFile.KIND_TOOL:
+                    tool_sent += 1
+
+                if not protocol.send(command, sleep_time=self.send_sleep):
+                    return False
+
+                if not self.timed and line_acks and kind in (TrajectoryFile.KIND_JOINTS, TrajectoryFile.KIND_TOOL):
+                    # 没有时间戳时与原来一样逐条等待完成信号
+                    signal, count = ("CP1", rep_sent) if kind == TrajectoryFile.KIND_JOINTS else ("TP0", tool_sent)
+                    if not self._wait_acks(signal, count, should_continue):
+                        if not should_continue():
+                            return False
+                        if on_timeout is not None:
+                            on_timeout(command)
+                        with self._cond:
+                            self._acks[signal] = count
+                            if signal == "CP1":
+                                self._rep_sent_times.clear()
+
+                self.progress = step + 1
+            return True
+        finally:
+            if line_acks:
+                protocol.unsubscribe(self._on_line)
@@ -1,8 +1,57 @@
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+
 import numpy as np
 
+
+class StateSnapshot(Mapping):
+    """RobotState某一版本的只读快照
+
+    发布后不再修改: numpy数组复制为只读数组，列表复制一份，发布者之后修改自己的数组或列表不影响快照。
+    读者拿到的快照中各键来自同一次更新。
+    """
+
+    __slots__ = ('version', '_values')
+
+    def __init__(self, version, values):
+        self.version = version
+        self._values = values
+
+    @staticmethod
+    def freeze(value):
+        """复制一份，与发布者持有的对象分开"""
+        if isinstance(value, np.ndarray):
+            value = value.copy()
+            value.flags.writeable = False
+        elif isinstance(value, list):
+            # 保持列表类型，读者可能调用copy()等列表方法
+            value = list(value)
+        return value
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return f"StateSnapshot(version={self.version}, {self._values!r})"
+
+
 class RobotState:
-    def __init__(self):
-        self._state = {
+    _NO_SENDER = object()               # 批量更新中还没有带sender的更新
+
+    def __init__(self, dispatch=None):
+        """
+        Args:
+            dispatch: 可选，把回调交给界面线程执行，例如dispatch=lambda callback: widget.after(0, callback)。
+                      其他线程产生的通知经由dispatch在界面线程中发出
+        """
+        state = {
             'id': 0,
             'tcp_offset': np.array([0, 0, 0, 0, 0, 0]),
             'end_effector_link': 0,
@@ -14,43 +63,154 @@ class RobotState:
             'base_position': np.array([0, 0, 0]),
             'base_orientation': np.array([0, 0, 0, 1])
         }
-        self._observers = []
+        # 写入者在锁内发布新的快照，读者直接取引用，不需要加锁
+        self._snapshot = StateSnapshot(0, {key: StateSnapshot.freeze(value) for key, value in state.items()})
+        self._observers = {}            # {观察者: 订阅的键集合，None表示全部}
+
+        self._dispatch = dispatch
+        self._ui_thread = threading.get_ident()
+        self._lock = threading.Lock()       # 保护快照发布和_queued
+        self._local = threading.local() # 每个线程各自的批量更新
+        self._queued = None             # 等待在界面线程中发出的通知 [变化的键, sender]
+
+        # 统计
+        self.notifications = 0          # 合并后发出的通知次数
+        self.observer_calls = 0         # 调用observer.update()的次数
 
-    def add_observer(self, observer):
-        """添加观察者"""
-        if observer not in self._observers:
-            self._observers.append(observer)
+    def add_observer(self, observer, keys=None):
+        """添加观察者
+
+        Args:
+            observer: 实现update(state, changed_keys)的对象
+            keys: 可选，只在这些键变化时通知，默认任意键变化都通知
+        """
+        self._observers[observer] = None if keys is None else frozenset(keys)
 
     def remove_observer(self, observer):
         """移除观察者"""
-        if observer in self._observers:
-            self._observers.remove(observer)
+        self._observers.pop(observer, None)
+
+    def notify_observers(self, sender=None, changed_keys=None):
+        """通知订阅了变化键的观察者，排除sender自身
 
-    def notify_observers(self, sender=None):
-        """通知所有观察者，排除sender自身
-        
         Args:
             sender: 消息发送者，不会收到自己发送的通知
+            changed_keys: 变化的键，默认视为全部键都有变化
         """
-        for observer in self._observers:
-            if observer != sender:  # 排除自己
-                observer.update(self._state)
+        if self._dispatch is not None and threading.get_ident() != self._ui_thread:
+            self._queue_notification(sender, changed_keys)
+            return
+
+        snapshot = self._snapshot
+        changed = frozenset(snapshot) if changed_keys is None else frozenset(changed_keys)
+        self.notifications += 1
+        for observer, keys in list(self._observers.items()):
+            if observer == sender:  # 排除自己
+                continue
+            if keys is not None and not (keys & changed):
+                continue
+            self.observer_calls += 1
+            try:
+                observer.update(snapshot, changed)
+            except Exception as e:
+                # 一个观察者出错不影响其他观察者
+                print(f"Robot state observer error: {e}")
 
     def update_state(self, key, value, sender=None):
         """更新状态并通知观察者，可排除sender
-        
+
         Args:
             key: 要更新的状态键
             value: 新的状态值
             sender: 消息发送者，不会收到自己发送的通知
         """
-        if key in self._state:
-            self._state[key] = value
-            self.notify_observers(sender)
+        self.update_many({key: value}, sender)
+
+    def update_many(self, values, sender=None):
+        """一次更新多个键，观察者只收到一次合并的通知
+
+        Args:
+            values: {状态键: 新的状态值}，未知的键被忽略
+            sender: 消息发送者，不会收到自己发送的通知
+        """
+        changed = [key for key in values if key in self._snapshot]
+        if not changed:
+            return
+        frozen = {key: StateSnapshot.freeze(values[key]) for key in changed}
+        with self._lock:
+            current = self._snapshot
+            self._snapshot = StateSnapshot(current.version + 1, {**current._values, **frozen})
+
+        batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            self._merge(batch, changed, batch[2] if sender is None else sender)
+        else:
+            self.notify_observers(sender, changed)
+
+    @contextmanager
+    def batch(self, sender=None):
+        """批量更新，with块内的update_state()在退出时合并为一次通知
+
+        嵌套时在最外层退出时通知。sender为None时取批内更新的sender，批内未指定sender的更新视为
+        由batch的sender发出；各次更新的sender不同时不排除任何观察者。
+        """
+        outer = getattr(self._local, 'batch', None)
+        if outer is not None:
+            yield self
+            return
+
+        batch = [set(), self._NO_SENDER, sender]
+        self._local.batch = batch
+        try:
+            yield self
+        finally:
+            self._local.batch = None
+            if batch[0]:
+                self.notify_observers(None if batch[1] is self._NO_SENDER else batch[1], batch[0])
 
     def get_state(self, key=None):
-        """获取当前状态"""
+        """获取当前状态，key为None时返回当前快照"""
         if key is None:
-            return self._state
+            return self._snapshot
         else:
-            return self._state[key]
\ No newline at end of file
+            return self._snapshot[key]
+
+    def snapshot(self) -> StateSnapshot:
+        """获取当前快照，各键来自同一次更新"""
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        """状态版本号，每次更新递增，版本号不变说明状态没有变化"""
+        return self._snapshot.version
+
+    @staticmethod
+    def _merge(pending, changed, sender):
+        """把一次更新合并到pending=[变化的键, sender, ...]"""
+        pending[0].update(changed)
+        if pending[1] is RobotState._NO_SENDER:
+            pending[1] = sender
+        elif pending[1] is not sender:
+            pending[1] = None
+
+    def _queue_notification(self, sender, changed_keys):
+        """其他线程的通知交给界面线程，尚未发出的通知合并为一次"""
+        changed = self._snapshot.keys() if changed_keys is None else changed_keys
+        with self._lock:
+            if self._queued is not None:
+                self._merge(self._queued, changed, sender)
+                return
+            self._queued = [set(changed), sender]
+        try:
+            self._dispatch(self._flush_queued)
+        except Exception as e:
+            # 界面已经关闭
+            with self._lock:
+                self._queued = None
+            print(f"Robot state dispatch error: {e}")
+
+    def _flush_queued(self):
+        with self._lock:
+            queued, self._queued = self._queued, None
+        if queued is not None:
+            self.notify_observers(queued[1], queued[0])
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import zlib
+import struct
+import threading
+
+import numpy as np
+
+from .config import Config
+
+
+class TeachRecorder:
+    """示教录制器
+
+    把REC,/M280,/DELAY,S数据行解析为数值后按块压缩追加写入文件，内存占用固定为一个块。
+    每个块写入后立即落盘，未写满的块由后台定时器在FLUSH_INTERVAL内写入，
+    即使之后不再有新的采样，录制中途崩溃最多丢失FLUSH_INTERVAL内的采样。
+
+    文件格式: 连续的块，每块为
+        CHUNK_HEADER(magic, 行数, 列数, 压缩长度, CRC32) + zlib(时间戳f8[n] | 类型u1[n] | 数值个数u1[n] | 数值f4[n, 列数])
+    """
+
+    MAGIC = b"TRC1"
+    CHUNK_HEADER = struct.Struct("<4sIIII")
+    CHUNK_ROWS = 256        # 每块最多行数
+    FLUSH_INTERVAL = 1.0    # 未写满的块最长缓存时间(秒)
+    MAX_VALUES = 16         # 每行最多数值个数
+    FILE_EXTENSION = ".trec"
+
+    KIND_JOINTS = 0         # REC,关节角度...
+    KIND_TOOL = 1           # M280,工具状态
+    KIND_DELAY = 2          # DELAY,S秒数
+    _PREFIXES = {KIND_JOINTS: "REC,", KIND_TOOL: "M280,", KIND_DELAY: "DELAY,S"}
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._timestamps = np.empty(self.CHUNK_ROWS, dtype=np.float64)
+        self._kinds = np.empty(self.CHUNK_ROWS, dtype=np.uint8)
+        self._counts = np.empty(self.CHUNK_ROWS, dtype=np.uint8)
+        self._values = np.empty((self.CHUNK_ROWS, self.MAX_VALUES), dtype=np.float32)
+        self._rows = 0
+        self._last_flush = time.time()
+        self._flush_timer = None
+        self._file = open(path, 'ab')
+
+    @classmethod
+    def create_session(cls, directory=None):
+        """在应用数据目录下新建一个录制会话文件"""
+        if directory is None:
+            directory = os.path.join(Config.get_path(), 'recordings')
+        os.makedirs(directory, exist_ok=True)
+        filename = time.strftime("teach_%Y%m%d_%H%M%S") + cls.FILE_EXTENSION
+        return cls(os.path.join(directory, filename))
+
+    @classmethod
+    def parse_line(cls, line):
+        """解析数据行，返回(类型, 数值列表)，无法识别时返回None"""
+        for kind, prefix in cls._PREFIXES.items():
+            if line.startswith(prefix):
+                try:
+                    values = [float(v) for v in line[len(prefix):].split(',')]
+                except ValueError:
+                    return None
+                if 0 < len(values) <= cls.MAX_VALUES:
+                    return kind, values
+                return None
+        return None
+
+    def add_line(self, line, timestamp=None) -> bool:
+        """解析并记录一行数据，返回是否记录"""
+        parsed = self.parse_line(line.strip())
+        if parsed is None:
+            return False
+        self.append(parsed[0], parsed[1], timestamp)
+        return True
+
+    def append(self, kind, values, timestamp=None):
+        """记录一个采样"""
+        with self._lock:
+            if self._file is None:
+                return
+            row = self._rows
+            self._timestamps[row] = time.time() if timestamp is None else timestamp
+            self._kinds[row] = kind
+            self._counts[row] = len(values)
+            self._values[row, :len(values)] = values
+            self._rows += 1
+            self.count += 1
+            if self._rows >= self.CHUNK_ROWS or time.time() - self._last_flush >= self.FLUSH_INTERVAL:
+                self._write_chunk()
+            elif self._flush_timer is None:
+                # 采样停止后由定时器写入缓存的块
+                self._flush_timer = threading.Timer(self.FLUSH_INTERVAL, self._flush_due)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _flush_due(self):
+        """定时器回调: 缓存的采样超过FLUSH_INTERVAL未写入时写入文件"""
+        with self._lock:
+            # 等待锁期间块已被写入并可能换了新的定时器
+            if self._flush_timer is not threading.current_thread():
+                return
+            self._flush_timer = None
+            if self._file is None:
+                return
+            try:
+                self._write_chunk()
+            except Exception as e:
+                print(f"Teach recorder flush error: {e}")
+
+    def flush(self):
+        """把缓存的采样写入文件"""
+        with self._lock:
+            if self._file is not None:
+                self._write_chunk()
+
+    def close(self):
+        """写入剩余采样并关闭文件"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._write_chunk()
+            self._file.close()
+            self._file = None
+
+    def _write_chunk(self):
+        self._last_flush = time.time()
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        rows = self._rows
+        if rows == 0:
+            return
+        width = int(self._counts[:rows].max())
+        payload = zlib.compress(
+            self._timestamps[:rows].tobytes() + self._kinds[:rows].tobytes() +
+            self._counts[:rows].tobytes() + np.ascontiguousarray(self._values[:rows, :width]).tobytes())
+        header = self.CHUNK_HEADER.pack(self.MAGIC, rows, width, len(payload), zlib.crc32(payload))
+        self._file.write(header + payload)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._rows = 0
+
+    @classmethod
+    def read_chunks(cls, path):
+        """依次读取文件中的块，产出(时间戳, 类型, 数值个数, 数值)；遇到不完整或损坏的块时停止"""
+        with open(path, 'rb') as f:
+            while True:
+                header = f.read(cls.CHUNK_HEADER.size)
+                if len(header) < cls.CHUNK_HEADER.size:
+                    return
+                magic, rows, width, size, crc = cls.CHUNK_HEADER.unpack(header)
+                payload = f.read(size)
+                if magic != cls.MAGIC or len(payload) < size or zlib.crc32(payload) != crc:
+                    print(f"Teach log truncated at offset {f.tell()}: {path}")
+                    return
+                data = zlib.decompress(payload)
+                offset = 0
+                timestamps = np.frombuffer(data, dtype=np.float64, count=rows, offset=offset)
+                offset += timestamps.nbytes
+                kinds = np.frombuffer(data, dtype=np.uint8, count=rows, offset=offset)
+                offset += kinds.nbytes
+                counts = np.frombuffer(data, dtype=np.uint8, count=rows, offset=offset)
+                offset += counts.nbytes
+                values = np.frombuffer(data, dtype=np.float32, count=rows * width, offset=offset).reshape(rows, width)
+                yield timestamps, kinds, counts, values
+
+    @classmethod
+    def format_rows(cls, kinds, counts, values):
+        """把一个块中的采样还原为原始命令格式(REC,/M280,/DELAY,S)的行"""
+        for kind, count, row in zip(kinds, counts, values):
+            text = ",".join(f"{round(float(v), 4):g}" for v in row[:count])
+            yield cls._PREFIXES[int(kind)] + text
+
+    @classmethod
+    def iter_lines(cls, path):
+        """按原始命令格式产出文件中的每一行"""
+        for _, kinds, counts, values in cls.read_chunks(path):
+            yield from cls.format_rows(kinds, counts, values)
+
+    @classmethod
+    def export_json(cls, path, json_path) -> int:
+        """导出为回放使用的JSON行列表，逐行写出不在内存中构建整个列表，返回行数"""
+        count = 0
+        with open(json_path, 'w') as f:
+            f.write("[")
+            for line in cls.iter_lines(path):
+                f.write(("\n    " if count == 0 else ",\n    ") + json.dumps(line))
+                count += 1
+            f.write("\n]" if count else "]")
+        return count
@@ -0,0 +1,221 @@
+import os
+import sys
+import json
+import struct
+
+import numpy as np
+
+from .teach_recorder import TeachRecorder
+
+
+class TrajectoryFile:
+    """列式轨迹文件
+
+    每一步一行，按列连续存放，打开时用numpy.memmap直接映射，不需要解析:
+        kinds      u1[n]               步骤类型(关节/工具/延时/速度)
+        timestamps f8[n]               录制时间戳(秒)，没有记录时为NaN
+        params     f4[n]               延时秒数或速度值
+        joints     f4[n, n_joints]     关节角度(度)
+        tools      f4[n, n_tools]      工具通道
+    文件头固定HEADER_SIZE字节，各列按ALIGNMENT对齐依次存放。
+    """
+
+    MAGIC = b"MTRJ"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHQII")  # magic, version, 保留, 步数, 关节数, 工具通道数
+    HEADER_SIZE = 64
+    ALIGNMENT = 8
+    FILE_EXTENSION = ".mtrj"
+
+    # 与TeachRecorder的类型编号一致
+    KIND_JOINTS = TeachRecorder.KIND_JOINTS   # REC,
+    KIND_TOOL = TeachRecorder.KIND_TOOL       # M280,
+    KIND_DELAY = TeachRecorder.KIND_DELAY     # DELAY,S
+    KIND_SPEED = 3                            # SPD,
+
+    def __init__(self, kinds, timestamps, params, joints, tools):
+        self.kinds = kinds
+        self.timestamps = timestamps
+        self.params = params
+        self.joints = joints
+        self.tools = tools
+
+    def __len__(self):
+        return len(self.kinds)
+
+    @property
+    def n_joints(self):
+        return self.joints.shape[1]
+
+    @property
+    def n_tools(self):
+        return self.tools.shape[1]
+
+    @classmethod
+    def _layout(cls, steps, n_joints, n_tools):
+        """返回[(列名, dtype, shape, 偏移)]"""
+        columns = [
+            ('kinds', np.uint8, (steps,)),
+            ('timestamps', np.float64, (steps,)),
+            ('params', np.float32, (steps,)),
+            ('joints', np.float32, (steps, n_joints)),
+            ('tools', np.float32, (steps, n_tools)),
+        ]
+        layout = []
+        offset = cls.HEADER_SIZE
+        for name, dtype, shape in columns:
+            offset = -(-offset // cls.ALIGNMENT) * cls.ALIGNMENT
+            layout.append((name, dtype, shape, offset))
+            offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+        return layout
+
+    @classmethod
+    def open(cls, path):
+        """以只读内存映射方式打开轨迹文件"""
+        with open(path, 'rb') as f:
+            header = f.read(cls.HEADER.size)
+        if len(header) < cls.HEADER.size:
+            raise ValueError(f"Invalid trajectory file: {path}")
+        magic, version, _, steps, n_joints, n_tools = cls.HEADER.unpack(header)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError(f"Unsupported trajectory file: {path}")
+
+        columns = {}
+        for name, dtype, shape, offset in cls._layout(steps, n_joints, n_tools):
+            if steps == 0 or 0 in shape:
+                columns[name] = np.zeros(shape, dtype=dtype)
+            else:
+                columns[name] = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+        return cls(**columns)
+
+    def save(self, path):
+        """写入轨迹文件，各列直接写出不做额外拷贝"""
+        steps = len(self)
+        layout = self._layout(steps, self.n_joints, self.n_tools)
+        with open(path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, 0, steps, self.n_joints, self.n_tools))
+            for name, dtype, _, offset in layout:
+                f.write(b"\0" * (offset - f.tell()))
+                np.ascontiguousarray(getattr(self, name), dtype=dtype).tofile(f)
+
+    @classmethod
+    def from_lines(cls, lines, timestamps=None):
+        """从录制数据行(REC,/M280,/DELAY,/SPD,或旧格式的角度列表)构建轨迹"""
+        kinds, params, joints, tools = [], [], [], []
+        for data in lines:
+            joint_values = tool_values = None
+            param = 0.0
+            if isinstance(data, str):
+                data = data.strip()
+                if data.startswith("REC,"):
+                    kind, joint_values = cls.KIND_JOINTS, [float(v) for v in data[4:].split(',')]
+                elif data.startswith("M280,"):
+                    kind, tool_values = cls.KIND_TOOL, [float(v) for v in data[5:].split(',')]
+                elif data.startswith("DELAY,MS"):
+                    kind, param = cls.KIND_DELAY, float(data[8:]) / 1000.0
+                elif data.startswith("DELAY,S"):
+                    kind, param = cls.KIND_DELAY, float(data[7:])
+                elif data.startswith("SPD,"):
+                    kind, param = cls.KIND_SPEED, float(data[4:].split(',')[0])
+                else:
+                    raise ValueError(f"Unknown trajectory line: {data}")
+            else:
+                # 兼容旧格式的数组数据
+                kind, joint_values = cls.KIND_JOINTS, [float(v) for v in data]
+            kinds.append(kind)
+            params.append(param)
+            joints.append(joint_values)
+            tools.append(tool_values)
+
+        n_joints = max((len(v) for v in joints if v is not None), default=0)
+        n_tools = max((len(v) for v in tools if v is not None), default=0)
+        joint_array = np.full((len(kinds), n_joints), np.nan, dtype=np.float32)
+        tool_array = np.full((len(kinds), n_tools), np.nan, dtype=np.float32)
+        for index, (joint_values, tool_values) in enumerate(zip(joints, tools)):
+            if joint_values is not None:
+                if len(joint_values) != n_joints:
+                    raise ValueError(f"Inconsistent joint count at step {index}")
+                joint_array[index] = joint_values
+            if tool_values is not None:
+                tool_array[index, :len(tool_values)] = tool_values
+
+        if timestamps is None:
+            timestamps = np.full(len(kinds), np.nan)
+        return cls(np.array(kinds, dtype=np.uint8), np.asarray(timestamps, dtype=np.float64),
+                   np.array(params, dtype=np.float32), joint_array, tool_array)
+
+    @classmethod
+    def from_json(cls, json_path):
+        """从JSON录制文件构建轨迹"""
+        with open(json_path, 'r') as f:
+            return cls.from_lines(json.load(f))
+
+    @classmethod
+    def from_teach_log(cls, log_path):
+        """从示教录制器的会话文件构建轨迹，保留录制时间戳"""
+        lines, timestamps = [], []
+        for chunk_timestamps, kinds, counts, values in TeachRecorder.read_chunks(log_path):
+            timestamps.append(chunk_timestamps)
+            lines.extend(TeachRecorder.format_rows(kinds, counts, values))
+        return cls.from_lines(lines, np.concatenate(timestamps) if timestamps else None)
+
+    @classmethod
+    def load(cls, path):
+        """按扩展名加载轨迹: .mtrj内存映射，.trec示教会话，其余按JSON录制文件解析"""
+        extension = os.path.splitext(path)[1].lower()
+        if extension == cls.FILE_EXTENSION:
+            return cls.open(path)
+        if extension == TeachRecorder.FILE_EXTENSION:
+            return cls.from_teach_log(path)
+        return cls.from_json(path)
+
+    @classmethod
+    def convert(cls, source_path, target_path):
+        """把JSON录制文件或示教会话转换为列式轨迹文件，返回步数"""
+        trajectory = cls.load(source_path)
+        trajectory.save(target_path)
+        return len(trajectory)
+
+    def simplify(self, simplifier):
+        """删除连续关节步骤中近似共线的路径点，其余步骤和保留点的时间戳不变
+
+        Returns:
+            (简化后的轨迹, SimplifyResult)
+        """
+        result = simplifier.simplify_runs(self.joints, self.kinds == self.KIND_JOINTS)
+        index = result.indices
+        trajectory = TrajectoryFile(self.kinds[index], self.timestamps[index], self.params[index],
+                                    self.joints[index], self.tools[index])
+        return trajectory, result
+
+    def command(self, index):
+        """生成第index步的回放命令(REP,/M280,/DELAY,S/SPD,)，直接从列中切片格式化"""
+        kind = self.kinds[index]
+        if kind == self.KIND_JOINTS:
+            return "REP," + ",".join(f"{v:.2f}" for v in self.joints[index].tolist()) + "\n"
+        if kind == self.KIND_TOOL:
+            values = self.tools[index]
+            return "M280," + ",".join(f"{v:g}" for v in values[~np.isnan(values)].tolist()) + "\n"
+        if kind == self.KIND_DELAY:
+            return f"DELAY,S{float(self.params[index]):g}\n"
+        return f"SPD,{float(self.params[index]):g}\n"
+
+
+if __name__ == "__main__":
+    # 用法: python -m utils.trajectory_file 输入.json|.trec 输出.mtrj [--simplify 关节容差(度)]
+    args = sys.argv[1:]
+    tolerance = None
+    if "--simplify" in args:
+        position = args.index("--simplify")
+        tolerance = float(args[position + 1])
+        del args[position:position + 2]
+    if len(args) != 2:
+        print("Usage: python -m utils.trajectory_file <input.json|input.trec> <output.mtrj> [--simplify <degrees>]")
+        sys.exit(1)
+    trajectory = TrajectoryFile.load(args[0])
+    if tolerance is not None:
+        from .path_simplifier import PathSimplifier
+        trajectory, result = trajectory.simplify(PathSimplifier(tolerance))
+        print(result.summary())
+    trajectory.save(args[1])
+    print(f"Converted {len(trajectory)} steps to {args[1]}")